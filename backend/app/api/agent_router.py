@@ -28,7 +28,7 @@ def get_graph_app():
 
 
 @router.post("/agent", response_model=ResearchResponse)
-def agent(request: ResearchRequest):
+async def agent(request: ResearchRequest):
     logger.info(f"Received request: thread_id={request.thread_id}, question_length={len(request.question)}")
     try:
         graph_app = get_graph_app()
@@ -44,7 +44,7 @@ def agent(request: ResearchRequest):
         config = {"configurable": {"thread_id": request.thread_id}}
         
         logger.debug(f"Invoking graph with thread_id={request.thread_id}, question='{request.question[:50]}...'")
-        result = graph_app.invoke(state_in, config=config)
+        result = await graph_app.ainvoke(state_in, config=config)
 
         answer = result.get("answer", "")
         answer_length = len(answer)
@@ -7,21 +7,46 @@ from app.nodes.retrieve_node_factory import retrieve_node_factory
 from app.nodes.rewrite_node import rewrite_node_factory
 from app.nodes.route_node_factory import route_node_factory
 from app.tools.tools import make_tools
+from langchain_core.embeddings import Embeddings
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import END, StateGraph
-from neo4j import GraphDatabase
+from neo4j import AsyncDriver
 
 logger = logging.getLogger(__name__)
 
 
-def build_graph(neo4j: Neo4jCfg, rag: RagCfg):
+def make_embeddings(rag: RagCfg) -> Embeddings:
+    if rag.embedding_backend == "openai":
+        return OpenAIEmbeddings(
+            model=rag.embedding_model, dimensions=rag.embedding_dimensions
+        )
+    if rag.embedding_backend == "local":
+        # optional dependency, only needed for the local backend
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        model_kwargs = {"device": "cpu"}
+        # truncate_dim needs sentence-transformers >= 2.7, only pass it when
+        # used (same as the doc-pipeline's LocalEmbeddingProvider)
+        if rag.embedding_dimensions:
+            model_kwargs["truncate_dim"] = rag.embedding_dimensions
+        return HuggingFaceEmbeddings(
+            model_name=rag.embedding_model,
+            model_kwargs=model_kwargs,
+            encode_kwargs={"normalize_embeddings": True},
+        )
+    raise ValueError(f"Unknown embedding backend: {rag.embedding_backend}")
+
+
+def build_graph(neo4j: Neo4jCfg, rag: RagCfg, driver: AsyncDriver):
+    """
+    Nodes and tools are async (run with `ainvoke`): LLM, embedding and Neo4j
+    calls await on the event loop instead of holding a threadpool worker.
+    The caller owns `driver` and closes it on shutdown.
+    """
     logger.info(f"Building graph with model: {rag.llm_model}, embedding: {rag.embedding_model}, k={rag.k}")
     
-    driver = GraphDatabase.driver(neo4j.uri, auth=(neo4j.user, neo4j.password))
-    logger.debug(f"Neo4j driver created for URI: {neo4j.uri}")
-    
-    emb = OpenAIEmbeddings(model=rag.embedding_model)
+    emb = make_embeddings(rag)
     llm = ChatOpenAI(model=rag.llm_model, temperature=0)
     logger.debug(f"LLM and embeddings initialized")
 
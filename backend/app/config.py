@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass(frozen=True)
@@ -13,5 +14,8 @@ class Neo4jCfg:
 class RagCfg:
     k: int = 8
     embedding_model: str = "text-embedding-3-small"  # 1536 dims
+    embedding_backend: str = "openai"  # or "local" (sentence-transformers, CPU)
+    embedding_dimensions: Optional[int] = None  # e.g. 256/512, None = model default
     llm_model: str = "gpt-4o-mini"
     max_excerpts_in_prompt: int = 8  # same as k by default
+    tool_timeout_s: float = 15.0  # per search tool (embed + vector query)
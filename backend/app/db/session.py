@@ -1,28 +1,37 @@
 import logging
+from typing import AsyncIterator, Optional
 
 from app.settings import settings
-from neo4j import GraphDatabase, Session
+from neo4j import AsyncDriver, AsyncGraphDatabase, AsyncSession
 
 logger = logging.getLogger(__name__)
 
-driver = GraphDatabase.driver(
-    settings.neo4j_uri, auth=(settings.neo4j_user, settings.neo4j_password)
-)
-logger.info(f"Neo4j driver initialized for URI: {settings.neo4j_uri}")
+# one async driver (connection pool) for the health check and the search tools;
+# created in the lifespan so it belongs to the server's event loop
+driver: Optional[AsyncDriver] = None
 
 
-def get_db() -> Session:
+def init_driver() -> AsyncDriver:
+    global driver
+    driver = AsyncGraphDatabase.driver(
+        settings.neo4j_uri, auth=(settings.neo4j_user, settings.neo4j_password)
+    )
+    logger.info(f"Neo4j driver initialized for URI: {settings.neo4j_uri}")
+    return driver
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
     """
-    Simple synchronous Neo4j session for FastAPI dependencies.
+    Async Neo4j session for FastAPI dependencies.
     """
     session = driver.session()
     try:
         yield session
     finally:
-        session.close()
+        await session.close()
 
 
-def shutdown_driver():
+async def shutdown_driver():
     if driver:
         logger.info("Closing Neo4j driver")
-        driver.close()
+        await driver.close()
@@ -5,11 +5,11 @@ from app.api import router as agent_router
 from app.api.agent_router import set_graph_app
 from app.build_graph import build_graph
 from app.config import Neo4jCfg, RagCfg
-from app.db.session import get_db, shutdown_driver
+from app.db.session import get_db, init_driver, shutdown_driver
 from app.logging_conf import setup_logging
 from app.settings import settings
 from fastapi import Depends, FastAPI
-from neo4j import Session
+from neo4j import AsyncSession
 
 # Setup logging on module import
 log_level = logging.DEBUG if settings.app_env == "dev" else logging.INFO
@@ -29,8 +29,18 @@ async def lifespan(app: FastAPI):
         user=settings.neo4j_user,
         password=settings.neo4j_password,
     )
-    rag = RagCfg(embedding_model=settings.embed_model, llm_model="gpt-4o-mini", k=8)
-    graph_app = build_graph(neo4j, rag)
+    rag = RagCfg(
+        embedding_model=(
+            settings.local_embed_model
+            if settings.embed_backend == "local"
+            else settings.embed_model
+        ),
+        embedding_backend=settings.embed_backend,
+        embedding_dimensions=settings.embed_dimensions,
+        llm_model="gpt-4o-mini",
+        k=8,
+    )
+    graph_app = build_graph(neo4j, rag, init_driver())
     set_graph_app(graph_app)
     logger.info("Graph app initialized and ready for requests")
     
@@ -38,22 +48,22 @@ async def lifespan(app: FastAPI):
     
     # shutdown
     logger.info("Shutting down application...")
-    shutdown_driver()
+    await shutdown_driver()
 
 
 app = FastAPI(title="Agentic Research API", version="1.0.0", lifespan=lifespan)
 
 
 @app.get("/")
-def root():
+async def root():
     return {"status": "ok"}
 
 
 @app.get("/health/neo4j")
-def check_neo4j(session: Session = Depends(get_db)):
+async def check_neo4j(session: AsyncSession = Depends(get_db)):
     try:
-        result = session.run("RETURN 1 AS ok")
-        record = result.single()
+        result = await session.run("RETURN 1 AS ok")
+        record = await result.single()
 
         if record and record["ok"] == 1:
             logger.debug("Neo4j health check: OK")
@@ -18,10 +18,11 @@ def answer_node_factory(llm: ChatOpenAI):
         llm (ChatOpenAI): An instance of a language model client.
 
     Returns:
-        Callable: A function that takes AgentState and returns updated AgentState.
+        Callable: An async function that takes AgentState and returns updated
+            AgentState.
     """
 
-    def answer_node(state: AgentState) -> AgentState:
+    async def answer_node(state: AgentState) -> AgentState:
         try:
             hits = state.get("aggregated_results", [])
             if not hits:
@@ -51,7 +52,7 @@ def answer_node_factory(llm: ChatOpenAI):
                 "EXCERPTS:\n" + "\n".join(excerpt_blocks)
             )
 
-            response = llm.invoke(
+            response = await llm.ainvoke(
                 [
                     SystemMessage(content=ANSWER_SYSTEM),
                     HumanMessage(content=user_prompt),
@@ -1,5 +1,6 @@
+import asyncio
 import logging
-from typing import Any, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, List
 
 from app.config import RagCfg
 from app.models.agent_state import AgentState
@@ -8,9 +9,30 @@ logger = logging.getLogger(__name__)
 
 
 def retrieve_node_factory(
-    tools: Dict[str, Callable[[str], list]], rag: RagCfg
-) -> Callable[[AgentState], AgentState]:
-    def retrieve_node(state: AgentState) -> AgentState:
+    tools: Dict[str, Callable[[str], Awaitable[list]]], rag: RagCfg
+) -> Callable[[AgentState], Awaitable[AgentState]]:
+    async def run_tool(
+        tool_name: str, query: str, timed_out: List[str]
+    ) -> List[Dict[str, Any]]:
+        """One tool with its own timeout; a failure only loses its results."""
+        try:
+            results = await asyncio.wait_for(
+                tools[tool_name](query), timeout=rag.tool_timeout_s
+            )
+            if not isinstance(results, list):
+                raise TypeError(
+                    f"Tool '{tool_name}' must return a list, got {type(results)}"
+                )
+            logger.info(f"{tool_name}: Retrieved {len(results)} items")
+            return results[: rag.max_excerpts_in_prompt]
+        except asyncio.TimeoutError:
+            timed_out.append(tool_name)
+            logger.error(f"Tool '{tool_name}' timed out after {rag.tool_timeout_s}s")
+        except Exception as e:
+            logger.exception(f"Tool '{tool_name}' failed: {e}")
+        return []
+
+    async def retrieve_node(state: AgentState) -> AgentState:
         query = state.get("rewritten_question", state.get("question", ""))
         aggregated = []
 
@@ -24,25 +46,29 @@ def retrieve_node_factory(
                 "aggregated_results": [],
             }
         
-        # Use only the tools selected by route_node
-        tools_to_use = {
-            tool_name: tool_fn
-            for tool_name, tool_fn in tools.items()
-            if tool_name in selected_tools
-        }
-        logger.info(f"Using selected tools: {selected_tools}")
-
-        for tool_name, tool_fn in tools_to_use.items():
-            try:
-                results = tool_fn(query)
-                if not isinstance(results, list):
-                    raise TypeError(
-                        f"Tool '{tool_name}' must return a list, got {type(results)}"
-                    )
-                aggregated.extend(results[: rag.max_excerpts_in_prompt])
-                logger.info(f"{tool_name}: Retrieved {len(results)} items")
-            except Exception as e:
-                logger.exception(f"Tool '{tool_name}' failed: {e}")
+        # Use only the tools selected by route_node, in the router's order
+        tools_to_use = [
+            tool_name
+            for tool_name in dict.fromkeys(selected_tools)
+            if tool_name in tools
+        ]
+        unknown = [name for name in selected_tools if name not in tools]
+        if unknown:
+            logger.warning(f"Ignoring unknown tools selected by route_node: {unknown}")
+        logger.info(f"Using selected tools: {tools_to_use}")
+
+        # all tools at once; gather keeps the order of tools_to_use
+        timed_out: List[str] = []
+        per_tool = await asyncio.gather(
+            *(run_tool(tool_name, query, timed_out) for tool_name in tools_to_use)
+        )
+        if timed_out:
+            logger.warning(
+                f"{len(timed_out)} of {len(tools_to_use)} tools timed out after "
+                f"{rag.tool_timeout_s}s, answering without them: {timed_out}"
+            )
+        for results in per_tool:
+            aggregated.extend(results)
 
         return {
             **state,
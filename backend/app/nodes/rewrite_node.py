@@ -1,6 +1,6 @@
 import logging
 from datetime import datetime
-from typing import Callable
+from typing import Awaitable, Callable
 
 from app.models.agent_state import AgentState
 from app.prompts.rewrite_prompt import REWRITE_SYSTEM
@@ -10,13 +10,13 @@ from langchain_core.messages import (HumanMessage, SystemMessage,
 logger = logging.getLogger(__name__)
 
 
-def rewrite_node_factory(llm) -> Callable[[AgentState], AgentState]:
+def rewrite_node_factory(llm) -> Callable[[AgentState], Awaitable[AgentState]]:
     """
     Factory to create a rewrite node that reformulates the user question
     using chat history and available company names.
     """
 
-    def rewrite_node(state: AgentState) -> AgentState:
+    async def rewrite_node(state: AgentState) -> AgentState:
         try:
             question = state.get("question", "").strip()
             companies = state.get("available_companies", [])
@@ -29,7 +29,7 @@ def rewrite_node_factory(llm) -> Callable[[AgentState], AgentState]:
                 messages=messages,
             )
 
-            response = llm.invoke(
+            response = await llm.ainvoke(
                 [
                     SystemMessage(content=system_prompt),
                     HumanMessage(content=question),
@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import Callable
+from typing import Awaitable, Callable
 
 from app.models.agent_state import AgentState
 from app.prompts.router_prompt import ROUTER_SYSTEM
@@ -10,19 +10,21 @@ from langchain_openai import ChatOpenAI
 logger = logging.getLogger(__name__)
 
 
-def route_node_factory(llm: ChatOpenAI) -> Callable[[AgentState], AgentState]:
+def route_node_factory(
+    llm: ChatOpenAI,
+) -> Callable[[AgentState], Awaitable[AgentState]]:
     """
     Factory that returns a node which decides which tools to call next
     based on the rewritten or original question.
     """
 
-    def route_node(state: AgentState) -> AgentState:
+    async def route_node(state: AgentState) -> AgentState:
         try:
             question = state.get(
                 "rewritten_question", state.get("question", "")
             ).strip()
 
-            response = llm.invoke(
+            response = await llm.ainvoke(
                 [
                     SystemMessage(content=ROUTER_SYSTEM),
                     HumanMessage(content=f"Question: {question}"),
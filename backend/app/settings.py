@@ -15,6 +15,13 @@ class Settings(BaseSettings):
 
     # --- Models ---
     embed_model: str = Field("text-embedding-3-small", alias="EMBED_MODEL")
+    # "openai" or "local" (must match the backend used by the doc-pipeline)
+    embed_backend: str = Field("openai", alias="EMBED_BACKEND")
+    local_embed_model: str = Field(
+        "sentence-transformers/all-MiniLM-L6-v2", alias="LOCAL_EMBED_MODEL"
+    )
+    # shortened query vectors, must match EMBED_DIMENSIONS of the doc-pipeline
+    embed_dimensions: Optional[int] = Field(None, alias="EMBED_DIMENSIONS")
 
     # LangSmith (optional)
     langchain_tracing_v2: Optional[bool] = Field(None, alias="LANGCHAIN_TRACING_V2")
@@ -1,15 +1,15 @@
 import logging
-from typing import Any, Callable, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List
 
 from app.config import Neo4jCfg, RagCfg
-from langchain_openai import OpenAIEmbeddings
-from neo4j import Driver
+from langchain_core.embeddings import Embeddings
+from neo4j import AsyncDriver, AsyncSession
 
 logger = logging.getLogger(__name__)
 
 
-def _vector_query(
-    session,
+async def _vector_query(
+    session: AsyncSession,
     index_name: str,
     query_vector: List[float],
     k: int,
@@ -29,9 +29,10 @@ def _vector_query(
     ORDER BY score DESC
     LIMIT $k
     """
-    rows = session.run(
+    result = await session.run(
         q, {"index_name": index_name, "k": k, "vec": query_vector}
-    ).data()
+    )
+    rows = await result.data()
 
     results = [r for r in rows if (r.get("content") or "").strip()]
     logger.debug(f"Vector query on index '{index_name}': found {len(results)} results (requested k={k})")
@@ -42,17 +43,18 @@ def _vector_query(
 
 
 def make_tools(
-    driver: Driver, emb: OpenAIEmbeddings, cfg: Neo4jCfg, rag: RagCfg
-) -> Dict[str, Callable[[str], List[dict]]]:
+    driver: AsyncDriver, emb: Embeddings, cfg: Neo4jCfg, rag: RagCfg
+) -> Dict[str, Callable[[str], Awaitable[List[dict]]]]:
     """
-    Returns a dict of tool functions by index name (sync).
+    Returns a dict of tool functions by index name (async).
     """
 
-    def search_index(index_name: str, question: str) -> List[dict]:
+    async def search_index(index_name: str, question: str) -> List[dict]:
         logger.debug(f"Searching index '{index_name}' with query: '{question[:50]}...'")
-        vec = emb.embed_query(question)
-        with driver.session() as session:
-            results = _vector_query(
+        # OpenAIEmbeddings awaits the async client; local models run in a thread
+        vec = await emb.aembed_query(question)
+        async with driver.session() as session:
+            results = await _vector_query(
                 session,
                 index_name=index_name,
                 query_vector=vec,
@@ -0,0 +1,458 @@
+"""
+OpenAI Batch API for bulk (re-)ingest: the table descriptions and embeddings
+an ingest would request are sent as batch jobs (half the price, own rate
+limits, results within 24h) and written to the embedding / description
+caches. The regular ingest then runs on cache hits and only writes to Neo4j.
+
+Request files, uploaded file ids and batch ids are kept under
+CACHE_DIR/batches (state.json), so a run that is stopped while waiting picks
+the same batches up again instead of submitting them twice.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .cache import DescriptionCache, EmbeddingCache
+from .checkpoint import Checkpoint
+from .embeddings import EmbeddingProvider, OpenAIEmbeddingProvider
+from .llm_utils import TABLE_SYSTEM_PROMPT, TABLE_USER_PREFIX, approx_tokens
+from .manifest import DocumentManifest, file_sha256
+from .metrics import metrics
+from .process_json import (IngestConfig, ingest_fingerprint, peek_doc_id,
+                           stream_chunks)
+
+log = logging.getLogger(__name__)
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+EMBED_ENDPOINT = "/v1/embeddings"
+
+# Batch API limits per input file
+MAX_REQUESTS_PER_BATCH = 50_000
+MAX_EMBED_INPUTS_PER_BATCH = 50_000
+MAX_BATCH_BYTES = 190 * 1024 * 1024  # 200 MB minus headroom
+
+_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class _Collector:
+    """
+    Stands in for EmbeddingBatcher and the describe pool in stream_chunks and
+    records what ingest would send: tables without a cached description and
+    embedding inputs (texts and cached descriptions).
+
+    Tables longer than max_chars are left to ingest, which splits them and
+    merges the part descriptions (see describe_table).
+    """
+
+    def __init__(
+        self,
+        description_cache: DescriptionCache,
+        chat_model: str,
+        max_chars: int,
+        collect_embeddings: bool,
+    ) -> None:
+        self._cache = description_cache
+        self._chat_model = chat_model
+        self._max_chars = max_chars
+        self._collect_embeddings = collect_embeddings
+        # dicts as ordered sets: repeated tables / texts are requested once
+        self.tables: Dict[str, None] = {}
+        self.texts: Dict[str, None] = {}
+
+    def describe(self, table_markdown: str) -> Optional[str]:
+        md = (table_markdown or "").strip()
+        if not md or len(md) > self._max_chars:
+            return None
+        desc = self._cache.get(self._chat_model, TABLE_SYSTEM_PROMPT, md)
+        if desc is None:
+            self.tables[md] = None
+        return desc
+
+    def add(self, row: Dict[str, Any], embed_input: Optional[str]) -> None:
+        text = (embed_input or "").strip()
+        if text and self._collect_embeddings:
+            self.texts[text] = None
+
+
+def collect_requests(
+    json_files: Iterable[Path],
+    *,
+    driver,
+    embedder: EmbeddingProvider,
+    chat_model: str,
+    config: IngestConfig,
+    embed_cache: EmbeddingCache,
+    description_cache: DescriptionCache,
+    force: bool = False,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    max_chars: int = 12000,
+) -> Tuple[List[str], List[str]]:
+    """
+    Tables to describe and texts to embed for the files, skipping what the
+    manifest (and with resume, the checkpoints) says ingest won't touch and
+    what is cached already. Embeddings are only collected for OpenAI models.
+    """
+    collect_embeddings = isinstance(embedder, OpenAIEmbeddingProvider)
+    collector = _Collector(
+        description_cache, chat_model, max_chars, collect_embeddings
+    )
+    fingerprint = ingest_fingerprint(embedder, chat_model, config)
+    for json_path in json_files:
+        doc_id = peek_doc_id(json_path)
+        if doc_id is None:
+            continue
+        source_hash = file_sha256(json_path, fingerprint)
+        manifest = DocumentManifest(
+            driver, doc_id, fingerprint=fingerprint, force=force
+        )
+        if manifest.is_source_unchanged(source_hash):
+            continue
+        if resume and checkpoint_dir is not None:
+            manifest.resume_from(
+                Checkpoint(checkpoint_dir, json_path, source_hash).load()
+            )
+        stream_chunks(
+            json_path,
+            batcher=collector,
+            describe=collector.describe,
+            manifest=manifest,
+        )
+
+    texts = list(collector.texts)
+    missing: List[str] = []
+    for i in range(0, len(texts), 1000):
+        part = texts[i : i + 1000]
+        cached = embed_cache.get_many(embedder.model, part, embedder.dimensions)
+        missing.extend(t for t, v in zip(part, cached) if v is None)
+    return list(collector.tables), missing
+
+
+def _describe_requests(tables: List[str], chat_model: str) -> List[Dict[str, Any]]:
+    # same request describe_table sends
+    return [
+        {
+            "custom_id": f"describe-{i}",
+            "method": "POST",
+            "url": CHAT_ENDPOINT,
+            "body": {
+                "model": chat_model,
+                "temperature": 0.0,
+                "messages": [
+                    {"role": "system", "content": TABLE_SYSTEM_PROMPT},
+                    {"role": "user", "content": TABLE_USER_PREFIX + md},
+                ],
+            },
+        }
+        for i, md in enumerate(tables)
+    ]
+
+
+def _embed_requests(
+    texts: List[str], embedder: OpenAIEmbeddingProvider, config: IngestConfig
+) -> List[Dict[str, Any]]:
+    """Inputs grouped like EmbeddingBatcher groups them."""
+    groups: List[List[str]] = []
+    tokens = 0
+    for text in texts:
+        n = approx_tokens(text)
+        if groups and (
+            len(groups[-1]) < config.embed_batch_size
+            and tokens + n <= config.embed_batch_max_tokens
+        ):
+            groups[-1].append(text)
+            tokens += n
+        else:
+            groups.append([text])
+            tokens = n
+    body_extra = {"dimensions": embedder.dimensions} if embedder.dimensions else {}
+    return [
+        {
+            "custom_id": f"embed-{i}",
+            "method": "POST",
+            "url": EMBED_ENDPOINT,
+            "body": {"model": embedder.model, "input": group, **body_extra},
+        }
+        for i, group in enumerate(groups)
+    ]
+
+
+def _split_files(requests: List[Dict[str, Any]]) -> List[List[str]]:
+    """JSONL lines per batch input file, within the Batch API limits."""
+    files: List[List[str]] = [[]]
+    size = inputs = 0
+    for req in requests:
+        line = json.dumps(req, ensure_ascii=False)
+        n_inputs = len(req["body"].get("input", ()))
+        if files[-1] and (
+            len(files[-1]) >= MAX_REQUESTS_PER_BATCH
+            or size + len(line.encode("utf-8")) + 1 > MAX_BATCH_BYTES
+            or inputs + n_inputs > MAX_EMBED_INPUTS_PER_BATCH
+        ):
+            files.append([])
+            size = inputs = 0
+        files[-1].append(line)
+        size += len(line.encode("utf-8")) + 1
+        inputs += n_inputs
+    return [f for f in files if f]
+
+
+class BatchState:
+    """The batches of the current round, persisted after every change."""
+
+    def __init__(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.path = directory / "state.json"
+        self.round = 0
+        self.jobs: List[Dict[str, Any]] = []
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.round = data.get("round", 0)
+            self.jobs = data.get("jobs", [])
+
+    def save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(
+            json.dumps({"round": self.round, "jobs": self.jobs}, indent=2),
+            encoding="utf-8",
+        )
+        tmp_path.replace(self.path)
+
+
+def _write_jobs(
+    state: BatchState, requests: List[Dict[str, Any]], endpoint: str
+) -> None:
+    kind = "describe" if endpoint == CHAT_ENDPOINT else "embed"
+    for i, lines in enumerate(_split_files(requests)):
+        path = state.directory / f"round{state.round}-{kind}-{i}.jsonl"
+        path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+        state.jobs.append(
+            {
+                "path": str(path),
+                "endpoint": endpoint,
+                "requests": len(lines),
+                "file_id": None,
+                "batch_id": None,
+                "status": None,
+                "applied": False,
+            }
+        )
+    state.save()
+
+
+def _submit(client, state: BatchState) -> None:
+    """Uploads and creates the batches that don't have an id yet."""
+    for job in state.jobs:
+        if job["batch_id"] is not None:
+            continue
+        if job["file_id"] is None:
+            with open(job["path"], "rb") as f:
+                job["file_id"] = client.files.create(file=f, purpose="batch").id
+            state.save()
+        batch = client.batches.create(
+            input_file_id=job["file_id"],
+            endpoint=job["endpoint"],
+            completion_window="24h",
+        )
+        job["batch_id"] = batch.id
+        job["status"] = batch.status
+        state.save()
+        metrics.count("batch_requests", job["requests"])
+        log.info(
+            "Submitted batch %s: %d %s requests",
+            batch.id,
+            job["requests"],
+            job["endpoint"],
+        )
+
+
+def _read_requests(path: Path) -> Dict[str, Dict[str, Any]]:
+    with path.open(encoding="utf-8") as f:
+        return {
+            req["custom_id"]: req["body"] for req in map(json.loads, f) if req
+        }
+
+
+def _apply_results(
+    client,
+    job: Dict[str, Any],
+    output_file_id: str,
+    *,
+    embedder: EmbeddingProvider,
+    embed_cache: EmbeddingCache,
+    description_cache: DescriptionCache,
+) -> int:
+    """Writes the successful responses to the caches; returns how many."""
+    requests = _read_requests(Path(job["path"]))
+    applied = 0
+    content = client.files.content(output_file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        body = requests.get(result["custom_id"])
+        response = result.get("response") or {}
+        if body is None or result.get("error") or response.get("status_code") != 200:
+            continue
+        out = response["body"]
+        if job["endpoint"] == CHAT_ENDPOINT:
+            md = body["messages"][1]["content"][len(TABLE_USER_PREFIX) :]
+            desc = out["choices"][0]["message"]["content"].strip()
+            description_cache.put(body["model"], TABLE_SYSTEM_PROMPT, md, desc)
+            metrics.count("batch_descriptions")
+        else:
+            data = sorted(out["data"], key=lambda d: d["index"])
+            if len(data) != len(body["input"]):
+                continue
+            embed_cache.put_many(
+                embedder.model,
+                body["input"],
+                [d["embedding"] for d in data],
+                embedder.dimensions,
+            )
+            metrics.count("batch_embeddings", len(data))
+        applied += 1
+    return applied
+
+
+def _wait(
+    client,
+    state: BatchState,
+    poll_interval: float,
+    **caches,
+) -> None:
+    """Polls until every batch is final and applies each one as it finishes."""
+    with metrics.timer("batch_wait"):
+        while True:
+            open_jobs = [job for job in state.jobs if not job["applied"]]
+            if not open_jobs:
+                return
+            for job in open_jobs:
+                batch = client.batches.retrieve(job["batch_id"])
+                job["status"] = batch.status
+                if batch.status not in _FINAL_STATUSES:
+                    counts = batch.request_counts
+                    log.info(
+                        "Batch %s %s: %s/%s requests done",
+                        batch.id,
+                        batch.status,
+                        getattr(counts, "completed", "?"),
+                        getattr(counts, "total", "?"),
+                    )
+                    continue
+                # expired / cancelled batches still return what finished
+                applied = 0
+                if batch.output_file_id:
+                    applied = _apply_results(
+                        client, job, batch.output_file_id, **caches
+                    )
+                failed = job["requests"] - applied
+                if batch.status != "completed":
+                    log.warning(
+                        "Batch %s %s: %s", batch.id, batch.status, batch.errors
+                    )
+                metrics.count("batch_requests_failed", failed)
+                job["applied"] = True
+                state.save()
+                log.info("Batch %s done (%d failed requests)", batch.id, failed)
+            if any(not job["applied"] for job in state.jobs):
+                time.sleep(poll_interval)
+
+
+def prefill_caches(
+    json_files: Iterable[Path],
+    *,
+    client,
+    driver,
+    embedder: EmbeddingProvider,
+    chat_model: str,
+    config: IngestConfig,
+    embed_cache: Optional[EmbeddingCache],
+    description_cache: Optional[DescriptionCache],
+    batch_dir: Path,
+    force: bool = False,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    poll_interval: float = 60.0,
+    max_rounds: int = 3,
+) -> Dict[str, int]:
+    """
+    Fills the caches through the Batch API, in rounds: descriptions and text
+    embeddings first, then the embeddings of the new descriptions, then
+    retries of failed requests. Whatever is still missing afterwards is
+    requested by ingest as usual.
+    """
+    if embed_cache is None or description_cache is None:
+        raise ValueError("The Batch API mode needs the embedding/description caches")
+    json_files = list(json_files)
+    state = BatchState(batch_dir)
+    caches = dict(
+        embedder=embedder,
+        embed_cache=embed_cache,
+        description_cache=description_cache,
+    )
+    if state.jobs:
+        log.info(
+            "Resuming %d batches of round %d from %s",
+            len(state.jobs),
+            state.round,
+            state.path,
+        )
+
+    # the same requests missing twice in a row: the batches can't get them
+    last_requests = None
+    rounds = 0
+    while True:
+        if not state.jobs:
+            tables, texts = collect_requests(
+                json_files,
+                driver=driver,
+                embedder=embedder,
+                chat_model=chat_model,
+                config=config,
+                embed_cache=embed_cache,
+                description_cache=description_cache,
+                force=force,
+                checkpoint_dir=checkpoint_dir,
+                resume=resume,
+            )
+            missing = len(tables) + len(texts)
+            log.info(
+                "Batch API: %d tables to describe, %d texts to embed",
+                len(tables),
+                len(texts),
+            )
+            if missing == 0:
+                break
+            requests = (tables, texts)
+            if rounds >= max_rounds or requests == last_requests:
+                log.warning(
+                    "Batch API: %d requests still missing after %d rounds; "
+                    "ingest sends them directly",
+                    missing,
+                    rounds,
+                )
+                break
+            last_requests = requests
+            state.round += 1
+            if tables:
+                _write_jobs(
+                    state, _describe_requests(tables, chat_model), CHAT_ENDPOINT
+                )
+            if texts:
+                _write_jobs(
+                    state, _embed_requests(texts, embedder, config), EMBED_ENDPOINT
+                )
+        _submit(client, state)
+        _wait(client, state, poll_interval, **caches)
+        for job in state.jobs:
+            Path(job["path"]).unlink(missing_ok=True)
+        state.jobs = []
+        state.save()
+        rounds += 1
+
+    return {"rounds": rounds}
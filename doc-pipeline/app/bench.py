@@ -0,0 +1,518 @@
+"""
+Offline ingest benchmark: synthetic chunk files, a fake OpenAI client and a
+Neo4j stand-in that records the Cypher it is sent. No API key or database
+needed, so batching/concurrency changes can be compared run against run.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from openai import RateLimitError
+
+from .batch_api import prefill_caches
+from .cache import DescriptionCache, EmbeddingCache
+from .embeddings import OpenAIEmbeddingProvider
+from .metrics import metrics
+from .process_json import IngestConfig, process_all_jsons
+from .rate_limit import RateLimiter
+from .utils import CHUNKS_JSON_SUFFIX, CHUNKS_JSONL_SUFFIX
+
+log = logging.getLogger(__name__)
+
+_WORDS = (
+    "revenue operating margin vehicle deliveries quarter fiscal year growth "
+    "cash flow guidance capital expenditure battery production capacity "
+    "segment automotive financial services net income dividend outlook"
+).split()
+
+
+@dataclass(frozen=True)
+class BenchConfig:
+    files: int = 4
+    chunks_per_file: int = 500
+    table_every: int = 10  # every n-th chunk is a table, 0 = none
+    words_per_chunk: int = 180
+    fmt: str = "json"
+    dims: int = 1536
+    embed_latency: float = 0.05  # seconds per embeddings request
+    chat_latency: float = 0.3  # seconds per table description
+    write_latency: float = 0.005  # seconds per write transaction
+    rate_limit_rate: float = 0.0  # share of API requests answered with a 429
+    retry_after: float = 0.05
+    seed: int = 1
+
+
+# ---------- synthetic input ----------
+
+
+def _chunk(doc: str, i: int, rng: random.Random, cfg: BenchConfig) -> Dict[str, Any]:
+    page = 1 + i // 8
+    if cfg.table_every and i % cfg.table_every == cfg.table_every - 1:
+        rows = [
+            f"| {rng.choice(_WORDS)} | {rng.randint(1, 99_999):,} | "
+            f"{rng.uniform(-20, 40):.1f}% |"
+            for _ in range(12)
+        ]
+        text = "| Metric | Value | Change |\n|---|---|---|\n" + "\n".join(rows)
+        label, ref = "table", f"#/tables/{i}"
+    else:
+        text = " ".join(rng.choice(_WORDS) for _ in range(cfg.words_per_chunk))
+        label, ref = "text", f"#/texts/{i}"
+    return {
+        "text": text,
+        "meta": {
+            "origin": {"filename": doc},
+            "doc_items": [
+                {"label": label, "self_ref": ref, "prov": [{"page_no": page}]}
+            ],
+        },
+    }
+
+
+def write_synthetic_chunks(out_dir: Path, cfg: BenchConfig) -> List[Path]:
+    """Chunk files shaped like the output of `convert` (slim metadata)."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(cfg.seed)
+    paths = []
+    for f in range(cfg.files):
+        doc = f"Bench_{f:03d}.pdf"
+        chunks = [_chunk(doc, i, rng, cfg) for i in range(cfg.chunks_per_file)]
+        if cfg.fmt == "jsonl":
+            path = out_dir / (Path(doc).stem + CHUNKS_JSONL_SUFFIX)
+            path.write_text(
+                "".join(json.dumps(c) + "\n" for c in chunks), encoding="utf-8"
+            )
+        else:
+            path = out_dir / (Path(doc).stem + CHUNKS_JSON_SUFFIX)
+            path.write_text(json.dumps({"chunks": chunks}), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+# ---------- fake OpenAI ----------
+
+
+class FakeOpenAI:
+    """
+    Just enough of the OpenAI client for ingest: embeddings.create and
+    chat.completions.create. Vectors are derived from the input text, so runs
+    are deterministic; a share of requests can fail with a 429.
+
+    files / batches cover ingest --batch-api: a batch is answered when it is
+    created (no latency, no 429s) and reported completed on the first retrieve.
+    """
+
+    def __init__(self, cfg: BenchConfig) -> None:
+        self.cfg = cfg
+        self._rng = random.Random(cfg.seed)
+        self._lock = threading.Lock()
+        self.embed_requests = 0
+        self.embed_inputs = 0
+        self.chat_requests = 0
+        self.rate_limited = 0
+        self.batch_requests = 0
+        self._files: Dict[str, bytes] = {}
+        self._batches: Dict[str, SimpleNamespace] = {}
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.files = SimpleNamespace(
+            create=self._file_create, content=self._file_content
+        )
+        self.batches = SimpleNamespace(
+            create=self._batch_create, retrieve=self._batch_retrieve
+        )
+
+    def _maybe_429(self) -> None:
+        with self._lock:
+            hit = self._rng.random() < self.cfg.rate_limit_rate
+            if hit:
+                self.rate_limited += 1
+        if hit:
+            # duck-typed httpx.Response: all RateLimitError and _retry read
+            response = SimpleNamespace(
+                status_code=429,
+                headers={"retry-after-ms": str(int(self.cfg.retry_after * 1000))},
+                request=None,
+            )
+            raise RateLimitError(
+                "Rate limit reached (bench)", response=response, body=None
+            )
+
+    def _vector(self, text: str, dims: int) -> List[float]:
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        seed = int.from_bytes(digest, "big")
+        rng = random.Random(seed)
+        return [rng.uniform(-1.0, 1.0) for _ in range(dims)]
+
+    @staticmethod
+    def _describe(messages) -> str:
+        lines = messages[-1]["content"].count("\n")
+        return f"Synthetic description of a table with {lines} lines."
+
+    def _embed(self, model: str, input, dimensions: Optional[int] = None, **kw):
+        time.sleep(self.cfg.embed_latency)
+        self._maybe_429()
+        texts = input if isinstance(input, list) else [input]
+        with self._lock:
+            self.embed_requests += 1
+            self.embed_inputs += len(texts)
+        dims = dimensions or self.cfg.dims
+        data = [
+            SimpleNamespace(index=i, embedding=self._vector(t, dims))
+            for i, t in enumerate(texts)
+        ]
+        return SimpleNamespace(data=data)
+
+    def _chat(self, model: str, messages, **kw):
+        time.sleep(self.cfg.chat_latency)
+        self._maybe_429()
+        with self._lock:
+            self.chat_requests += 1
+        desc = self._describe(messages)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=desc))]
+        )
+
+    def _file_create(self, file, purpose: str, **kw):
+        with self._lock:
+            file_id = f"file-{len(self._files)}"
+            self._files[file_id] = file.read()
+        return SimpleNamespace(id=file_id)
+
+    def _file_content(self, file_id: str):
+        return SimpleNamespace(text=self._files[file_id].decode("utf-8"))
+
+    def _batch_response(self, url: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        if url == "/v1/embeddings":
+            dims = body.get("dimensions") or self.cfg.dims
+            return {
+                "data": [
+                    {"index": i, "embedding": self._vector(t, dims)}
+                    for i, t in enumerate(body["input"])
+                ]
+            }
+        desc = self._describe(body["messages"])
+        return {"choices": [{"message": {"content": desc}}]}
+
+    def _batch_create(self, input_file_id: str, endpoint: str, **kw):
+        requests = [
+            json.loads(line)
+            for line in self._files[input_file_id].decode("utf-8").splitlines()
+        ]
+        output = "".join(
+            json.dumps(
+                {
+                    "custom_id": req["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": self._batch_response(req["url"], req["body"]),
+                    },
+                    "error": None,
+                }
+            )
+            + "\n"
+            for req in requests
+        )
+        with self._lock:
+            self.batch_requests += len(requests)
+            output_file_id = f"file-{len(self._files)}"
+            self._files[output_file_id] = output.encode("utf-8")
+            batch = SimpleNamespace(
+                id=f"batch-{len(self._batches)}",
+                status="validating",
+                output_file_id=None,
+                errors=None,
+                request_counts=SimpleNamespace(
+                    total=len(requests), completed=0, failed=0
+                ),
+            )
+            self._batches[batch.id] = batch
+        batch.pending_output = output_file_id
+        return batch
+
+    def _batch_retrieve(self, batch_id: str):
+        batch = self._batches[batch_id]
+        batch.status = "completed"
+        batch.output_file_id = batch.pending_output
+        batch.request_counts.completed = batch.request_counts.total
+        return batch
+
+
+# ---------- Neo4j stand-in ----------
+
+
+class _Result:
+    def consume(self) -> None:
+        return None
+
+    def single(self) -> None:
+        return None
+
+    def data(self) -> list:
+        return []
+
+
+class RecordingDriver:
+    """
+    Neo4j driver stand-in: every statement is recorded (Cypher plus the size
+    of each list parameter) and reads return nothing, i.e. an empty graph.
+    """
+
+    def __init__(self, write_latency: float = 0.0, record: Optional[Path] = None):
+        self.write_latency = write_latency
+        self._lock = threading.Lock()
+        self._record = record.open("w", encoding="utf-8") if record else None
+        self.statements = 0
+        self.write_tx = 0
+        self.rows_written = 0
+
+    def _log(self, cypher: str, params: Dict[str, Any]) -> None:
+        summary = {k: len(v) if isinstance(v, list) else v for k, v in params.items()}
+        with self._lock:
+            self.statements += 1
+            self.rows_written += sum(
+                len(v) for v in params.values() if isinstance(v, list)
+            )
+            if self._record is not None:
+                self._record.write(
+                    json.dumps({"cypher": " ".join(cypher.split()), "params": summary})
+                    + "\n"
+                )
+
+    def run(self, cypher: str, parameters: Optional[Dict[str, Any]] = None, **kw):
+        self._log(cypher, {**(parameters or {}), **kw})
+        return _Result()
+
+    def execute_write(self, fn, *args, **kwargs):
+        time.sleep(self.write_latency)
+        with self._lock:
+            self.write_tx += 1
+        return fn(self, *args, **kwargs)
+
+    execute_read = execute_write
+
+    def session(self, **kw) -> "RecordingDriver":
+        return self
+
+    def __enter__(self) -> "RecordingDriver":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def close(self) -> None:
+        if self._record is not None:
+            self._record.close()
+            self._record = None
+
+
+# ---------- import time ----------
+
+# what each command imports before doing any work, mirroring cli._run
+# (app.config is left out: it needs credentials; pydantic_settings stands in)
+_COMMAND_IMPORTS = {
+    "ingest": (
+        "cli", "process_json", "neo4j_io", "embeddings", "cache", "rate_limit"
+    ),
+    "indexes": ("cli", "indexes", "neo4j_io", "embeddings", "rate_limit"),
+}
+_HEAVY_MODULES = (
+    "docling",
+    "docling_core",
+    "transformers",
+    "torch",
+    "sentence_transformers",
+)
+# `indexes` should not even load the OpenAI SDK
+_FORBIDDEN_EXTRA = {"indexes": ("openai",)}
+
+_IMPORT_SCRIPT = """
+import importlib, json, sys, time
+t0 = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+seconds = time.perf_counter() - t0
+print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))
+"""
+
+
+def _time_imports(modules: List[str]) -> Dict[str, Any]:
+    root = Path(__file__).resolve().parents[1]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (str(root), env.get("PYTHONPATH")) if p
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_SCRIPT, *modules],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if out.returncode != 0:
+        raise RuntimeError(f"import check failed:\n{out.stderr.strip()}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def check_import_times(budget: float, repeats: int = 3) -> Dict[str, Any]:
+    """
+    Imports each command's modules in a fresh interpreter (best of `repeats`)
+    and checks the time against `budget` seconds and that no heavy module
+    (docling, transformers, torch, ...) came along.
+    """
+    package = __package__ or "app"
+    commands = {}
+    for cmd, names in _COMMAND_IMPORTS.items():
+        modules = ["pydantic_settings", *(f"{package}.{n}" for n in names)]
+        runs = [_time_imports(modules) for _ in range(repeats)]
+        seconds = min(r["seconds"] for r in runs)
+        forbidden = _HEAVY_MODULES + _FORBIDDEN_EXTRA.get(cmd, ())
+        heavy_roots = sorted(
+            {m.split(".")[0] for m in runs[0]["modules"]} & set(forbidden)
+        )
+        ok = seconds <= budget and not heavy_roots
+        commands[cmd] = {
+            "seconds": round(seconds, 3),
+            "heavy_modules": heavy_roots,
+            "ok": ok,
+        }
+        (log.info if ok else log.error)(
+            "import %s: %.2fs (budget %.2fs)%s",
+            cmd,
+            seconds,
+            budget,
+            f", pulls in {', '.join(heavy_roots)}" if heavy_roots else "",
+        )
+    return {
+        "budget_seconds": budget,
+        "ok": all(c["ok"] for c in commands.values()),
+        "commands": commands,
+    }
+
+
+# ---------- run ----------
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_bench(
+    cfg: BenchConfig = BenchConfig(),
+    ingest: IngestConfig = IngestConfig(),
+    data_dir: Optional[Path] = None,
+    record: Optional[Path] = None,
+    batch_api: bool = False,
+) -> Dict[str, Any]:
+    """
+    Ingests synthetic chunk files against the fakes and returns throughput,
+    API calls, write transactions and peak RSS. batch_api: fill fresh caches
+    through the fake Batch API first, as ingest --batch-api does.
+    """
+    tmp = None
+    if data_dir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="doc-pipeline-bench-")
+        data_dir = Path(tmp.name)
+    # caches only for batch_api, never reused between runs
+    cache_tmp = tempfile.TemporaryDirectory(prefix="doc-pipeline-bench-cache-")
+    try:
+        json_files = write_synthetic_chunks(data_dir, cfg)
+        client = FakeOpenAI(cfg)
+        driver = RecordingDriver(cfg.write_latency, record)
+        embedder = OpenAIEmbeddingProvider(client, "bench-embed", RateLimiter())
+        caches = {}
+        if batch_api:
+            cache_dir = Path(cache_tmp.name)
+            caches = dict(
+                embed_cache=EmbeddingCache(cache_dir / "embeddings.sqlite"),
+                description_cache=DescriptionCache(cache_dir / "descriptions.sqlite"),
+            )
+        chunks_before = metrics.get("chunks_written")
+
+        t0 = time.perf_counter()
+        if batch_api:
+            prefill_caches(
+                json_files,
+                client=client,
+                driver=driver,
+                embedder=embedder,
+                chat_model="bench-chat",
+                config=ingest,
+                batch_dir=Path(cache_tmp.name) / "batches",
+                force=True,
+                poll_interval=0.0,
+                **caches,
+            )
+        batch_seconds = time.perf_counter() - t0
+        process_all_jsons(
+            data_dir,
+            client=client,
+            chat_model="bench-chat",
+            embed_model="bench-embed",
+            driver=driver,
+            config=ingest,
+            chat_limiter=RateLimiter(),
+            embedder=embedder,
+            force=True,
+            **caches,
+        )
+        seconds = time.perf_counter() - t0
+        driver.close()
+        for cache in caches.values():
+            cache.close()
+    finally:
+        cache_tmp.cleanup()
+        if tmp is not None:
+            tmp.cleanup()
+
+    chunks = metrics.get("chunks_written") - chunks_before
+    result = {
+        "bench": asdict(cfg),
+        "ingest_config": asdict(ingest),
+        "ingest_seconds": round(seconds, 3),
+        "batch_seconds": round(batch_seconds, 3) if batch_api else None,
+        "chunks": chunks,
+        "chunks_per_second": round(chunks / seconds, 1) if seconds else None,
+        "api_calls": {
+            "embeddings": client.embed_requests,
+            "embedding_inputs": client.embed_inputs,
+            "chat": client.chat_requests,
+            "rate_limited": client.rate_limited,
+            "batch_requests": client.batch_requests,
+        },
+        "neo4j": {
+            "write_transactions": driver.write_tx,
+            "statements": driver.statements,
+            "rows": driver.rows_written,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    log.info(
+        "bench: %d chunks in %.2fs (%.1f chunks/s), %d embedding + %d chat calls, "
+        "%d write tx, peak RSS %s MB",
+        chunks,
+        seconds,
+        result["chunks_per_second"] or 0.0,
+        client.embed_requests,
+        client.chat_requests,
+        driver.write_tx,
+        result["peak_rss_mb"],
+    )
+    return result
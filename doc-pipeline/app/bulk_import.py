@@ -0,0 +1,337 @@
+"""
+Export for `neo4j-admin database import full`: Document, Chunk, HAS_CHUNK and
+DUPLICATE_OF as CSV, with the same chunk ids, hashes and brand labels the
+transactional ingest writes, so a later `ingest` sees the imported documents
+as unchanged.
+"""
+
+import csv
+import gzip
+import logging
+import shlex
+import sys
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, TextIO
+
+from .cache import DescriptionCache, EmbeddingCache
+from .embeddings import EmbeddingProvider
+from .indexes import brand_label, brand_of
+from .manifest import DocumentManifest, file_sha256
+from .metrics import metrics
+from .process_json import (IngestConfig, embed_and_write, ingest_fingerprint,
+                           peek_doc_id, run_files)
+from .rate_limit import RateLimiter
+from .utils import find_chunk_files
+
+if TYPE_CHECKING:
+    from .dedup import DedupIndex
+
+log = logging.getLogger(__name__)
+
+# neo4j-admin defaults: "," between fields, ";" inside arrays
+ARRAY_DELIMITER = ";"
+# import.sh retries `indexes` while the restarted Neo4j comes up
+INDEXES_ATTEMPTS = 30
+INDEXES_RETRY_SECONDS = 10
+
+DOCUMENT_HEADER = [
+    "id:ID(Document)",
+    ":LABEL",
+    "source_hash",
+    "created_at:datetime",
+    "ingested_at:datetime",
+]
+# (header, row key) of the Chunk properties between id/labels and updated_at
+CHUNK_PROPERTIES = [
+    ("type", "type"),
+    ("text", "text"),
+    ("table_ref", "table_ref"),
+    ("table_markdown", "table_markdown"),
+    ("table_description", "table_description"),
+    ("embedding:{embedding_type}[]", "embedding"),
+    ("page_nos:long[]", "page_nos"),
+    ("content_hash", "content_hash"),
+    ("brand", "brand"),
+    ("duplicate_of", "duplicate_of"),
+]
+HAS_CHUNK_HEADER = [":START_ID(Document)", ":END_ID(Chunk)", ":TYPE"]
+DUPLICATE_OF_HEADER = [":START_ID(Chunk)", ":END_ID(Chunk)", ":TYPE"]
+
+
+def _array(values: Optional[List[Any]], float_format: str) -> Optional[str]:
+    if values is None:
+        return None
+    return ARRAY_DELIMITER.join(
+        format(v, float_format) if isinstance(v, float) else str(v) for v in values
+    )
+
+
+class ImportCsvWriter:
+    """
+    Drop-in for ChunkWriter (add/flush) that appends rows to gzipped CSV
+    files in the neo4j-admin layout instead of writing to Neo4j. Thread-safe,
+    so files can be exported with --jobs.
+
+    Float vectors are written with 9 significant digits (exact for float32),
+    int8 vectors as integers.
+    """
+
+    def __init__(self, out_dir: Path, embedding_storage: str = "float32") -> None:
+        self.out_dir = out_dir
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._float_format = ".9g"
+        embedding_type = "long" if embedding_storage == "int8" else "double"
+        self._now = datetime.now(timezone.utc).isoformat()
+        self._files: Dict[str, TextIO] = {}
+        self._writers: Dict[str, Any] = {}
+        chunk_header = [
+            "id:ID(Chunk)",
+            ":LABEL",
+            *(h.format(embedding_type=embedding_type) for h, _ in CHUNK_PROPERTIES),
+            "updated_at:datetime",
+        ]
+        for name, header in (
+            ("documents", DOCUMENT_HEADER),
+            ("chunks", chunk_header),
+            ("has_chunk", HAS_CHUNK_HEADER),
+            ("duplicate_of", DUPLICATE_OF_HEADER),
+        ):
+            with (out_dir / f"{name}_header.csv").open(
+                "w", encoding="utf-8", newline=""
+            ) as f:
+                csv.writer(f).writerow(header)
+            self._files[name] = gzip.open(
+                out_dir / f"{name}.csv.gz", "wt", encoding="utf-8", newline=""
+            )
+            self._writers[name] = csv.writer(self._files[name])
+        self._doc_ids: Set[str] = set()
+        self._chunk_ids: Set[str] = set()
+        # documents with a duplicate whose canonical chunk was not exported
+        self._unfinished_docs: Set[str] = set()
+        self.documents = 0
+        self.chunks = 0
+
+    def add(self, row: Dict[str, Any]) -> None:
+        brand = brand_of(row["doc_id"])
+        labels = ["Chunk"] + ([brand_label(brand)] if brand else [])
+        with self._lock:
+            # neo4j-admin rejects the whole import on a repeated node id
+            if row["chunk_id"] in self._chunk_ids:
+                log.warning("Skipping repeated chunk id %s", row["chunk_id"])
+                metrics.count("chunks_skipped_repeated_id")
+                return
+            self._chunk_ids.add(row["chunk_id"])
+            duplicate_of = row.get("duplicate_of")
+            if duplicate_of and duplicate_of not in self._chunk_ids:
+                # the canonical chunk failed (or is in a file still being
+                # exported): --skip-bad-relationships would drop the link, so
+                # keep the text, no hash, and leave the document unfinished
+                log.warning(
+                    "Chunk %s keeps its text, canonical %s was not exported",
+                    row["chunk_id"],
+                    duplicate_of,
+                )
+                row = {**row, "duplicate_of": None, "content_hash": None}
+                self._unfinished_docs.add(row["doc_id"])
+                duplicate_of = None
+            values = {**row, "brand": brand}
+            if duplicate_of:
+                # the canonical chunk holds the content, as with ChunkWriter
+                values.update(text=None, table_markdown=None)
+            props = [
+                _array(v, self._float_format) if isinstance(v, list) else v
+                for v in (values.get(key) for _, key in CHUNK_PROPERTIES)
+            ]
+            self._writers["chunks"].writerow(
+                [row["chunk_id"], ARRAY_DELIMITER.join(labels), *props, self._now]
+            )
+            self._writers["has_chunk"].writerow(
+                [row["doc_id"], row["chunk_id"], "HAS_CHUNK"]
+            )
+            if duplicate_of:
+                self._writers["duplicate_of"].writerow(
+                    [row["chunk_id"], duplicate_of, "DUPLICATE_OF"]
+                )
+            self.chunks += 1
+        metrics.count("chunks_written")
+        if duplicate_of:
+            metrics.count("chunks_duplicate")
+
+    def flush(self) -> None:
+        """Rows go straight to the files; nothing is buffered per batch."""
+
+    def add_document(self, doc_id: str, source_hash: Optional[str]) -> None:
+        """source_hash None: the next `ingest` processes the document again."""
+        with self._lock:
+            if doc_id in self._doc_ids:
+                log.warning("Skipping repeated document id %s", doc_id)
+                return
+            self._doc_ids.add(doc_id)
+            if doc_id in self._unfinished_docs:
+                source_hash = None
+            self._writers["documents"].writerow(
+                [doc_id, "Document", source_hash, self._now, self._now]
+            )
+            self.documents += 1
+
+    def close(self) -> None:
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+
+    def import_command(self, database: str = "neo4j") -> List[str]:
+        d = self.out_dir.resolve()
+        return [
+            "neo4j-admin",
+            "database",
+            "import",
+            "full",
+            database,
+            "--overwrite-destination",
+            "--multiline-fields=true",
+            f"--array-delimiter={ARRAY_DELIMITER}",
+            # DUPLICATE_OF to a chunk that failed to embed
+            "--skip-bad-relationships",
+            *(
+                f"--nodes={d / f'{name}_header.csv'},{d / f'{name}.csv.gz'}"
+                for name in ("documents", "chunks")
+            ),
+            *(
+                f"--relationships={d / f'{name}_header.csv'},{d / f'{name}.csv.gz'}"
+                for name in ("has_chunk", "duplicate_of")
+            ),
+        ]
+
+    def write_import_script(self, database: str = "neo4j") -> Path:
+        """
+        import.sh imports the CSVs, then runs `indexes` from the current
+        directory (where .env is) until Neo4j is up; the imported graph has
+        no constraints or vector indexes, so it exits non-zero if that fails.
+        """
+        script = self.out_dir / "import.sh"
+        cmd = " \\\n    ".join(shlex.quote(a) for a in self.import_command(database))
+        indexes = f"{shlex.quote(sys.executable)} -m app.cli indexes"
+        script.write_text(
+            "#!/bin/sh\n"
+            "set -e\n"
+            "# 1. with Neo4j stopped (this replaces the database):\n"
+            f"{cmd}\n"
+            "# 2. start Neo4j: runs NEO4J_START_CMD if set, else waits for it\n"
+            'if [ -n "$NEO4J_START_CMD" ]; then sh -c "$NEO4J_START_CMD"; fi\n'
+            "# 3. constraints and vector indexes\n"
+            f"cd {shlex.quote(str(Path.cwd().resolve()))}\n"
+            "tries=0\n"
+            f"until {indexes}; do\n"
+            "    tries=$((tries + 1))\n"
+            f'    if [ "$tries" -ge {INDEXES_ATTEMPTS} ]; then\n'
+            "        echo 'import.sh: indexes failed; vector search does not work"
+            " until it has run:' >&2\n"
+            f"        echo {shlex.quote(indexes)} >&2\n"
+            "        exit 1\n"
+            "    fi\n"
+            '    echo "Waiting for Neo4j..." >&2\n'
+            f"    sleep {INDEXES_RETRY_SECONDS}\n"
+            "done\n",
+            encoding="utf-8",
+        )
+        script.chmod(0o755)
+        return script
+
+
+def export_json_file(
+    json_path: Path,
+    *,
+    writer: ImportCsvWriter,
+    client,
+    chat_model: str,
+    embedder: EmbeddingProvider,
+    config: IngestConfig = IngestConfig(),
+    embed_cache: Optional[EmbeddingCache] = None,
+    description_cache: Optional[DescriptionCache] = None,
+    chat_limiter: Optional[RateLimiter] = None,
+    dedup: Optional["DedupIndex"] = None,
+) -> None:
+    log.info("=== Exporting: %s ===", json_path.name)
+    doc_id = peek_doc_id(json_path)
+    if doc_id is None:
+        log.warning("No chunks in %s", json_path.name)
+        return
+    fingerprint = ingest_fingerprint(embedder, chat_model, config)
+    failed = embed_and_write(
+        json_path,
+        writer=writer,
+        manifest=DocumentManifest(None, doc_id, fingerprint=fingerprint),
+        embedder=embedder,
+        client=client,
+        chat_model=chat_model,
+        config=config,
+        embed_cache=embed_cache,
+        description_cache=description_cache,
+        chat_limiter=chat_limiter,
+        dedup=dedup,
+    )
+    source_hash = file_sha256(json_path, fingerprint) if failed == 0 else None
+    writer.add_document(doc_id, source_hash)
+    metrics.count("chunks_failed", failed)
+    metrics.count("files_done")
+    log.info("=== Exported: %s ===", json_path.name)
+
+
+def export_for_import(
+    data_root: Path,
+    out_dir: Path,
+    *,
+    client,
+    chat_model: str,
+    embedder: EmbeddingProvider,
+    config: IngestConfig = IngestConfig(),
+    embed_cache: Optional[EmbeddingCache] = None,
+    description_cache: Optional[DescriptionCache] = None,
+    chat_limiter: Optional[RateLimiter] = None,
+    dedup: Optional["DedupIndex"] = None,
+    database: str = "neo4j",
+) -> Path:
+    """
+    Embeds every chunk file under data_root like `ingest` does and writes the
+    import CSVs plus an import.sh to out_dir. Returns the script path.
+    """
+    json_files = find_chunk_files(data_root)
+    if not json_files:
+        raise FileNotFoundError(
+            f"No *.chunks_md_tables.json(l) found under: {data_root}"
+        )
+    metrics.set_total("files_done", len(json_files))
+
+    writer = ImportCsvWriter(out_dir, config.embedding_storage)
+    kwargs = dict(
+        writer=writer,
+        client=client,
+        chat_model=chat_model,
+        embedder=embedder,
+        config=config,
+        embed_cache=embed_cache,
+        description_cache=description_cache,
+        chat_limiter=chat_limiter,
+        dedup=dedup,
+    )
+    try:
+        run_files(json_files, export_json_file, kwargs, config.jobs)
+    finally:
+        writer.close()
+        for stats in (embed_cache, description_cache, dedup):
+            if stats is not None:
+                stats.log_stats()
+
+    script = writer.write_import_script(database)
+    log.info(
+        "Exported %d documents / %d chunks to %s; run %s",
+        writer.documents,
+        writer.chunks,
+        out_dir,
+        script,
+    )
+    return script
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+from .quantize import pack_vector, unpack_vector
+
+log = logging.getLogger(__name__)
+
+
+def sha256_hex(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class _SqliteCache:
+    """
+    Small key/value store on SQLite with LRU-ish eviction by last access time.
+    Safe to share between threads.
+    """
+
+    name = "cache"
+    value_type = "BLOB"
+
+    def __init__(self, path: Path, max_entries: int) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value {self.value_type} NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)"
+        )
+        self._conn.commit()
+
+    def _get_many(self, keys: Sequence[str]) -> list:
+        if not keys:
+            return []
+        found = {}
+        with self._lock:
+            # stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                part = keys[i : i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({marks})", part
+                ).fetchall()
+                found.update(rows)
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(now, k) for k in found],
+            )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return [found.get(k) for k in keys]
+
+    def _put_many(self, items: Sequence[tuple]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, last_used) VALUES (?, ?, ?)",
+                [(k, v, now) for k, v in items],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            if count > self.max_entries:
+                # evict down to 90% so we don't evict again on the next put
+                n_evict = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    """
+                    DELETE FROM entries WHERE key IN (
+                        SELECT key FROM entries ORDER BY last_used LIMIT ?
+                    )
+                    """,
+                    (n_evict,),
+                )
+                log.info("%s: evicted %d entries", self.name, n_evict)
+            self._conn.commit()
+
+    def log_stats(self) -> None:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        log.info(
+            "%s: %d hits, %d misses (hit rate %.1f%%)",
+            self.name,
+            self.hits,
+            self.misses,
+            rate * 100,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache(_SqliteCache):
+    """
+    Content-addressed embedding cache keyed by (model, dimensions, sha256(text)).
+    Vectors are stored as float32, which is what the embeddings API returns,
+    or as float16 for the quantized storage types (see quantize.py).
+    """
+
+    name = "embedding cache"
+
+    def __init__(
+        self, path: Path, max_entries: int = 1_000_000, storage: str = "float32"
+    ) -> None:
+        super().__init__(path, max_entries)
+        self.storage = storage
+        # float16 blobs get their own keys so they are never read as float32
+        self._suffix = "" if storage == "float32" else "|f16"
+
+    def _key(self, model: str, dimensions: Optional[int], text: str) -> str:
+        return f"{model}|{dimensions or 0}|{sha256_hex(text)}{self._suffix}"
+
+    def get_many(
+        self, model: str, texts: Sequence[str], dimensions: Optional[int] = None
+    ) -> List[Optional[List[float]]]:
+        blobs = self._get_many([self._key(model, dimensions, t) for t in texts])
+        out: List[Optional[List[float]]] = []
+        for b in blobs:
+            if b is None:
+                out.append(None)
+            else:
+                out.append(unpack_vector(b, self.storage))
+        return out
+
+    def put_many(
+        self,
+        model: str,
+        texts: Sequence[str],
+        vectors: Sequence[List[float]],
+        dimensions: Optional[int] = None,
+    ) -> None:
+        self._put_many(
+            [
+                (self._key(model, dimensions, t), pack_vector(v, self.storage))
+                for t, v in zip(texts, vectors)
+            ]
+        )
+
+    def get_or_embed(
+        self,
+        model: str,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], List[Optional[List[float]]]],
+        dimensions: Optional[int] = None,
+    ) -> List[Optional[List[float]]]:
+        """Look texts up and embed only the misses with embed_fn."""
+        out = self.get_many(model, texts, dimensions)
+        miss_idx = [i for i, v in enumerate(out) if v is None]
+        if miss_idx:
+            miss_texts = [texts[i] for i in miss_idx]
+            fresh = embed_fn(miss_texts)
+            for i, v in zip(miss_idx, fresh):
+                out[i] = v
+            self.put_many(
+                model,
+                [t for t, v in zip(miss_texts, fresh) if v is not None],
+                [v for v in fresh if v is not None],
+                dimensions,
+            )
+        return out
+
+
+class DescriptionCache(_SqliteCache):
+    """
+    Table description cache keyed by (chat model, system prompt hash, table
+    hash). Changing the prompt or the model changes the key, so stale
+    descriptions are never returned; they just age out.
+    """
+
+    name = "description cache"
+    value_type = "TEXT"
+
+    def __init__(self, path: Path, max_entries: int = 200_000) -> None:
+        super().__init__(path, max_entries)
+
+    @staticmethod
+    def _key(model: str, system_prompt: str, table_markdown: str) -> str:
+        return f"{model}|{sha256_hex(system_prompt)}|{sha256_hex(table_markdown)}"
+
+    def get(self, model: str, system_prompt: str, table_markdown: str) -> Optional[str]:
+        return self._get_many([self._key(model, system_prompt, table_markdown)])[0]
+
+    def put(
+        self, model: str, system_prompt: str, table_markdown: str, description: str
+    ) -> None:
+        self._put_many([(self._key(model, system_prompt, table_markdown), description)])
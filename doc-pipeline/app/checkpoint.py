@@ -0,0 +1,48 @@
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Set
+
+from .cache import sha256_hex
+
+log = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """
+    Append-only log of the chunk ids of one source file that are committed to
+    Neo4j. The first line holds the source hash; a log written for other file
+    contents is ignored. Lines are fsync'ed, so a crash loses at most the
+    batch that was being written.
+    """
+
+    def __init__(self, directory: Path, json_path: Path, source_hash: str) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        key = sha256_hex(str(json_path.resolve()))[:16]
+        self.path = directory / f"{json_path.name}.{key}.log"
+        self.source_hash = source_hash
+
+    def load(self) -> Set[str]:
+        if not self.path.exists():
+            return set()
+        # drop the part after the last newline: a line torn by a crash
+        lines = self.path.read_text(encoding="utf-8").split("\n")[:-1]
+        if not lines or lines[0] != f"source {self.source_hash}":
+            log.info("Ignoring checkpoint for other file contents: %s", self.path.name)
+            return set()
+        return {line for line in lines[1:] if line}
+
+    def start(self, resume: bool) -> Set[str]:
+        committed = self.load() if resume else set()
+        if not committed:
+            self.path.write_text(f"source {self.source_hash}\n", encoding="utf-8")
+        return committed
+
+    def record(self, chunk_ids: Iterable[str]) -> None:
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write("".join(f"{cid}\n" for cid in chunk_ids))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
@@ -1,15 +1,346 @@
 import argparse
 import logging
+import threading
+import time
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Optional
 
-from openai import OpenAI
-
-from .config import settings
-from .docling_pipeline import build_json_for_all_pdfs
-from .indexes import create_vector_indexes
+# Heavy modules (docling/transformers, openai, neo4j, numpy) are imported by
+# the commands that use them, so cron runs of `indexes` / `ingest` don't pay
+# for docling. `bench --import-budget` keeps an eye on this.
 from .logging_conf import setup_logging
-from .neo4j_io import ensure_constraints, make_driver
-from .process_json import process_all_jsons
+from .metrics import ProgressLine, metrics, write_run_report
+from .quantize import STORAGE_TYPES
+
+# commands that talk to Neo4j
+_DRIVER_COMMANDS = ("ingest", "full", "indexes")
+# --shard-pages when conversion runs in worker processes
+DEFAULT_SHARD_PAGES = 100
+
+
+def _settings():
+    # read on first use: `bench` needs neither credentials nor a .env
+    from .config import settings
+
+    return settings
+
+
+class _LazyOpenAI:
+    """
+    Stands in for the OpenAI client and builds it on first use: `indexes`
+    never calls the API, and ingest of unchanged files doesn't either.
+    """
+
+    def __init__(self, api_key: str) -> None:
+        self._api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+
+                self._client = OpenAI(api_key=self._api_key)
+        return getattr(self._client, name)
+
+
+def _caches(args) -> dict:
+    if args.no_cache:
+        return {}
+    from .cache import DescriptionCache, EmbeddingCache
+
+    settings = _settings()
+    return {
+        "embed_cache": EmbeddingCache(
+            settings.cache_dir / "embeddings.sqlite",
+            max_entries=settings.embed_cache_max_entries,
+            storage=settings.embed_storage,
+        ),
+        "description_cache": DescriptionCache(
+            settings.cache_dir / "descriptions.sqlite"
+        ),
+    }
+
+
+def _embedder(client, dimensions: Optional[int]):
+    from .embeddings import make_embedding_provider
+    from .rate_limit import RateLimiter
+
+    settings = _settings()
+    return make_embedding_provider(
+        settings.embed_backend,
+        client=client,
+        openai_model=settings.embed_model,
+        limiter=RateLimiter(settings.embed_rpm, settings.embed_tpm),
+        local_model=settings.local_embed_model,
+        local_device=settings.local_embed_device,
+        local_batch_size=settings.local_embed_batch_size,
+        local_threads=settings.local_embed_threads,
+        local_dims=settings.local_embed_dims,
+        dimensions=dimensions,
+    )
+
+
+def _embed_kwargs(args, client) -> dict:
+    """What ingest and export-import share: models, limits, caches, dedup."""
+    from .process_json import IngestConfig
+    from .rate_limit import RateLimiter
+
+    settings = _settings()
+    return dict(
+        client=client,
+        chat_model=settings.chat_model,
+        config=IngestConfig(
+            embed_batch_size=settings.embed_batch_size,
+            embed_batch_max_tokens=settings.embed_batch_max_tokens,
+            write_batch_size=settings.neo4j_write_batch_size,
+            describe_concurrency=settings.describe_concurrency,
+            embedding_storage=settings.embed_storage,
+            jobs=args.jobs,
+        ),
+        chat_limiter=RateLimiter(settings.chat_rpm, settings.chat_tpm),
+        embedder=_embedder(client, settings.embed_dimensions),
+        dedup=_dedup_index(settings.dedup_threshold) if args.dedup else None,
+        **_caches(args),
+    )
+
+
+def _ingest_kwargs(args, client, driver) -> dict:
+    settings = _settings()
+    return dict(
+        _embed_kwargs(args, client),
+        embed_model=settings.embed_model,
+        driver=driver,
+        force=args.force,
+        checkpoint_dir=settings.cache_dir / "checkpoints",
+        resume=args.resume,
+    )
+
+
+def _dedup_index(threshold: float):
+    from .dedup import DedupIndex
+
+    return DedupIndex(threshold=threshold)
+
+
+def _doc_cache(args):
+    """Converted DoclingDocuments under CACHE_DIR/docling, for `rechunk`."""
+    if args.no_doc_cache:
+        return None
+    from .docling_pipeline import make_doc_cache
+
+    return make_doc_cache(_settings().cache_dir)
+
+
+def _shard_pages(args) -> int:
+    """--shard-pages, or 100 when conversion runs in worker processes."""
+    if args.shard_pages is not None:
+        return args.shard_pages
+    in_pool = args.workers > 1 or getattr(args, "pipelined", False)
+    return DEFAULT_SHARD_PAGES if in_pool else 0
+
+
+def _cache_stats(ingest_kwargs: dict) -> dict:
+    stats = {}
+    for key in ("embed_cache", "description_cache"):
+        cache = ingest_kwargs.get(key)
+        if cache is not None:
+            stats[key] = {"hits": cache.hits, "misses": cache.misses}
+    return {"caches": stats} if stats else {}
+
+
+def _run(args, client, driver) -> dict:
+    """Runs one command; returns extra fields for the run report."""
+    if args.cmd == "bench":
+        from .bench import BenchConfig, check_import_times, run_bench
+        from .process_json import IngestConfig
+
+        ingest_overrides = {
+            k: getattr(args, k)
+            for k in (
+                "embed_batch_size",
+                "embed_batch_max_tokens",
+                "write_batch_size",
+                "describe_concurrency",
+                "jobs",
+            )
+            if getattr(args, k) is not None
+        }
+        result = run_bench(
+            BenchConfig(
+                files=args.files,
+                chunks_per_file=args.chunks_per_file,
+                table_every=args.table_every,
+                words_per_chunk=args.words_per_chunk,
+                fmt=args.format,
+                dims=args.dims,
+                embed_latency=args.embed_latency,
+                chat_latency=args.chat_latency,
+                write_latency=args.write_latency,
+                rate_limit_rate=args.rate_limit_rate,
+                seed=args.seed,
+            ),
+            IngestConfig(**ingest_overrides),
+            data_dir=args.data_dir,
+            record=args.record,
+            batch_api=args.batch_api,
+        )
+        if args.import_budget is not None:
+            result["imports"] = check_import_times(args.import_budget)
+        return result
+
+    settings = _settings()
+    if args.cmd == "convert":
+        from .docling_pipeline import build_json_for_all_pdfs
+
+        build_json_for_all_pdfs(
+            data_root=args.pdf_dir,
+            embed_model_id=settings.doc_embed_tokenizer,
+            overwrite=args.overwrite,
+            out_dir=args.out_dir,
+            workers=args.workers,
+            max_docs_per_worker=args.max_docs_per_worker,
+            fmt=args.format,
+            shard_pages=_shard_pages(args),
+            chunk_max_tokens=settings.doc_chunk_max_tokens,
+            doc_cache=_doc_cache(args),
+        )
+
+    elif args.cmd == "rechunk":
+        from .docling_pipeline import make_doc_cache, rechunk_all_pdfs
+
+        rechunk_all_pdfs(
+            args.pdf_dir,
+            settings.doc_embed_tokenizer,
+            make_doc_cache(settings.cache_dir),
+            out_dir=args.out_dir,
+            fmt=args.format,
+            chunk_max_tokens=args.max_tokens or settings.doc_chunk_max_tokens,
+        )
+
+    elif args.cmd == "ingest":
+        from .process_json import process_all_jsons
+
+        ingest_kwargs = _ingest_kwargs(args, client, driver)
+        extra = {}
+        if args.batch_api:
+            from .batch_api import prefill_caches
+            from .utils import find_chunk_files
+
+            extra["batch_api"] = prefill_caches(
+                find_chunk_files(args.json_dir),
+                batch_dir=settings.cache_dir / "batches",
+                poll_interval=args.batch_poll_interval,
+                **{
+                    k: ingest_kwargs.get(k)
+                    for k in (
+                        "client",
+                        "driver",
+                        "embedder",
+                        "chat_model",
+                        "config",
+                        "embed_cache",
+                        "description_cache",
+                        "force",
+                        "checkpoint_dir",
+                        "resume",
+                    )
+                },
+            )
+        process_all_jsons(args.json_dir, **ingest_kwargs)
+        return {**extra, **_cache_stats(ingest_kwargs)}
+
+    elif args.cmd == "full":
+        from .docling_pipeline import build_json_for_all_pdfs, iter_json_for_all_pdfs
+        from .process_json import process_all_jsons, process_json_files
+        from .streaming import run_pipelined
+
+        ingest_kwargs = _ingest_kwargs(args, client, driver)
+        convert_kwargs = dict(
+            overwrite=args.overwrite,
+            workers=args.workers,
+            max_docs_per_worker=args.max_docs_per_worker,
+            fmt=args.format,
+            shard_pages=_shard_pages(args),
+            chunk_max_tokens=settings.doc_chunk_max_tokens,
+            doc_cache=_doc_cache(args),
+        )
+        if args.pipelined:
+            # convert in worker processes, ingest each JSON as soon as it exists
+            run_pipelined(
+                iter_json_for_all_pdfs(
+                    args.pdf_dir,
+                    settings.doc_embed_tokenizer,
+                    in_subprocess=True,
+                    **convert_kwargs,
+                ),
+                lambda paths: process_json_files(paths, **ingest_kwargs),
+                queue_size=args.queue_size,
+            )
+        else:
+            build_json_for_all_pdfs(
+                args.pdf_dir, settings.doc_embed_tokenizer, **convert_kwargs
+            )
+            process_all_jsons(args.pdf_dir, **ingest_kwargs)
+        return _cache_stats(ingest_kwargs)
+
+    elif args.cmd == "export-import":
+        from .bulk_import import export_for_import
+
+        embed_kwargs = _embed_kwargs(args, client)
+        script = export_for_import(
+            args.json_dir, args.out_dir, database=args.database, **embed_kwargs
+        )
+        return {"import_script": str(script), **_cache_stats(embed_kwargs)}
+
+    elif args.cmd == "indexes":
+        from .indexes import VectorIndexConfig, create_vector_indexes
+
+        create_vector_indexes(
+            driver,
+            VectorIndexConfig(
+                dims=_embedder(client, settings.embed_dimensions).dims,
+                quantization=settings.vector_index_quantization,
+                hnsw_m=settings.vector_index_hnsw_m,
+                hnsw_ef_construction=settings.vector_index_hnsw_ef_construction,
+            ),
+        )
+
+    elif args.cmd == "recall":
+        from .cache import EmbeddingCache
+        from .recall import (hold_out_queries, recall_report,
+                             sample_chunk_texts, write_report)
+
+        if args.queries is not None:
+            docs = sample_chunk_texts(args.json_dir, args.sample)
+            lines = args.queries.read_text(encoding="utf-8").splitlines()
+            queries = [q.strip() for q in lines if q.strip()]
+        else:
+            queries, docs = hold_out_queries(
+                sample_chunk_texts(args.json_dir, args.sample + args.num_queries),
+                args.num_queries,
+            )
+        # float32 cache: the baseline must not come from quantized entries
+        cache = None
+        if not args.no_cache:
+            cache = EmbeddingCache(
+                settings.cache_dir / "embeddings.sqlite",
+                max_entries=settings.embed_cache_max_entries,
+            )
+        report = recall_report(
+            docs,
+            queries[: args.num_queries],
+            make_embedder=lambda dims: _embedder(client, dims),
+            dimensions=args.dimensions,
+            storages=args.storage,
+            k=args.k,
+            cache=cache,
+        )
+        write_report(report, args.out)
+
+    return {}
 
 
 def main():
@@ -21,9 +352,25 @@ def main():
 
     sub = parser.add_subparsers(dest="cmd", required=True)
 
+    # options every command takes
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help="Run report JSON (default: CACHE_DIR/reports/<command>-<time>.json)",
+    )
+    common.add_argument(
+        "--progress",
+        action="store_true",
+        help="Show a live progress line with throughput and ETA",
+    )
+
     # 1) convert PDFs to chunks json
     p_convert = sub.add_parser(
-        "convert", help="Convert all PDFs under --pdf-dir to *.chunks_md_tables.json"
+        "convert",
+        parents=[common],
+        help="Convert all PDFs under --pdf-dir to *.chunks_md_tables.json",
     )
     p_convert.add_argument(
         "--pdf-dir", type=Path, required=True, help="Root directory with PDFs"
@@ -34,68 +381,284 @@ def main():
     p_convert.add_argument(
         "--out-dir", type=Path, default=None, help="Directory to store JSON chunks"
     )
+    p_convert.add_argument(
+        "--workers", type=int, default=1, help="Parallel conversion processes"
+    )
+    p_convert.add_argument(
+        "--format",
+        choices=["json", "jsonl"],
+        default="json",
+        help="jsonl: stream chunks line by line with only the metadata ingest needs",
+    )
+    p_convert.add_argument(
+        "--max-docs-per-worker",
+        type=int,
+        default=None,
+        help="Restart a worker after this many PDFs to cap memory growth",
+    )
+    p_convert.add_argument(
+        "--shard-pages",
+        type=int,
+        default=None,
+        help="With --workers > 1, convert PDFs longer than this in page-range "
+        f"shards in parallel (default {DEFAULT_SHARD_PAGES}, 0 = off)",
+    )
+    p_convert.add_argument(
+        "--no-doc-cache",
+        action="store_true",
+        help="Do not keep converted documents for `rechunk` (or reuse them)",
+    )
+
+    # 1b) rebuild chunk files from the converted documents
+    p_rechunk = sub.add_parser(
+        "rechunk",
+        parents=[common],
+        help="Rebuild chunk files from documents cached by convert (no models)",
+    )
+    p_rechunk.add_argument("--pdf-dir", type=Path, required=True)
+    p_rechunk.add_argument("--out-dir", type=Path, default=None)
+    p_rechunk.add_argument("--format", choices=["json", "jsonl"], default="json")
+    p_rechunk.add_argument(
+        "--max-tokens",
+        type=int,
+        default=None,
+        help="Chunk size limit (default: DOC_CHUNK_MAX_TOKENS or tokenizer max)",
+    )
 
     # 2) ingest (JSON -> Neo4j)
     p_ingest = sub.add_parser(
-        "ingest", help="Process all *.chunks_md_tables.json and write to Neo4j"
+        "ingest",
+        parents=[common],
+        help="Process all *.chunks_md_tables.json(l) and write to Neo4j",
     )
     p_ingest.add_argument(
         "--json-dir",
         type=Path,
         required=True,
-        help="Root directory with *.chunks_md_tables.json",
+        help="Root directory with *.chunks_md_tables.json(l)",
+    )
+    p_ingest.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not use the embedding / table description caches",
+    )
+    p_ingest.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-process files and chunks even if they are unchanged in Neo4j",
+    )
+    p_ingest.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip chunks an interrupted run already wrote (per-file checkpoint)",
+    )
+    p_ingest.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Link near-duplicate chunks to the first copy instead of embedding them",
+    )
+    p_ingest.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Files ingested concurrently (shared rate limits and Neo4j pool)",
+    )
+    p_ingest.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Request descriptions and embeddings through the OpenAI Batch API "
+        "first (half price, results within 24h), then write to Neo4j",
+    )
+    p_ingest.add_argument(
+        "--batch-poll-interval",
+        type=float,
+        default=60.0,
+        help="Seconds between batch status checks (--batch-api)",
     )
 
     # 3) full (convert + ingest)
-    p_full = sub.add_parser("full", help="Run convert + ingest")
+    p_full = sub.add_parser(
+        "full", parents=[common], help="Run convert + ingest"
+    )
     p_full.add_argument("--pdf-dir", type=Path, required=True)
     p_full.add_argument("--overwrite", action="store_true")
+    p_full.add_argument("--workers", type=int, default=1)
+    p_full.add_argument("--format", choices=["json", "jsonl"], default="json")
+    p_full.add_argument("--max-docs-per-worker", type=int, default=None)
+    p_full.add_argument("--shard-pages", type=int, default=None)
+    p_full.add_argument("--no-doc-cache", action="store_true")
+    p_full.add_argument("--no-cache", action="store_true")
+    p_full.add_argument("--force", action="store_true")
+    p_full.add_argument("--resume", action="store_true")
+    p_full.add_argument("--dedup", action="store_true")
+    p_full.add_argument("--jobs", type=int, default=1)
+    p_full.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Ingest each document as soon as it is converted",
+    )
+    p_full.add_argument(
+        "--queue-size",
+        type=int,
+        default=2,
+        help="Converted documents that may wait for ingest (--pipelined)",
+    )
 
-    # 4) indexes
-    p_index = sub.add_parser("indexes", help="Create vector indexes and tag brands")
+    # 3b) files for neo4j-admin import instead of transactional writes
+    p_export = sub.add_parser(
+        "export-import",
+        parents=[common],
+        help="Embed all chunk files and write CSVs for neo4j-admin database import",
+    )
+    p_export.add_argument("--json-dir", type=Path, required=True)
+    p_export.add_argument(
+        "--out-dir",
+        type=Path,
+        required=True,
+        help="Directory for the import CSVs and import.sh",
+    )
+    p_export.add_argument(
+        "--database", default="neo4j", help="Database name in import.sh"
+    )
+    p_export.add_argument("--no-cache", action="store_true")
+    p_export.add_argument("--dedup", action="store_true")
+    p_export.add_argument("--jobs", type=int, default=1)
 
-    args = parser.parse_args()
+    # 4) indexes
+    p_index = sub.add_parser(
+        "indexes", parents=[common], help="Create vector indexes and tag brands"
+    )
 
-    # clients
-    client = OpenAI(api_key=settings.openai_api_key)
-    driver = make_driver(
-        settings.neo4j_uri, settings.neo4j_user, settings.neo4j_password
+    # 5) recall@k of reduced / quantized embeddings against full precision
+    p_recall = sub.add_parser(
+        "recall",
+        parents=[common],
+        help="Report recall@k of shorter / quantized embeddings vs. full precision",
+    )
+    p_recall.add_argument("--json-dir", type=Path, required=True)
+    p_recall.add_argument("--k", type=int, default=10)
+    p_recall.add_argument(
+        "--sample", type=int, default=2000, help="Text chunks to search over"
+    )
+    p_recall.add_argument(
+        "--queries",
+        type=Path,
+        default=None,
+        help="Questions, one per line (default: held-out sampled chunks)",
+    )
+    p_recall.add_argument("--num-queries", type=int, default=100)
+    p_recall.add_argument(
+        "--dimensions",
+        type=int,
+        nargs="+",
+        default=[256, 512],
+        help="Shortened sizes to compare",
+    )
+    p_recall.add_argument(
+        "--storage", choices=STORAGE_TYPES, nargs="+", default=list(STORAGE_TYPES)
     )
-    ensure_constraints(driver)
+    p_recall.add_argument("--out", type=Path, default=None, help="JSON report file")
+    p_recall.add_argument("--no-cache", action="store_true")
 
-    if args.cmd == "convert":
-        build_json_for_all_pdfs(
-            data_root=args.pdf_dir,
-            embed_model_id=settings.doc_embed_tokenizer,
-            overwrite=args.overwrite,
-            out_dir=args.out_dir,
-        )
+    # 6) offline ingest benchmark
+    p_bench = sub.add_parser(
+        "bench",
+        parents=[common],
+        help="Benchmark ingest on synthetic chunks with a fake OpenAI and Neo4j",
+    )
+    p_bench.add_argument("--files", type=int, default=4)
+    p_bench.add_argument("--chunks-per-file", type=int, default=500)
+    p_bench.add_argument(
+        "--table-every", type=int, default=10, help="Every n-th chunk is a table"
+    )
+    p_bench.add_argument("--words-per-chunk", type=int, default=180)
+    p_bench.add_argument("--format", choices=["json", "jsonl"], default="json")
+    p_bench.add_argument("--dims", type=int, default=1536)
+    p_bench.add_argument(
+        "--embed-latency", type=float, default=0.05, help="Seconds per request"
+    )
+    p_bench.add_argument("--chat-latency", type=float, default=0.3)
+    p_bench.add_argument(
+        "--write-latency", type=float, default=0.005, help="Seconds per write tx"
+    )
+    p_bench.add_argument(
+        "--rate-limit-rate",
+        type=float,
+        default=0.0,
+        help="Share of API requests that get a 429",
+    )
+    p_bench.add_argument("--seed", type=int, default=1)
+    # ingest tuning, default: IngestConfig defaults
+    p_bench.add_argument("--embed-batch-size", type=int, default=None)
+    p_bench.add_argument("--embed-batch-max-tokens", type=int, default=None)
+    p_bench.add_argument("--write-batch-size", type=int, default=None)
+    p_bench.add_argument("--describe-concurrency", type=int, default=None)
+    p_bench.add_argument("--jobs", type=int, default=None)
+    p_bench.add_argument(
+        "--data-dir",
+        type=Path,
+        default=None,
+        help="Keep the synthetic chunk files here (default: temp dir)",
+    )
+    p_bench.add_argument(
+        "--record", type=Path, default=None, help="Write the Cypher sent as JSONL"
+    )
+    p_bench.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Fill the caches through a fake Batch API first (ingest --batch-api)",
+    )
+    p_bench.add_argument(
+        "--import-budget",
+        type=float,
+        default=None,
+        help="Also check that each command imports in at most this many seconds "
+        "and without docling/transformers/torch (exit 1 otherwise)",
+    )
 
-    elif args.cmd == "ingest":
-        process_all_jsons(
-            args.json_dir,
-            client=client,
-            chat_model=settings.chat_model,
-            embed_model=settings.embed_model,
-            driver=driver,
-        )
+    args = parser.parse_args()
+    if args.cmd == "ingest" and args.batch_api and args.no_cache:
+        parser.error("--batch-api fills the caches, it can't be used with --no-cache")
 
-    elif args.cmd == "full":
-        build_json_for_all_pdfs(
-            args.pdf_dir, settings.doc_embed_tokenizer, overwrite=args.overwrite
-        )
-        process_all_jsons(
-            args.pdf_dir,
-            client=client,
-            chat_model=settings.chat_model,
-            embed_model=settings.embed_model,
-            driver=driver,
-        )
+    # clients: only what the command uses (the benchmark brings its own fakes)
+    client = driver = None
+    if args.cmd != "bench":
+        settings = _settings()
+        client = _LazyOpenAI(settings.openai_api_key)
+        if args.cmd in _DRIVER_COMMANDS:
+            from .neo4j_io import ensure_constraints, make_driver
 
-    elif args.cmd == "indexes":
-        create_vector_indexes(driver)
+            # ensure_constraints is the connectivity check
+            driver = make_driver(
+                settings.neo4j_uri,
+                settings.neo4j_user,
+                settings.neo4j_password,
+                verify=False,
+            )
+            ensure_constraints(driver)
 
-    driver.close()
+    metrics.reset()
+    rate_counter = {"convert": "pages", "rechunk": "chunks_produced"}.get(
+        args.cmd, "chunks_written"
+    )
+    progress = (
+        ProgressLine(rate_counter=rate_counter) if args.progress else nullcontext()
+    )
+    status, extra = "failed", {}
+    try:
+        with progress:
+            extra = _run(args, client, driver)
+        status = "ok"
+    finally:
+        if driver is not None:
+            driver.close()
+        cache_dir = Path(".cache") if args.cmd == "bench" else _settings().cache_dir
+        report_path = args.report or (
+            cache_dir / "reports" / f"{args.cmd}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        write_run_report(metrics.report(args.cmd, status=status, **extra), report_path)
+    if not extra.get("imports", {}).get("ok", True):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
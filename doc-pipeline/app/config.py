@@ -1,3 +1,6 @@
+from pathlib import Path
+from typing import Optional
+
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -6,18 +9,59 @@ class Settings(BaseSettings):
     # OpenAI
     openai_api_key: str = Field(..., alias="OPENAI_API_KEY")
     embed_model: str = Field("text-embedding-3-small", alias="EMBED_MODEL")
+    # "openai" or "local" (sentence-transformers on this machine)
+    embed_backend: str = Field("openai", alias="EMBED_BACKEND")
+    local_embed_model: str = Field(
+        "sentence-transformers/all-MiniLM-L6-v2", alias="LOCAL_EMBED_MODEL"
+    )
+    local_embed_device: str = Field("cpu", alias="LOCAL_EMBED_DEVICE")
+    local_embed_batch_size: int = Field(64, alias="LOCAL_EMBED_BATCH_SIZE")
+    local_embed_threads: Optional[int] = Field(None, alias="LOCAL_EMBED_THREADS")
+    # output size of LOCAL_EMBED_MODEL, if it is not a known model (see embeddings.py)
+    local_embed_dims: Optional[int] = Field(None, alias="LOCAL_EMBED_DIMS")
+    # shorter vectors (text-embedding-3-* / Matryoshka models); must match the backend
+    embed_dimensions: Optional[int] = Field(None, alias="EMBED_DIMENSIONS")
+    # Chunk.embedding as float32, float16 or int8
+    embed_storage: str = Field("float32", alias="EMBED_STORAGE")
     chat_model: str = Field("gpt-4.1-mini", alias="CHAT_MODEL")
+    embed_batch_size: int = Field(256, alias="EMBED_BATCH_SIZE")
+    embed_batch_max_tokens: int = Field(100_000, alias="EMBED_BATCH_MAX_TOKENS")
+    describe_concurrency: int = Field(4, alias="DESCRIBE_CONCURRENCY")
+
+    # OpenAI rate limits, shared by all worker threads
+    chat_rpm: Optional[int] = Field(500, alias="CHAT_RPM")
+    chat_tpm: Optional[int] = Field(200_000, alias="CHAT_TPM")
+    embed_rpm: Optional[int] = Field(3_000, alias="EMBED_RPM")
+    embed_tpm: Optional[int] = Field(1_000_000, alias="EMBED_TPM")
 
     # Neo4j
     neo4j_uri: str = Field(..., alias="NEO4J_URI")
     neo4j_user: str = Field(..., alias="NEO4J_USER")
     neo4j_password: str = Field(..., alias="NEO4J_PASSWORD")
+    neo4j_write_batch_size: int = Field(500, alias="NEO4J_WRITE_BATCH_SIZE")
+    # vector index options (Neo4j 5.23+), unset = server default
+    vector_index_quantization: Optional[bool] = Field(
+        None, alias="VECTOR_INDEX_QUANTIZATION"
+    )
+    vector_index_hnsw_m: Optional[int] = Field(None, alias="VECTOR_INDEX_HNSW_M")
+    vector_index_hnsw_ef_construction: Optional[int] = Field(
+        None, alias="VECTOR_INDEX_HNSW_EF_CONSTRUCTION"
+    )
+
+    # Local caches (embeddings, table descriptions)
+    cache_dir: Path = Field(Path(".cache"), alias="CACHE_DIR")
+    embed_cache_max_entries: int = Field(1_000_000, alias="EMBED_CACHE_MAX_ENTRIES")
+
+    # ingest --dedup: estimated Jaccard similarity above which chunks are duplicates
+    dedup_threshold: float = Field(0.9, alias="DEDUP_THRESHOLD")
 
     # Docling / tokenizer for hybrid chunker
     doc_embed_tokenizer: str = Field(
         "sentence-transformers/all-MiniLM-L6-v2",
         alias="DOC_EMBED_TOKENIZER",
     )
+    # chunk size limit in tokenizer tokens, unset = the tokenizer's max length
+    doc_chunk_max_tokens: Optional[int] = Field(None, alias="DOC_CHUNK_MAX_TOKENS")
 
     class Config:
         env_file = ".env"
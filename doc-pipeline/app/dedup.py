@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .indexes import brand_of
+
+log = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"\w+")
+# figures as written: "142.6", "1,234", "2023"
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def _normalize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _numbers(text: str) -> Tuple[str, ...]:
+    return tuple(_NUMBER_RE.findall(text))
+
+
+class DedupIndex:
+    """
+    Finds exact and near-duplicate chunks across one ingest run.
+
+    Exact: same words after lowercasing (punctuation/whitespace ignored).
+    Near: MinHash over word shingles with LSH banding; candidates are kept if
+    their estimated Jaccard similarity is >= threshold and they contain the
+    same figures in the same order, so a paragraph that only differs in the
+    reported numbers (another year, a restated value) is never collapsed.
+    The first chunk seen becomes the canonical one.
+
+    Chunks are only compared within one brand (from the document id prefix):
+    a duplicate has no embedding, so across brands it would vanish from its
+    own Chunk_<Brand> index.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+        seed: int = 1,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 61, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 61, size=num_perm, dtype=np.uint64)
+        self._exact: Dict[Tuple[Optional[str], str], str] = {}
+        self._sigs: Dict[str, np.ndarray] = {}
+        self._numbers: Dict[str, Tuple[str, ...]] = {}
+        self._buckets: Dict[
+            Tuple[Optional[str], int, bytes], List[str]
+        ] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.exact_dups = 0
+        self.near_dups = 0
+
+    def _signature(self, words: List[str]) -> Optional[np.ndarray]:
+        k = self.shingle_size
+        if len(words) < k:
+            return None
+        shingles = {" ".join(words[i : i + k]) for i in range(len(words) - k + 1)}
+        hv = np.fromiter(
+            (
+                int.from_bytes(
+                    hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little"
+                )
+                for s in shingles
+            ),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # (a*x + b) mod p, uint64 wrap-around is fine for hashing
+        phv = np.bitwise_and(
+            (hv[:, None] * self._a + self._b) % _MERSENNE_PRIME, _MAX_HASH
+        )
+        return phv.min(axis=0).astype(np.uint32)
+
+    def canonical_of(self, chunk_id: str, text: str) -> Optional[str]:
+        """
+        Returns the id of an earlier chunk this one duplicates, or None (and
+        registers the chunk as canonical).
+        """
+        brand = brand_of(chunk_id.split("::", 1)[0])
+        words = _normalize(text)
+        exact_key = (
+            brand,
+            hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest(),
+        )
+        numbers = _numbers(text)
+        sig = self._signature(words)
+
+        with self._lock:
+            canonical = self._exact.get(exact_key)
+            if canonical is not None:
+                self.exact_dups += 1
+                return canonical
+
+            band_keys = []
+            if sig is not None:
+                for i in range(self.bands):
+                    band = sig[i * self.rows : (i + 1) * self.rows].tobytes()
+                    band_keys.append((brand, i, band))
+                best, best_sim = None, self.threshold
+                for key in band_keys:
+                    for cand in self._buckets.get(key, ()):
+                        if self._numbers[cand] != numbers:
+                            continue
+                        sim = float(np.mean(self._sigs[cand] == sig))
+                        if sim >= best_sim:
+                            best, best_sim = cand, sim
+                if best is not None:
+                    self.near_dups += 1
+                    return best
+
+            self._exact[exact_key] = chunk_id
+            if sig is not None:
+                self._sigs[chunk_id] = sig
+                self._numbers[chunk_id] = numbers
+                for key in band_keys:
+                    self._buckets[key].append(chunk_id)
+            return None
+
+    def log_stats(self) -> None:
+        log.info(
+            "dedup: %d canonical chunks, %d exact and %d near duplicates",
+            len(self._exact),
+            self.exact_dups,
+            self.near_dups,
+        )
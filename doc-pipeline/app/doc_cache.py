@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import json
+import logging
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+_RANGE_RE = re.compile(r"^pages-(\d+)-(\d+)\.json\.gz$")
+
+
+def _file_sha256(path: Path, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(block):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _docling_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("docling")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class DoclingDocCache:
+    """
+    Converted DoclingDocuments on disk, so chunking can be redone without
+    layout analysis and table-structure models.
+
+    One directory per (PDF content hash, converter options, docling version)
+    holding `full.json.gz` or one `pages-<start>-<end>.json.gz` per shard.
+    Changing the converter options or upgrading docling misses the cache;
+    tokenizer and chunker settings don't take part in the key.
+    """
+
+    def __init__(self, root: Path, converter_options: Dict[str, Any]) -> None:
+        self.root = root
+        self._options_key = hashlib.sha256(
+            json.dumps(
+                {"options": converter_options, "docling": _docling_version()},
+                sort_keys=True,
+            ).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def key_dir(self, pdf_path: Path) -> Path:
+        return self.root / f"{_file_sha256(pdf_path)[:32]}-{self._options_key}"
+
+    @staticmethod
+    def _name(page_range: Optional[Tuple[int, int]]) -> str:
+        if page_range is None:
+            return "full.json.gz"
+        return f"pages-{page_range[0]:05d}-{page_range[1]:05d}.json.gz"
+
+    def load(self, key_dir: Path, page_range: Optional[Tuple[int, int]] = None):
+        """The cached DoclingDocument, or None."""
+        path = key_dir / self._name(page_range)
+        if not path.exists():
+            return None
+        from docling_core.types.doc import DoclingDocument
+
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return DoclingDocument.model_validate_json(f.read())
+        except Exception as e:  # truncated / written by another docling_core
+            log.warning("Ignoring unreadable cached document %s: %s", path, e)
+            return None
+
+    def store(
+        self, key_dir: Path, dl_doc, page_range: Optional[Tuple[int, int]] = None
+    ) -> None:
+        key_dir.mkdir(parents=True, exist_ok=True)
+        path = key_dir / self._name(page_range)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=5) as f:
+            f.write(dl_doc.model_dump_json())
+        tmp_path.replace(path)
+
+    def shard_ranges(
+        self, key_dir: Path, page_count: Optional[int]
+    ) -> List[Tuple[int, int]]:
+        """
+        Cached page ranges that cover pages 1..page_count without gaps, in
+        page order; empty if there are none (an interrupted convert leaves
+        only some shards). Shards of runs with different --shard-pages may
+        sit side by side; any complete chain of them is used, fewest first.
+        """
+        if not key_dir.is_dir() or page_count is None:
+            return []
+        ends_by_start: Dict[int, List[int]] = defaultdict(list)
+        for p in key_dir.iterdir():
+            m = _RANGE_RE.match(p.name)
+            if m:
+                ends_by_start[int(m.group(1))].append(int(m.group(2)))
+        if not ends_by_start:
+            return []
+
+        dead_ends = set()
+
+        def chain(start: int) -> Optional[List[Tuple[int, int]]]:
+            if start == page_count + 1:
+                return []
+            if start in dead_ends:
+                return None
+            # longest shard first: fewer documents to load and stitch
+            for end in sorted(ends_by_start.get(start, ()), reverse=True):
+                rest = chain(end + 1)
+                if rest is not None:
+                    return [(start, end), *rest]
+            dead_ends.add(start)
+            return None
+
+        ranges = chain(1)
+        if ranges is None:
+            log.warning(
+                "Cached shards of %s do not cover pages 1-%d, not using them",
+                key_dir.name,
+                page_count,
+            )
+            return []
+        return ranges
@@ -1,7 +1,16 @@
 import json
 import logging
+import multiprocessing as mp
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor,
+                                wait)
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import PdfPipelineOptions
@@ -14,21 +23,47 @@ from docling_core.transforms.chunker.tokenizer.huggingface import \
 from docling_core.transforms.serializer.markdown import MarkdownTableSerializer
 from transformers import AutoTokenizer
 
+from .doc_cache import DoclingDocCache
+from .logging_conf import setup_logging
+from .metrics import metrics
+from .utils import CHUNKS_JSON_SUFFIX, CHUNKS_JSONL_SUFFIX, slim_meta
+
 log = logging.getLogger(__name__)
 
+# converter/chunker/document cache of the current worker process (see _init_worker)
+_worker_state: Optional[
+    Tuple[DocumentConverter, HybridChunker, Optional[DoclingDocCache]]
+] = None
+
+# PDF pipeline options; also the key of the DoclingDocument cache
+CONVERTER_OPTIONS: Dict[str, Any] = {
+    "do_ocr": False,
+    "do_table_structure": True,
+    "do_cell_matching": True,
+}
+
+
+def make_doc_cache(cache_dir: Path) -> DoclingDocCache:
+    return DoclingDocCache(cache_dir / "docling", CONVERTER_OPTIONS)
 
-def build_docling_converter_and_chunker(
-    embed_model_id: str,
-) -> Tuple[DocumentConverter, HybridChunker]:
-    opts = PdfPipelineOptions()
-    opts.do_ocr = False
-    opts.do_table_structure = True
-    opts.table_structure_options.do_cell_matching = True
 
-    converter = DocumentConverter(
+def build_converter() -> DocumentConverter:
+    opts = PdfPipelineOptions()
+    opts.do_ocr = CONVERTER_OPTIONS["do_ocr"]
+    opts.do_table_structure = CONVERTER_OPTIONS["do_table_structure"]
+    opts.table_structure_options.do_cell_matching = CONVERTER_OPTIONS[
+        "do_cell_matching"
+    ]
+    return DocumentConverter(
         format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=opts)}
     )
 
+
+def build_chunker(
+    embed_model_id: str, max_tokens: Optional[int] = None
+) -> HybridChunker:
+    """max_tokens: chunk size limit, default: the tokenizer's model_max_length."""
+
     class MDTableSerializerProvider(ChunkingSerializerProvider):
         def get_serializer(self, doc):
             return ChunkingDocSerializer(
@@ -36,15 +71,102 @@ def build_docling_converter_and_chunker(
                 table_serializer=MarkdownTableSerializer(),
             )
 
+    tokenizer_kwargs = {"max_tokens": max_tokens} if max_tokens else {}
     tokenizer = HuggingFaceTokenizer(
-        tokenizer=AutoTokenizer.from_pretrained(embed_model_id)
+        tokenizer=AutoTokenizer.from_pretrained(embed_model_id), **tokenizer_kwargs
     )
 
-    chunker = HybridChunker(
+    return HybridChunker(
         tokenizer=tokenizer,
         serializer_provider=MDTableSerializerProvider(),
     )
-    return converter, chunker
+
+
+def build_docling_converter_and_chunker(
+    embed_model_id: str, max_tokens: Optional[int] = None
+) -> Tuple[DocumentConverter, HybridChunker]:
+    return build_converter(), build_chunker(embed_model_id, max_tokens)
+
+
+def chunks_path_for(pdf_path: Path, out_dir: Path | None, fmt: str) -> Path:
+    if fmt not in ("json", "jsonl"):
+        raise ValueError(f"Unknown chunk format: {fmt}")
+    suffix = CHUNKS_JSONL_SUFFIX if fmt == "jsonl" else CHUNKS_JSON_SUFFIX
+    if out_dir:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        return out_dir / (pdf_path.stem + suffix)
+    return pdf_path.with_suffix(suffix)
+
+
+def convert_document(
+    pdf_path: Path,
+    converter,
+    page_range: Optional[Tuple[int, int]] = None,
+    doc_cache: Optional[DoclingDocCache] = None,
+):
+    """
+    DoclingDocument of the PDF (or of one page range), from doc_cache when
+    the same PDF was converted with the same options before.
+    """
+    key_dir = doc_cache.key_dir(pdf_path) if doc_cache is not None else None
+    if key_dir is not None:
+        dl_doc = doc_cache.load(key_dir, page_range)
+        if dl_doc is not None:
+            metrics.count("docling_cache_hits")
+            return dl_doc
+
+    t0 = time.perf_counter()
+    kwargs = {"page_range": page_range} if page_range else {}
+    dl_doc = converter.convert(str(pdf_path), **kwargs).document
+    pages = len(getattr(dl_doc, "pages", None) or {})
+    # items = pages, so the report shows seconds per page
+    metrics.add_time("convert", time.perf_counter() - t0, items=pages)
+    metrics.count("pages", pages)
+
+    if key_dir is not None:
+        doc_cache.store(key_dir, dl_doc, page_range)
+        metrics.count("docling_cache_misses")
+    return dl_doc
+
+
+def chunk_document(dl_doc, chunker, slim: bool = False) -> List[Dict[str, Any]]:
+    t0 = time.perf_counter()
+    chunks = []
+    for ch in chunker.chunk(dl_doc=dl_doc):
+        text = chunker.contextualize(chunk=ch)  # tables -> Markdown
+        meta = ch.meta.model_dump() if hasattr(ch, "meta") else None
+        chunks.append({"text": text, "meta": slim_meta(meta) if slim else meta})
+    metrics.add_time("chunk", time.perf_counter() - t0, items=len(chunks))
+    return chunks
+
+
+def write_document_chunks(dl_doc, chunker, out_path: Path, fmt: str) -> None:
+    """
+    fmt="json": one {"chunks": [...]} document with the full Docling metadata.
+    fmt="jsonl": one chunk per line, written as produced, with only the
+    metadata ingest needs.
+    """
+    if fmt != "jsonl":
+        write_chunks(out_path, chunk_document(dl_doc, chunker), fmt)
+        return
+
+    t0 = time.perf_counter()
+    n_chunks = 0
+    # write under a temp name so a crash never leaves a truncated file
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        for ch in chunker.chunk(dl_doc=dl_doc):
+            text = chunker.contextualize(chunk=ch)  # tables -> Markdown
+            meta = ch.meta.model_dump() if hasattr(ch, "meta") else None
+            line = {"text": text, "meta": slim_meta(meta)}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+            n_chunks += 1
+    tmp_path.replace(out_path)
+    _drop_other_format(out_path)
+    metrics.add_time("chunk", time.perf_counter() - t0, items=n_chunks)
+    metrics.count("chunks_produced", n_chunks)
+    metrics.count("bytes_written_chunk_files", out_path.stat().st_size)
+    log.info("Wrote: %s", out_path)
 
 
 def pdf_to_chunks_json(
@@ -53,34 +175,450 @@ def pdf_to_chunks_json(
     chunker,
     overwrite: bool = False,
     out_dir: Path | None = None,
+    fmt: str = "json",
+    doc_cache: Optional[DoclingDocCache] = None,
 ) -> Path:
+    """
+    Converts and chunks one PDF (see write_document_chunks for `fmt`). With a
+    doc_cache the DoclingDocument is kept, so `rechunk` can redo the chunks.
+    """
     if not pdf_path.exists():
         raise FileNotFoundError(pdf_path)
-
-    if out_dir:
-        out_dir.mkdir(parents=True, exist_ok=True)
-        out_path = out_dir / (pdf_path.stem + ".chunks_md_tables.json")
-    else:
-        out_path = pdf_path.with_suffix(".chunks_md_tables.json")
+    out_path = chunks_path_for(pdf_path, out_dir, fmt)
 
     if out_path.exists() and not overwrite:
         log.info("Skip (exists): %s", out_path.name)
         return out_path
 
-    dl_doc = converter.convert(str(pdf_path)).document
+    dl_doc = convert_document(pdf_path, converter, doc_cache=doc_cache)
+    write_document_chunks(dl_doc, chunker, out_path, fmt)
+    return out_path
+
 
-    chunks = []
-    for ch in chunker.chunk(dl_doc=dl_doc):
-        text = chunker.contextualize(chunk=ch)  # tables -> Markdown
-        meta = ch.meta.model_dump() if hasattr(ch, "meta") else None
-        chunks.append({"text": text, "meta": meta})
+# DoclingDocument collections addressed by "#/<name>/<index>" refs
+_REF_COLLECTIONS = (
+    "texts",
+    "tables",
+    "pictures",
+    "groups",
+    "key_value_items",
+    "form_items",
+)
+_REF_RE = re.compile(r"^#/(\w+)/(\d+)$")
 
-    out_path.write_text(
-        json.dumps({"chunks": chunks}, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+
+def pdf_page_count(pdf_path: Path) -> Optional[int]:
+    """Page count without converting (pypdfium2 comes with docling)."""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return None
+    try:
+        doc = pdfium.PdfDocument(str(pdf_path))
+    except Exception as e:
+        log.warning("Cannot read page count of %s: %s", pdf_path.name, e)
+        return None
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def page_ranges(pages: int, shard_pages: int) -> List[Tuple[int, int]]:
+    """1-based inclusive (start, end) ranges of at most shard_pages pages."""
+    return [
+        (start, min(start + shard_pages - 1, pages))
+        for start in range(1, pages + 1, shard_pages)
+    ]
+
+
+def _collection_sizes(dl_doc) -> Dict[str, int]:
+    return {name: len(getattr(dl_doc, name, None) or []) for name in _REF_COLLECTIONS}
+
+
+def convert_shard(
+    pdf_path: Path,
+    converter,
+    chunker,
+    page_range: Tuple[int, int],
+    slim: bool = False,
+    doc_cache: Optional[DoclingDocCache] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Converts and chunks one page range. Returns the chunks and the size of
+    each ref collection of the shard document, for stitch_shards().
+    """
+    dl_doc = convert_document(pdf_path, converter, page_range, doc_cache)
+    return chunk_document(dl_doc, chunker, slim), _collection_sizes(dl_doc)
+
+
+def _shift_refs(node: Any, offsets: Dict[str, int]) -> Any:
+    if isinstance(node, str):
+        m = _REF_RE.match(node)
+        if m and m.group(1) in offsets:
+            return f"#/{m.group(1)}/{int(m.group(2)) + offsets[m.group(1)]}"
+        return node
+    if isinstance(node, list):
+        return [_shift_refs(v, offsets) for v in node]
+    if isinstance(node, dict):
+        return {k: _shift_refs(v, offsets) for k, v in node.items()}
+    return node
+
+
+def _shift_pages(meta: Dict[str, Any], shift: int) -> None:
+    for it in meta.get("doc_items") or []:
+        for prov in it.get("prov") or []:
+            if isinstance(prov.get("page_no"), int):
+                prov["page_no"] += shift
+
+
+def stitch_shards(
+    shards: List[Tuple[Tuple[int, int], List[Dict[str, Any]], Dict[str, int]]],
+) -> List[Dict[str, Any]]:
+    """
+    Joins (page_range, chunks, collection sizes) of consecutive shards into
+    the chunk list of one document: "#/tables/3" of the second shard becomes
+    "#/tables/<3 + tables in shard 1>", so table refs stay unique, and page
+    numbers are made absolute if the converter numbered them per shard.
+    """
+    out: List[Dict[str, Any]] = []
+    offsets = {name: 0 for name in _REF_COLLECTIONS}
+    for (start, end), chunks, sizes in sorted(shards, key=lambda s: s[0]):
+        pages = [
+            prov.get("page_no")
+            for ch in chunks
+            for it in (ch.get("meta") or {}).get("doc_items") or []
+            for prov in it.get("prov") or []
+            if isinstance(prov.get("page_no"), int)
+        ]
+        relative = start > 1 and bool(pages) and max(pages) <= end - start + 1 < start
+        for ch in chunks:
+            meta = _shift_refs(ch.get("meta") or {}, offsets)
+            if relative:
+                _shift_pages(meta, start - 1)
+            out.append({"text": ch["text"], "meta": meta})
+        for name in _REF_COLLECTIONS:
+            offsets[name] += sizes.get(name, 0)
+    return out
+
+
+def _drop_other_format(out_path: Path) -> None:
+    """
+    Removes the chunk file of the other format for the same PDF, which
+    find_chunk_files would otherwise pick over (or next to) the new one.
+    """
+    name = out_path.name
+    if name.endswith(CHUNKS_JSONL_SUFFIX):
+        other = name[: -len(CHUNKS_JSONL_SUFFIX)] + CHUNKS_JSON_SUFFIX
+    elif name.endswith(CHUNKS_JSON_SUFFIX):
+        other = name[: -len(CHUNKS_JSON_SUFFIX)] + CHUNKS_JSONL_SUFFIX
+    else:
+        return
+    stale = out_path.with_name(other)
+    if stale.exists():
+        stale.unlink()
+        log.info("Removed stale chunk file: %s", stale)
+
+
+def write_chunks(out_path: Path, chunks: List[Dict[str, Any]], fmt: str) -> None:
+    if fmt == "jsonl":
+        tmp_path = out_path.with_name(out_path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            for ch in chunks:
+                f.write(json.dumps(ch, ensure_ascii=False) + "\n")
+        tmp_path.replace(out_path)
+    else:
+        out_path.write_text(
+            json.dumps({"chunks": chunks}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+    _drop_other_format(out_path)
+    metrics.count("chunks_produced", len(chunks))
+    metrics.count("bytes_written_chunk_files", out_path.stat().st_size)
     log.info("Wrote: %s", out_path)
-    return out_path
+
+
+def _init_worker(
+    embed_model_id: str,
+    torch_threads: int,
+    chunk_max_tokens: Optional[int],
+    doc_cache: Optional[DoclingDocCache],
+) -> None:
+    global _worker_state
+    setup_logging(logging.INFO)
+    try:
+        import torch
+
+        # keep N workers from each spinning up a thread per core
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _worker_state = (
+        *build_docling_converter_and_chunker(embed_model_id, chunk_max_tokens),
+        doc_cache,
+    )
+
+
+def _convert_in_worker(
+    task: Tuple[Path, bool, Optional[Path], str, Optional[Tuple[int, int]]]
+) -> Tuple[Path, Optional[Tuple[int, int]], Any, Dict[str, Any]]:
+    """
+    Whole file (page_range None): result is the JSON path. Shard: result is
+    (chunks, collection sizes) for the parent to stitch. None on error. The
+    task's metrics travel back with the result.
+    """
+    pdf, overwrite, out_dir, fmt, page_range = task
+    converter, chunker, doc_cache = _worker_state
+    metrics.reset()
+    if page_range is None:
+        result = _convert_one(
+            pdf, converter, chunker, overwrite, out_dir, fmt, doc_cache
+        )
+    else:
+        try:
+            result = convert_shard(
+                pdf,
+                converter,
+                chunker,
+                page_range,
+                slim=fmt == "jsonl",
+                doc_cache=doc_cache,
+            )
+        except Exception as e:
+            log.exception("ERROR processing %s pages %s: %s", pdf, page_range, e)
+            result = None
+    return pdf, page_range, result, metrics.snapshot()
+
+
+def _convert_one(
+    pdf: Path,
+    converter,
+    chunker,
+    overwrite: bool,
+    out_dir: Optional[Path],
+    fmt: str,
+    doc_cache: Optional[DoclingDocCache] = None,
+) -> Optional[Path]:
+    try:
+        out = pdf_to_chunks_json(
+            pdf,
+            converter,
+            chunker,
+            overwrite=overwrite,
+            out_dir=out_dir,
+            fmt=fmt,
+            doc_cache=doc_cache,
+        )
+    except Exception as e:
+        log.exception("ERROR processing %s: %s", pdf, e)
+        metrics.count("pdfs_failed")
+        return None
+    metrics.count("pdfs_converted")
+    return out
+
+
+def _iter_json_parallel(
+    pdf_files: List[Path],
+    embed_model_id: str,
+    overwrite: bool,
+    out_dir: Path | None,
+    workers: int,
+    max_docs_per_worker: int | None,
+    fmt: str,
+    shard_pages: int = 0,
+    chunk_max_tokens: Optional[int] = None,
+    doc_cache: Optional[DoclingDocCache] = None,
+) -> Iterator[Path]:
+    # largest first, so the longest conversions don't start last
+    pdf_files = sorted(pdf_files, key=lambda p: p.stat().st_size, reverse=True)
+
+    # big PDFs are split into page ranges that convert in parallel
+    tasks = []
+    shards: Dict[Path, int] = {}
+    for pdf in pdf_files:
+        out_path = chunks_path_for(pdf, out_dir, fmt)
+        pages = pdf_page_count(pdf) if shard_pages else None
+        if pages and pages > shard_pages and (overwrite or not out_path.exists()):
+            ranges = page_ranges(pages, shard_pages)
+            shards[pdf] = len(ranges)
+            tasks.extend((pdf, overwrite, out_dir, fmt, r) for r in ranges)
+            log.info(
+                "Splitting %s (%d pages) into %d shards", pdf.name, pages, len(ranges)
+            )
+        else:
+            tasks.append((pdf, overwrite, out_dir, fmt, None))
+
+    workers = min(workers, len(tasks))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    log.info(
+        "Converting %d PDFs (%d tasks) with %d workers (%d threads each)",
+        len(pdf_files),
+        len(tasks),
+        workers,
+        torch_threads,
+    )
+
+    # shard results per PDF until all of its shards are in
+    done: Dict[Path, list] = {pdf: [] for pdf in shards}
+    failed = set()
+
+    def finish(pdf, page_range, result) -> Optional[Path]:
+        if page_range is None:
+            return result
+        if result is None:
+            failed.add(pdf)
+        else:
+            done[pdf].append((page_range, *result))
+        shards[pdf] -= 1
+        if shards[pdf]:
+            return None
+        # last shard of this PDF is in
+        shard_results = done.pop(pdf)
+        if pdf in failed:
+            metrics.count("pdfs_failed")
+            return None
+        out_path = chunks_path_for(pdf, out_dir, fmt)
+        write_chunks(out_path, stitch_shards(shard_results), fmt)
+        metrics.count("pdfs_converted")
+        return out_path
+
+    # spawn: forking a process that already loaded torch is not safe
+    pool_kwargs: Dict[str, Any] = dict(
+        max_workers=workers,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(embed_model_id, torch_threads, chunk_max_tokens, doc_cache),
+    )
+    # without max_tasks_per_child (Python < 3.11) the whole pool is
+    # restarted after every `workers * max_docs_per_worker` tasks instead
+    pool_task_limit = None
+    if max_docs_per_worker:
+        if sys.version_info >= (3, 11):
+            pool_kwargs["max_tasks_per_child"] = max_docs_per_worker
+        else:
+            pool_task_limit = workers * max_docs_per_worker
+
+    pending = deque(tasks)
+    # tasks that were in flight when a worker died; rerun one at a time so
+    # the task that kills its worker is the only one reported as failed
+    retry: deque = deque()
+    retried = set()
+    running: Dict[Future, tuple] = {}
+    pool: Optional[ProcessPoolExecutor] = None
+    submitted = 0
+    try:
+        while pending or retry or running:
+            if pool and pool_task_limit and submitted >= pool_task_limit and not running:
+                pool.shutdown()
+                pool = None
+            if pool is None:
+                pool = ProcessPoolExecutor(**pool_kwargs)
+                submitted = 0
+            while (
+                pending
+                and len(running) < workers
+                and not (pool_task_limit and submitted >= pool_task_limit)
+            ):
+                task = pending.popleft()
+                running[pool.submit(_convert_in_worker, task)] = task
+                submitted += 1
+            if retry and not pending and not running:
+                task = retry.popleft()
+                retried.add(task)
+                running[pool.submit(_convert_in_worker, task)] = task
+                submitted += 1
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = False
+            for fut in finished:
+                task = running.pop(fut)
+                try:
+                    pdf, page_range, result, snap = fut.result()
+                except BrokenProcessPool:
+                    broken = True
+                    if task not in retried:
+                        retry.append(task)
+                        continue
+                    pdf, page_range = task[0], task[4]
+                    log.error(
+                        "Worker died converting %s%s",
+                        pdf,
+                        f" pages {page_range}" if page_range else "",
+                    )
+                    if page_range is None:
+                        metrics.count("pdfs_failed")
+                    result = None
+                else:
+                    metrics.merge(snap)
+                out = finish(pdf, page_range, result)
+                if out is not None:
+                    yield out
+            if broken:
+                # the other in-flight tasks fail with the same error; rerun them
+                retry.extend(running.values())
+                running.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_json_for_all_pdfs(
+    data_root: Path,
+    embed_model_id: str,
+    overwrite: bool = False,
+    out_dir: Path | None = None,
+    workers: int = 1,
+    max_docs_per_worker: int | None = None,
+    in_subprocess: bool = False,
+    fmt: str = "json",
+    shard_pages: int = 0,
+    chunk_max_tokens: Optional[int] = None,
+    doc_cache: Optional[DoclingDocCache] = None,
+) -> Iterator[Path]:
+    """
+    Yields each chunks JSON as soon as its PDF is converted. With workers > 1
+    (or in_subprocess) conversion runs in a process pool and files come out in
+    completion order; otherwise in path order. In the pool, PDFs with more than
+    `shard_pages` pages (0 = never) are converted in page-range shards; without
+    it shard_pages is ignored with a warning.
+    With a doc_cache, converted documents are reused and kept for `rechunk`.
+    """
+    pdf_files = sorted(data_root.rglob("*.pdf"))
+    if not pdf_files:
+        raise FileNotFoundError(f"No PDFs found under: {data_root}")
+    metrics.set_total("pdfs_converted", len(pdf_files))
+
+    if workers > 1 or in_subprocess:
+        yield from _iter_json_parallel(
+            pdf_files,
+            embed_model_id,
+            overwrite,
+            out_dir,
+            max(1, workers),
+            max_docs_per_worker,
+            fmt,
+            shard_pages,
+            chunk_max_tokens,
+            doc_cache,
+        )
+        return
+
+    if shard_pages:
+        log.warning(
+            "--shard-pages only applies with --workers > 1 or --pipelined; "
+            "converting each PDF whole"
+        )
+    converter, chunker = build_docling_converter_and_chunker(
+        embed_model_id, chunk_max_tokens
+    )
+    for pdf in pdf_files:
+        out = _convert_one(
+            pdf, converter, chunker, overwrite, out_dir, fmt, doc_cache
+        )
+        if out is not None:
+            yield out
 
 
 def build_json_for_all_pdfs(
@@ -88,20 +626,93 @@ def build_json_for_all_pdfs(
     embed_model_id: str,
     overwrite: bool = False,
     out_dir: Path | None = None,
+    workers: int = 1,
+    max_docs_per_worker: int | None = None,
+    fmt: str = "json",
+    shard_pages: int = 0,
+    chunk_max_tokens: Optional[int] = None,
+    doc_cache: Optional[DoclingDocCache] = None,
 ):
+    return sorted(
+        iter_json_for_all_pdfs(
+            data_root,
+            embed_model_id,
+            overwrite=overwrite,
+            out_dir=out_dir,
+            workers=workers,
+            max_docs_per_worker=max_docs_per_worker,
+            fmt=fmt,
+            shard_pages=shard_pages,
+            chunk_max_tokens=chunk_max_tokens,
+            doc_cache=doc_cache,
+        )
+    )
+
+
+def rechunk_pdf(
+    pdf: Path,
+    chunker,
+    doc_cache: DoclingDocCache,
+    out_dir: Path | None = None,
+    fmt: str = "json",
+) -> Optional[Path]:
+    """
+    Rewrites the chunk file of a PDF from its cached DoclingDocument (or
+    cached shards, stitched as in convert). None if it was never converted
+    with the current converter options.
+    """
+    key_dir = doc_cache.key_dir(pdf)
+    out_path = chunks_path_for(pdf, out_dir, fmt)
+    dl_doc = doc_cache.load(key_dir)
+    if dl_doc is not None:
+        write_document_chunks(dl_doc, chunker, out_path, fmt)
+        return out_path
+
+    shards = []
+    for page_range in doc_cache.shard_ranges(key_dir, pdf_page_count(pdf)):
+        dl_doc = doc_cache.load(key_dir, page_range)
+        if dl_doc is None:
+            shards = []
+            break
+        chunks = chunk_document(dl_doc, chunker, slim=fmt == "jsonl")
+        shards.append((page_range, chunks, _collection_sizes(dl_doc)))
+    if shards:
+        write_chunks(out_path, stitch_shards(shards), fmt)
+        return out_path
+
+    log.warning("Not in the document cache, run convert first: %s", pdf)
+    return None
+
+
+def rechunk_all_pdfs(
+    data_root: Path,
+    embed_model_id: str,
+    doc_cache: DoclingDocCache,
+    out_dir: Path | None = None,
+    fmt: str = "json",
+    chunk_max_tokens: Optional[int] = None,
+) -> List[Path]:
+    """
+    Rebuilds all chunk files from cached DoclingDocuments: only the tokenizer
+    and chunker run, no layout or table-structure models.
+    """
     pdf_files = sorted(data_root.rglob("*.pdf"))
     if not pdf_files:
         raise FileNotFoundError(f"No PDFs found under: {data_root}")
+    metrics.set_total("pdfs_rechunked", len(pdf_files))
 
-    converter, chunker = build_docling_converter_and_chunker(embed_model_id)
-    outs: List[Path] = []
+    chunker = build_chunker(embed_model_id, chunk_max_tokens)
+    out = []
     for pdf in pdf_files:
         try:
-            outs.append(
-                pdf_to_chunks_json(
-                    pdf, converter, chunker, overwrite=overwrite, out_dir=out_dir
-                )
-            )
+            path = rechunk_pdf(pdf, chunker, doc_cache, out_dir, fmt)
         except Exception as e:
-            log.exception("ERROR processing %s: %s", pdf, e)
-    return outs
+            log.exception("ERROR re-chunking %s: %s", pdf, e)
+            metrics.count("pdfs_failed")
+            continue
+        if path is None:
+            metrics.count("pdfs_not_cached")
+        else:
+            metrics.count("pdfs_rechunked")
+            out.append(path)
+    return out
@@ -0,0 +1,207 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, List, Optional, Sequence
+
+from .cache import EmbeddingCache
+from .rate_limit import RateLimiter
+
+if TYPE_CHECKING:  # the openai package is only imported once something is embedded
+    from openai import OpenAI
+
+log = logging.getLogger(__name__)
+
+OPENAI_EMBED_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+# output size of common sentence-transformers models, so `indexes` knows the
+# vector dimension without loading torch; others need LOCAL_EMBED_DIMS
+LOCAL_MODEL_DIMS = {
+    "sentence-transformers/all-MiniLM-L6-v2": 384,
+    "sentence-transformers/all-MiniLM-L12-v2": 384,
+    "sentence-transformers/all-mpnet-base-v2": 768,
+    "sentence-transformers/multi-qa-MiniLM-L6-cos-v1": 384,
+    "BAAI/bge-small-en-v1.5": 384,
+    "BAAI/bge-base-en-v1.5": 768,
+    "BAAI/bge-large-en-v1.5": 1024,
+}
+
+
+class EmbeddingProvider(ABC):
+    """
+    Turns texts into vectors. `name` identifies the vector space: it is used
+    in cache keys and in the ingest fingerprint, so switching providers (or
+    their output dimensions) re-embeds everything.
+    """
+
+    name: str
+
+    @property
+    @abstractmethod
+    def dims(self) -> int: ...
+
+    @abstractmethod
+    def embed_texts(
+        self, texts: Sequence[str], cache: Optional[EmbeddingCache] = None
+    ) -> List[Optional[List[float]]]: ...
+
+
+def _with_dims(name: str, dimensions: Optional[int]) -> str:
+    return f"{name}@{dimensions}" if dimensions else name
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """`dimensions` asks the API for shortened vectors (text-embedding-3-*)."""
+
+    def __init__(
+        self,
+        client: "OpenAI",
+        model: str,
+        limiter: Optional[RateLimiter] = None,
+        dimensions: Optional[int] = None,
+    ) -> None:
+        self.client = client
+        self.model = model
+        self.name = _with_dims(model, dimensions)
+        self.limiter = limiter
+        self.dimensions = dimensions
+
+    @property
+    def dims(self) -> int:
+        if self.model not in OPENAI_EMBED_DIMS:
+            raise ValueError(f"Unknown dimensions for embedding model {self.model}")
+        full = OPENAI_EMBED_DIMS[self.model]
+        if self.dimensions and self.dimensions > full:
+            raise ValueError(f"{self.model} has at most {full} dimensions")
+        return self.dimensions or full
+
+    def embed_texts(
+        self, texts: Sequence[str], cache: Optional[EmbeddingCache] = None
+    ) -> List[Optional[List[float]]]:
+        from .llm_utils import embed_texts
+
+        return embed_texts(
+            texts,
+            client=self.client,
+            model=self.model,
+            cache=cache,
+            limiter=self.limiter,
+            dimensions=self.dimensions,
+        )
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    sentence-transformers model on CPU (or any torch device). The model is
+    loaded on first use so commands that never embed don't pay for it.
+    `dimensions` truncates the vectors (only sensible for Matryoshka models).
+    `model_dims` is the model's output size, for models not in
+    LOCAL_MODEL_DIMS; it is checked once the model is loaded.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        device: str = "cpu",
+        batch_size: int = 64,
+        num_threads: Optional[int] = None,
+        dimensions: Optional[int] = None,
+        model_dims: Optional[int] = None,
+    ) -> None:
+        self.name = _with_dims(f"local:{model}", dimensions)
+        self.model_id = model
+        self.device = device
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.dimensions = dimensions
+        self.model_dims = model_dims or LOCAL_MODEL_DIMS.get(model)
+        self._model = None
+
+    def _load(self):
+        if self._model is None:
+            try:
+                import torch
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise RuntimeError(
+                    "EMBED_BACKEND=local needs `pip install sentence-transformers`"
+                ) from e
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            log.info("Loading local embedding model %s on %s", self.model_id, self.device)
+            # truncate_dim needs sentence-transformers >= 2.7, only pass it when used
+            kwargs = {"truncate_dim": self.dimensions} if self.dimensions else {}
+            model = SentenceTransformer(self.model_id, device=self.device, **kwargs)
+            expected = self.dimensions or self.model_dims
+            actual = model.get_sentence_embedding_dimension()
+            if expected and actual != expected:
+                raise ValueError(
+                    f"{self.model_id} produces {actual}-dimensional vectors, "
+                    f"expected {expected} (LOCAL_EMBED_DIMS / EMBED_DIMENSIONS)"
+                )
+            self._model = model
+        return self._model
+
+    @property
+    def dims(self) -> int:
+        # never loads the model: `indexes` must not import torch for one number
+        if self.dimensions or self.model_dims:
+            return self.dimensions or self.model_dims
+        if self._model is not None:
+            return self._model.get_sentence_embedding_dimension()
+        raise ValueError(
+            f"Unknown dimensions for local embedding model {self.model_id}, "
+            "set LOCAL_EMBED_DIMS"
+        )
+
+    def _encode(self, texts: List[str]) -> List[Optional[List[float]]]:
+        vectors = self._load().encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return [v.tolist() for v in vectors]
+
+    def embed_texts(
+        self, texts: Sequence[str], cache: Optional[EmbeddingCache] = None
+    ) -> List[Optional[List[float]]]:
+        texts = [(t or "").strip() for t in texts]
+        if not texts:
+            return []
+        if not all(texts):
+            raise ValueError("embed_texts: empty text in batch")
+        if cache is None:
+            return self._encode(texts)
+        return cache.get_or_embed(self.name, texts, self._encode)
+
+
+def make_embedding_provider(
+    backend: str,
+    *,
+    client: Optional["OpenAI"] = None,
+    openai_model: str = "text-embedding-3-small",
+    limiter: Optional[RateLimiter] = None,
+    local_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+    local_device: str = "cpu",
+    local_batch_size: int = 64,
+    local_threads: Optional[int] = None,
+    local_dims: Optional[int] = None,
+    dimensions: Optional[int] = None,
+) -> EmbeddingProvider:
+    if backend == "openai":
+        if client is None:
+            raise ValueError("openai embedding backend needs an OpenAI client")
+        return OpenAIEmbeddingProvider(client, openai_model, limiter, dimensions)
+    if backend == "local":
+        return LocalEmbeddingProvider(
+            local_model,
+            device=local_device,
+            batch_size=local_batch_size,
+            num_threads=local_threads,
+            dimensions=dimensions,
+            model_dims=local_dims,
+        )
+    raise ValueError(f"Unknown embedding backend: {backend}")
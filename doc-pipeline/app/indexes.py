@@ -1,8 +1,11 @@
+import logging
 from dataclasses import dataclass
-from typing import Mapping
+from typing import Mapping, Optional
 
 from neo4j import Driver
 
+log = logging.getLogger(__name__)
+
 
 @dataclass(frozen=True)
 class VectorIndexConfig:
@@ -12,6 +15,23 @@ class VectorIndexConfig:
     doc_chunk_rel: str = "HAS_CHUNK"
     chunk_label: str = "Chunk"
     document_label: str = "Document"
+    # Neo4j 5.23+ vector-2.0 options; None leaves the server default
+    quantization: Optional[bool] = None
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construction: Optional[int] = None
+
+    def index_options(self) -> dict:
+        options = {
+            "vector.dimensions": self.dims,
+            "vector.similarity_function": self.similarity,
+        }
+        if self.quantization is not None:
+            options["vector.quantization.enabled"] = self.quantization
+        if self.hnsw_m is not None:
+            options["vector.hnsw.m"] = self.hnsw_m
+        if self.hnsw_ef_construction is not None:
+            options["vector.hnsw.ef_construction"] = self.hnsw_ef_construction
+        return options
 
 
 DEFAULT_BRANDS: Mapping[str, str] = {
@@ -21,43 +41,68 @@ DEFAULT_BRANDS: Mapping[str, str] = {
 }
 
 
+def brand_of(doc_id: str, brands: Mapping[str, str] = DEFAULT_BRANDS) -> Optional[str]:
+    for brand, prefix in brands.items():
+        if doc_id.startswith(prefix):
+            return brand
+    return None
+
+
+def brand_label(brand: str, chunk_label: str = "Chunk") -> str:
+    return f"{chunk_label}_{brand}"
+
+
 def create_vector_indexes(
     driver: Driver,
     config: VectorIndexConfig = VectorIndexConfig(),
     brands: Mapping[str, str] = DEFAULT_BRANDS,
     index_prefix: str = "chunk_embedding",
+    retag_batch_size: int = 10_000,
 ) -> None:
+    """
+    Chunks are tagged with their brand when they are written. The retag here
+    only backfills chunks written before that (c.brand IS NULL); it starts from
+    the Document id index and commits every `retag_batch_size` chunks.
+    """
     if config.dims <= 0:
         raise ValueError("dims must be positive")
     if not brands:
         raise ValueError("brands mapping is empty")
 
+    # CALL ... IN TRANSACTIONS needs an auto-commit transaction (session.run)
     tag_query = f"""
     MATCH (d:{config.document_label})-[:{config.doc_chunk_rel}]->(c:{config.chunk_label})
-    WHERE d.id STARTS WITH $prefix
-    SET c:{{brand_label}}, c.brand = $brand
+    WHERE d.id STARTS WITH $prefix AND c.brand IS NULL
+    CALL {{
+      WITH c
+      SET c:{{brand_label}}, c.brand = $brand
+    }} IN TRANSACTIONS OF {int(retag_batch_size)} ROWS
     """
 
     with driver.session() as session:
         for brand, prefix in brands.items():
-            brand_label = f"{config.chunk_label}_{brand}"
-            q = tag_query.replace("{brand_label}", brand_label)
-            session.run(q, {"prefix": prefix, "brand": brand}).consume()
+            label = brand_label(brand, config.chunk_label)
+            q = tag_query.replace("{brand_label}", label)
+            summary = session.run(q, {"prefix": prefix, "brand": brand}).consume()
+            tagged = summary.counters.properties_set
+            if tagged:
+                log.info("Backfilled brand %s on %d chunks", brand, tagged)
+
+        # one parameter per option: `vector.dimensions`: $p0, ...
+        options = config.index_options()
+        params = {f"p{i}": v for i, v in enumerate(options.values())}
+        entries = ", ".join(f"`{k}`: $p{i}" for i, k in enumerate(options))
 
         def _create_vector_index(index_name: str, label: str) -> None:
             q = f"""
             CREATE VECTOR INDEX {index_name} IF NOT EXISTS
             FOR (c:{label}) ON (c.{config.embedding_prop})
-            OPTIONS {{
-              indexConfig: {{
-                `vector.dimensions`: $dims,
-                `vector.similarity_function`: $sim
-              }}
-            }}
+            OPTIONS {{indexConfig: {{{entries}}}}}
             """
-            session.run(q, {"dims": config.dims, "sim": config.similarity}).consume()
+            session.run(q, params).consume()
 
         _create_vector_index(f"{index_prefix}_general", config.chunk_label)
         for brand in brands.keys():
-            brand_label = f"{config.chunk_label}_{brand}"
-            _create_vector_index(f"{index_prefix}_{brand.lower()}", brand_label)
+            _create_vector_index(
+                f"{index_prefix}_{brand.lower()}", brand_label(brand, config.chunk_label)
+            )
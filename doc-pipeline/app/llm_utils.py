@@ -1,8 +1,14 @@
 import logging
+import re
 import time
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
 
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
+
+from .cache import DescriptionCache, EmbeddingCache
+from .metrics import metrics
+from .rate_limit import RateLimiter
 
 log = logging.getLogger(__name__)
 
@@ -28,53 +34,377 @@ TABLE_SYSTEM_PROMPT = (
     "4) Any footnotes/notes found (verbatim, plain text)\n"
 )
 
+TABLE_MERGE_SYSTEM_PROMPT = (
+    "You will receive descriptions of consecutive parts of ONE table, in order.\n"
+    "Merge them into a single description of the whole table that follows the\n"
+    "same rules: plain text, no markdown, no list markers, 1–6 short paragraphs.\n"
+    "Keep every metric and number exactly as written; do NOT drop rows, do NOT\n"
+    "invent, and state the topic, period and columns only once.\n"
+)
+
+# bump when split_table_rows changes how tables are cut
+TABLE_SPLIT_VERSION = 2
+
+# user message of a description request; the table follows
+TABLE_USER_PREFIX = "TABLE (Markdown):\n"
+
+# rough completion budget for the token bucket, descriptions are compact
+DESCRIPTION_MAX_TOKENS_ESTIMATE = 800
+
+
+def approx_tokens(text: str) -> int:
+    # ~4 chars per token for English prose; good enough to bound request size
+    return len(text) // 4 + 1
+
 
-def _retry(fn, *, retries: int = 3, backoff: float = 1.5):
+def _retry_after(e: Exception) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return float(value) * scale
+        except ValueError:
+            pass
+    return None
+
+
+def _retry(
+    fn,
+    *,
+    retries: int = 3,
+    backoff: float = 1.5,
+    limiter: Optional[RateLimiter] = None,
+    tokens: int = 1,
+):
     for i in range(retries):
         try:
+            if limiter is not None:
+                limiter.acquire(tokens)
             return fn()
         except Exception as e:
             if i == retries - 1:
+                metrics.count("api_errors")
                 raise
+            metrics.count("api_retries")
             sleep_s = backoff**i
+            if isinstance(e, RateLimitError):
+                metrics.count("api_rate_limited")
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    sleep_s = retry_after
+                if limiter is not None:
+                    # hold back every other thread too, then retry via acquire()
+                    limiter.pause(sleep_s)
+                    sleep_s = 0.0
             log.warning("LLM call failed (%s). Retrying in %.1fs...", e, sleep_s)
             time.sleep(sleep_s)
 
 
-def describe_table(
-    table_markdown: str, client: OpenAI, model: str, max_chars: int = 12000
+_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+
+
+def _hard_split(row: str, room: int) -> List[str]:
+    return [row[i : i + room] for i in range(0, len(row), room)]
+
+
+def split_table_rows(
+    table_markdown: str, max_chars: int, max_parts: int
+) -> List[str]:
+    """
+    Splits a Markdown table on row boundaries into at most max_parts parts,
+    each starting with the table header (and any caption before it). Parts are
+    about max_chars long, larger when the table would need more than
+    max_parts. Header rows, separators and captions that merged multi-page
+    tables repeat on every page are dropped; a single row (or caption) longer
+    than a part is cut into pieces, with a warning.
+    """
+    lines = table_markdown.splitlines()
+    sep = next((i for i, line in enumerate(lines) if _SEPARATOR_RE.match(line)), None)
+    if sep is None:
+        header, body = [], lines
+    else:
+        header, body = lines[: sep + 1], lines[sep + 1 :]
+    # a later page's header block: separator, the header row above it and
+    # caption text ("... (continued)") directly above that; a blank line ends
+    # the block, so footnotes of the previous page stay
+    dropped = set()
+    for j, line in enumerate(body):
+        if not _SEPARATOR_RE.match(line):
+            continue
+        dropped.add(j)
+        k = j - 1
+        while k >= 0 and not body[k].strip():
+            k -= 1
+        if k >= 0 and body[k].lstrip().startswith("|"):
+            dropped.add(k)
+            k -= 1
+        while k >= 0 and body[k].strip() and not body[k].lstrip().startswith("|"):
+            dropped.add(k)
+            k -= 1
+    # and anything that repeats the first caption / header row
+    repeated = {line.strip() for line in header if line.strip()}
+    rows = [
+        line
+        for j, line in enumerate(body)
+        if line.strip() and j not in dropped and line.strip() not in repeated
+    ]
+    if not rows:
+        return [table_markdown]
+
+    head = "\n".join(header)
+    if len(head) > max_chars // 2:
+        log.warning(
+            "Table header of %d chars cut to %d to leave room for rows",
+            len(head),
+            max_chars // 2,
+        )
+        head = head[: max_chars // 2]
+        header = [head]
+    room = max(max_chars - len(head) - 1, 1)
+    if any(len(r) > room for r in rows):
+        log.warning(
+            "Table rows longer than %d chars are cut into pieces (longest: %d)",
+            room,
+            max(len(r) for r in rows),
+        )
+        rows = [piece for r in rows for piece in _hard_split(r, room)]
+
+    body_chars = sum(len(r) + 1 for r in rows)
+    n_parts = max(1, min(max_parts, -(-body_chars // room)))
+    # cut at even shares of the body, so there are never more than n_parts
+    target = body_chars / n_parts
+    parts: List[List[str]] = [[]]
+    done = 0
+    for row in rows:
+        if parts[-1] and done >= target * len(parts):
+            parts.append([])
+        parts[-1].append(row)
+        done += len(row) + 1
+    return ["\n".join(header + p) for p in parts]
+
+
+def _description_cache_prompt(
+    table_markdown: str, max_chars: int, max_parts: int
 ) -> str:
-    table_markdown = (table_markdown or "").strip()
-    if not table_markdown:
-        raise ValueError("describe_table: empty table")
+    """
+    The prompt part of the description cache key. A merged description also
+    depends on the merge prompt and on how the table was split.
+    """
+    if len(table_markdown) <= max_chars:
+        return TABLE_SYSTEM_PROMPT
+    return (
+        f"{TABLE_SYSTEM_PROMPT}\n{TABLE_MERGE_SYSTEM_PROMPT}\n"
+        f"split v{TABLE_SPLIT_VERSION}: max_chars={max_chars} max_parts={max_parts}"
+    )
 
-    if len(table_markdown) > max_chars:
-        table_markdown = table_markdown[:max_chars] + "\n\n[TRUNCATED]"
 
+def _chat(
+    client: OpenAI,
+    model: str,
+    system: str,
+    user: str,
+    limiter: Optional[RateLimiter] = None,
+) -> str:
     def _call():
+        metrics.count("openai_chat_requests")
         resp = client.chat.completions.create(
             model=model,
             temperature=0.0,
             messages=[
-                {"role": "system", "content": TABLE_SYSTEM_PROMPT},
-                {"role": "user", "content": f"TABLE (Markdown):\n{table_markdown}"},
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
             ],
         )
         return resp.choices[0].message.content.strip()
 
-    return _retry(_call)
+    tokens = approx_tokens(system + user) + DESCRIPTION_MAX_TOKENS_ESTIMATE
+    with metrics.timer("describe"):
+        return _retry(_call, limiter=limiter, tokens=tokens)
 
 
-def embed_text(text: str, client: OpenAI, model: str) -> List[float]:
+def describe_table(
+    table_markdown: str,
+    client: OpenAI,
+    model: str,
+    max_chars: int = 12000,
+    cache: Optional[DescriptionCache] = None,
+    limiter: Optional[RateLimiter] = None,
+    max_parts: int = 8,
+) -> str:
+    """
+    Tables longer than max_chars are split on rows (see split_table_rows),
+    the parts described concurrently and the descriptions merged by one more
+    call: at most max_parts + 1 requests, about two calls of latency, and no
+    rows are lost.
+    """
+    table_markdown = (table_markdown or "").strip()
+    if not table_markdown:
+        raise ValueError("describe_table: empty table")
+
+    cache_prompt = _description_cache_prompt(table_markdown, max_chars, max_parts)
+    if cache is not None:
+        cached = cache.get(model, cache_prompt, table_markdown)
+        if cached is not None:
+            return cached
+
+    parts = (
+        split_table_rows(table_markdown, max_chars, max_parts)
+        if len(table_markdown) > max_chars
+        else [table_markdown]
+    )
+    if len(parts) == 1:
+        desc = _chat(
+            client,
+            model,
+            TABLE_SYSTEM_PROMPT,
+            TABLE_USER_PREFIX + parts[0],
+            limiter,
+        )
+    else:
+        metrics.count("tables_split")
+        log.info(
+            "Describing a %d-char table in %d parts", len(table_markdown), len(parts)
+        )
+        with ThreadPoolExecutor(
+            max_workers=len(parts), thread_name_prefix="describe-part"
+        ) as pool:
+            part_descs = list(
+                pool.map(
+                    lambda part: describe_table(
+                        part,
+                        client,
+                        model,
+                        max_chars=len(part),
+                        cache=cache,
+                        limiter=limiter,
+                    ),
+                    parts,
+                )
+            )
+        merged = "\n\n".join(
+            f"PART {i} of {len(parts)}:\n{d}" for i, d in enumerate(part_descs, 1)
+        )
+        desc = _chat(client, model, TABLE_MERGE_SYSTEM_PROMPT, merged, limiter)
+
+    if cache is not None:
+        cache.put(model, cache_prompt, table_markdown, desc)
+    return desc
+
+
+def _dimensions_kwarg(dimensions: Optional[int]) -> dict:
+    # only send the parameter when set: older models reject it
+    return {"dimensions": dimensions} if dimensions else {}
+
+
+def embed_text(
+    text: str,
+    client: OpenAI,
+    model: str,
+    cache: Optional[EmbeddingCache] = None,
+    limiter: Optional[RateLimiter] = None,
+    dimensions: Optional[int] = None,
+) -> List[float]:
     text = (text or "").strip()
     if not text:
         raise ValueError("embed_text: empty text")
 
+    if cache is not None:
+        cached = cache.get_many(model, [text], dimensions)[0]
+        if cached is not None:
+            return cached
+
     def _call():
+        metrics.count("openai_embed_requests")
         resp = client.embeddings.create(
             model=model,
             input=text,
+            **_dimensions_kwarg(dimensions),
         )
         return resp.data[0].embedding
 
-    return _retry(_call)
+    emb = _retry(_call, limiter=limiter, tokens=approx_tokens(text))
+    if cache is not None:
+        cache.put_many(model, [text], [emb], dimensions)
+    return emb
+
+
+def _embed_batch(
+    texts: List[str],
+    client: OpenAI,
+    model: str,
+    limiter: Optional[RateLimiter] = None,
+    dimensions: Optional[int] = None,
+) -> List[Optional[List[float]]]:
+    def _call():
+        metrics.count("openai_embed_requests")
+        resp = client.embeddings.create(
+            model=model,
+            input=texts,
+            **_dimensions_kwarg(dimensions),
+        )
+        data = sorted(resp.data, key=lambda d: d.index)
+        if len(data) != len(texts):
+            raise RuntimeError(
+                f"embed_texts: expected {len(texts)} embeddings, got {len(data)}"
+            )
+        return [d.embedding for d in data]
+
+    try:
+        return _retry(
+            _call, limiter=limiter, tokens=sum(approx_tokens(t) for t in texts)
+        )
+    except Exception as e:
+        log.warning(
+            "Batch embedding of %d inputs failed (%s). Falling back to single requests.",
+            len(texts),
+            e,
+        )
+
+    out: List[Optional[List[float]]] = []
+    for t in texts:
+        try:
+            out.append(
+                embed_text(
+                    t,
+                    client=client,
+                    model=model,
+                    limiter=limiter,
+                    dimensions=dimensions,
+                )
+            )
+        except Exception as e:
+            log.error("Embedding failed for input (%d chars): %s", len(t), e)
+            out.append(None)
+    return out
+
+
+def embed_texts(
+    texts: Sequence[str],
+    client: OpenAI,
+    model: str,
+    cache: Optional[EmbeddingCache] = None,
+    limiter: Optional[RateLimiter] = None,
+    dimensions: Optional[int] = None,
+) -> List[Optional[List[float]]]:
+    """
+    Embed many texts with one request. Cached texts are not sent. If the batch
+    request fails, fall back to one request per text so a single bad input
+    only loses its own vector (None). `dimensions` shortens the vectors
+    (text-embedding-3-* only).
+    """
+    texts = [(t or "").strip() for t in texts]
+    if not texts:
+        return []
+    if not all(texts):
+        raise ValueError("embed_texts: empty text in batch")
+
+    if cache is None:
+        return _embed_batch(texts, client, model, limiter, dimensions)
+    return cache.get_or_embed(
+        model,
+        texts,
+        lambda miss: _embed_batch(miss, client, model, limiter, dimensions),
+        dimensions,
+    )
@@ -8,5 +8,10 @@ def setup_logging(level: int = logging.INFO) -> None:
         return
     root.setLevel(level)
     h = StreamHandler()
-    h.setFormatter(Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
+    # thread names tell files apart when ingest runs with --jobs
+    h.setFormatter(
+        Formatter(
+            "%(asctime)s | %(levelname)s | %(threadName)s | %(name)s | %(message)s"
+        )
+    )
     root.addHandler(h)
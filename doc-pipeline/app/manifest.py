@@ -0,0 +1,98 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from neo4j import Driver
+
+from .neo4j_io import delete_chunks, get_document_state, set_document_source_hash
+
+log = logging.getLogger(__name__)
+
+
+def file_sha256(path: Path, fingerprint: str = "") -> str:
+    h = hashlib.sha256(fingerprint.encode("utf-8"))
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_content_hash(row: Dict[str, Any], fingerprint: str = "") -> str:
+    payload = [
+        fingerprint,
+        row["type"],
+        row.get("text") or row.get("table_markdown") or "",
+        row.get("table_ref"),
+        row.get("page_nos") or [],
+    ]
+    return hashlib.sha256(
+        json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+class DocumentManifest:
+    """
+    What Neo4j already holds for one document: the hash of the source JSON it
+    was built from and a content hash per chunk. One JSON file = one PDF = one
+    Document.
+
+    `fingerprint` (model names, ...) is mixed into every hash, so changing a
+    model re-processes everything. driver=None: a document that is not in the
+    graph yet (bulk import export), only the hashes are used.
+    """
+
+    def __init__(
+        self,
+        driver: Optional[Driver],
+        doc_id: str,
+        fingerprint: str = "",
+        force: bool = False,
+    ) -> None:
+        self.driver = driver
+        self.doc_id = doc_id
+        self.fingerprint = fingerprint
+        self.force = force
+        self.source_hash, self._existing = (
+            get_document_state(driver, doc_id) if driver is not None else (None, {})
+        )
+        self._seen: Set[str] = set()
+        self._committed: Set[str] = set()
+        self.unchanged = 0
+
+    def is_source_unchanged(self, source_hash: str) -> bool:
+        return not self.force and self.source_hash == source_hash
+
+    def resume_from(self, committed: Set[str]) -> None:
+        """Chunk ids an interrupted run already wrote; they count as unchanged."""
+        self._committed = committed
+
+    def content_hash(self, row: Dict[str, Any]) -> str:
+        return chunk_content_hash(row, self.fingerprint)
+
+    def is_chunk_unchanged(self, chunk_id: str, content_hash: str) -> bool:
+        self._seen.add(chunk_id)
+        if chunk_id in self._committed or (
+            not self.force and self._existing.get(chunk_id) == content_hash
+        ):
+            self.unchanged += 1
+            return True
+        return False
+
+    def finalize(self, source_hash: str, complete: bool) -> None:
+        """
+        Delete chunks that are no longer produced by the source and, if every
+        chunk was written, record the source hash so the file is skipped next time.
+        """
+        stale = [cid for cid in self._existing if cid not in self._seen]
+        if stale:
+            delete_chunks(self.driver, stale)
+            log.info("Deleted %d stale chunks of %s", len(stale), self.doc_id)
+        if complete:
+            set_document_source_hash(self.driver, self.doc_id, source_hash)
+        else:
+            log.warning(
+                "Not all chunks of %s were written; it will be re-processed next run",
+                self.doc_id,
+            )
@@ -0,0 +1,177 @@
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+log = logging.getLogger(__name__)
+
+
+class Metrics:
+    """
+    Process-wide stage timers and counters, safe to use from worker threads.
+
+    Stages (convert, chunk, describe, embed, neo4j_write, ...) record call
+    count, wall seconds and items (pages, chunks, rows). Worker processes
+    send their snapshot() back to be merge()d into the parent.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self._stages: Dict[str, Dict[str, float]] = {}
+            self._counters: Dict[str, int] = {}
+            self._totals: Dict[str, int] = {}
+
+    def add_time(self, stage: str, seconds: float, items: int = 1) -> None:
+        with self._lock:
+            s = self._stages.setdefault(
+                stage, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "items": 0}
+            )
+            s["calls"] += 1
+            s["seconds"] += seconds
+            s["max_seconds"] = max(s["max_seconds"], seconds)
+            s["items"] += items
+
+    @contextmanager
+    def timer(self, stage: str, items: int = 1) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - t0, items)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def set_total(self, name: str, total: int) -> None:
+        """Expected final value of counter `name`, for the progress ETA."""
+        with self._lock:
+            self._totals[name] = total
+
+    def get(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {k: dict(v) for k, v in self._stages.items()},
+                "counters": dict(self._counters),
+                "totals": dict(self._totals),
+            }
+
+    def merge(self, snap: Dict[str, Any]) -> None:
+        with self._lock:
+            for stage, src in snap.get("stages", {}).items():
+                dst = self._stages.setdefault(
+                    stage, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "items": 0}
+                )
+                dst["calls"] += src["calls"]
+                dst["seconds"] += src["seconds"]
+                dst["max_seconds"] = max(dst["max_seconds"], src["max_seconds"])
+                dst["items"] += src["items"]
+            for name, n in snap.get("counters", {}).items():
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def report(self, command: str, **extra: Any) -> Dict[str, Any]:
+        snap = self.snapshot()
+        elapsed = time.time() - self.started
+        for s in snap["stages"].values():
+            s["items_per_second"] = (
+                round(s["items"] / s["seconds"], 2) if s["seconds"] else None
+            )
+            s["seconds"] = round(s["seconds"], 3)
+            s["max_seconds"] = round(s["max_seconds"], 3)
+        started_at = datetime.fromtimestamp(self.started, timezone.utc)
+        return {
+            "command": command,
+            "started_at": started_at.isoformat(),
+            "wall_seconds": round(elapsed, 3),
+            "stages": snap["stages"],
+            "counters": snap["counters"],
+            **extra,
+        }
+
+
+metrics = Metrics()
+
+
+def write_run_report(report: Dict[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    stages = ", ".join(
+        f"{name} {s['seconds']:.1f}s" for name, s in sorted(report["stages"].items())
+    )
+    log.info(
+        "Run report %s: %.1fs wall (%s)", path, report["wall_seconds"], stages or "-"
+    )
+
+
+class ProgressLine:
+    """
+    Background thread that shows counters, throughput and an ETA every
+    `interval` seconds: rewritten in place on a terminal, logged otherwise.
+    The ETA uses the first counter with a known total (see Metrics.set_total).
+    """
+
+    def __init__(
+        self,
+        m: Metrics = metrics,
+        rate_counter: str = "chunks_written",
+        interval: float = 2.0,
+    ) -> None:
+        self.metrics = m
+        self.rate_counter = rate_counter
+        self.interval = interval
+        self._tty = sys.stderr.isatty()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def render(self) -> str:
+        snap = self.metrics.snapshot()
+        counters, totals = snap["counters"], snap["totals"]
+        elapsed = max(time.time() - self.metrics.started, 1e-9)
+        parts = [f"{elapsed:.0f}s"]
+        eta = None
+        for name, total in totals.items():
+            done = counters.get(name, 0)
+            parts.append(f"{name} {done}/{total}")
+            if eta is None and 0 < done < total:
+                eta = elapsed / done * (total - done)
+        n = counters.get(self.rate_counter, 0)
+        parts.append(f"{self.rate_counter} {n} ({n / elapsed:.1f}/s)")
+        if eta is not None:
+            parts.append(f"ETA {eta / 60:.1f}m")
+        return " | ".join(parts)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            line = self.render()
+            if self._tty:
+                sys.stderr.write("\r\033[K" + line)
+                sys.stderr.flush()
+            else:
+                log.info("progress: %s", line)
+
+    def __enter__(self) -> "ProgressLine":
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._tty:
+            sys.stderr.write("\r\033[K")
+            sys.stderr.flush()
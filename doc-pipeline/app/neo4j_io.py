@@ -1,15 +1,24 @@
 import logging
-from typing import List, Optional
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from neo4j import Driver, GraphDatabase
+from neo4j import Driver, GraphDatabase, ManagedTransaction
+
+from .indexes import brand_label, brand_of
+from .metrics import metrics
 
 log = logging.getLogger(__name__)
 
 
-def make_driver(uri: str, user: str, password: str) -> Driver:
+def make_driver(uri: str, user: str, password: str, verify: bool = True) -> Driver:
+    """
+    verify=False skips the RETURN 1 round trip, for callers whose first
+    statement (e.g. ensure_constraints) fails the same way on a bad connection.
+    """
     driver = GraphDatabase.driver(uri, auth=(user, password))
-    with driver.session() as s:
-        s.run("RETURN 1").consume()
+    if verify:
+        with driver.session() as s:
+            s.run("RETURN 1").consume()
     return driver
 
 
@@ -29,71 +38,299 @@ def ensure_constraints(driver: Driver) -> None:
             s.run(q).consume()
 
 
-def upsert_text_chunk(
-    driver: Driver,
-    doc_id: str,
-    chunk_id: str,
-    text: str,
-    embedding: List[float],
-    page_nos: Optional[List[int]] = None,
-) -> None:
-    cypher = """
-    MERGE (d:Document {id: $doc_id})
-      ON CREATE SET d.created_at = datetime()
-
-    MERGE (c:Chunk {id: $chunk_id})
-      SET c.type = 'text',
-          c.text = $text,
-          c.embedding = $embedding,
-          c.page_nos = coalesce($page_nos, []),
-          c.updated_at = datetime()
-
-    MERGE (d)-[:HAS_CHUNK]->(c)
+# {brand_label} is replaced per brand group (labels can't be parameters), see
+# _write_branded
+TEXT_CHUNKS_CYPHER = """
+UNWIND $rows AS row
+MERGE (d:Document {id: row.doc_id})
+  ON CREATE SET d.created_at = datetime()
+
+MERGE (c:Chunk {id: row.chunk_id})
+WITH d, c, row, c.content_hash AS old_hash
+  SET c.type = 'text',
+      c.text = row.text,
+      c.embedding = row.embedding,
+      c.page_nos = coalesce(row.page_nos, []),
+      c.content_hash = row.content_hash,
+      c.brand = row.brand,
+      c.updated_at = datetime()
+  REMOVE c.duplicate_of
+{brand_label}
+
+MERGE (d)-[:HAS_CHUNK]->(c)
+WITH c, row, old_hash
+OPTIONAL MATCH (c)-[r:DUPLICATE_OF]->()
+DELETE r
+WITH DISTINCT c, row, old_hash
+CALL {
+  // new content: duplicates linked to the old one (from other, unchanged
+  // files) no longer match, so their documents are processed again
+  WITH c, row, old_hash
+  WITH c WHERE old_hash IS NOT NULL AND old_hash <> row.content_hash
+  OPTIONAL MATCH (dd:Document)-[:HAS_CHUNK]->(dup:Chunk)-[link:DUPLICATE_OF]->(c)
+  SET dd.source_hash = null, dup.content_hash = null
+  DELETE link
+}
+"""
+
+TABLE_CHUNKS_CYPHER = """
+UNWIND $rows AS row
+MERGE (d:Document {id: row.doc_id})
+  ON CREATE SET d.created_at = datetime()
+
+MERGE (c:Chunk {id: row.chunk_id})
+WITH d, c, row, c.content_hash AS old_hash
+  SET c.type = 'table',
+      c.table_ref = row.table_ref,
+      c.table_markdown = row.table_markdown,
+      c.table_description = row.table_description,
+      c.embedding = row.embedding,
+      c.page_nos = coalesce(row.page_nos, []),
+      c.content_hash = row.content_hash,
+      c.brand = row.brand,
+      c.updated_at = datetime()
+  REMOVE c.duplicate_of
+{brand_label}
+
+MERGE (d)-[:HAS_CHUNK]->(c)
+WITH c, row, old_hash
+OPTIONAL MATCH (c)-[r:DUPLICATE_OF]->()
+DELETE r
+WITH DISTINCT c, row, old_hash
+CALL {
+  // new content: duplicates linked to the old one (from other, unchanged
+  // files) no longer match, so their documents are processed again
+  WITH c, row, old_hash
+  WITH c WHERE old_hash IS NOT NULL AND old_hash <> row.content_hash
+  OPTIONAL MATCH (dd:Document)-[:HAS_CHUNK]->(dup:Chunk)-[link:DUPLICATE_OF]->(c)
+  SET dd.source_hash = null, dup.content_hash = null
+  DELETE link
+}
+"""
+
+
+# duplicates keep provenance (document, pages) but no text or embedding, so
+# they stay out of the vector indexes; the canonical chunk holds the content.
+# If the canonical chunk is not in the graph (its write failed), the duplicate
+# keeps its own text and no content_hash and is returned, so the caller can
+# leave its document unfinished and the next ingest embeds it.
+DUPLICATE_CHUNKS_CYPHER = """
+UNWIND $rows AS row
+MERGE (d:Document {id: row.doc_id})
+  ON CREATE SET d.created_at = datetime()
+
+MERGE (c:Chunk {id: row.chunk_id})
+  SET c.type = row.type,
+      c.table_ref = row.table_ref,
+      c.duplicate_of = row.duplicate_of,
+      c.page_nos = coalesce(row.page_nos, []),
+      c.content_hash = row.content_hash,
+      c.brand = row.brand,
+      c.updated_at = datetime()
+  REMOVE c.text, c.table_markdown, c.table_description, c.embedding
+{brand_label}
+
+MERGE (d)-[:HAS_CHUNK]->(c)
+WITH c, row
+OPTIONAL MATCH (c)-[r:DUPLICATE_OF]->()
+DELETE r
+WITH DISTINCT c, row
+OPTIONAL MATCH (canon:Chunk {id: row.duplicate_of})
+FOREACH (_ IN CASE WHEN canon IS NULL THEN [1] ELSE [] END |
+  SET c.text = row.text,
+      c.table_markdown = row.table_markdown,
+      c.content_hash = null
+  REMOVE c.duplicate_of
+)
+FOREACH (_ IN CASE WHEN canon IS NULL THEN [] ELSE [1] END |
+  MERGE (c)-[:DUPLICATE_OF]->(canon)
+)
+WITH c, canon WHERE canon IS NULL
+RETURN c.id AS chunk_id
+"""
+
+
+def _row_bytes(row: Any) -> int:
+    # rough payload size: strings as UTF-8-ish chars, 8 bytes per vector value
+    if not isinstance(row, dict):
+        return len(str(row))
+    n = 0
+    for v in row.values():
+        if isinstance(v, str):
+            n += len(v)
+        elif isinstance(v, (list, tuple)):
+            n += 8 * len(v)
+        else:
+            n += 8
+    return n
+
+
+def _write_rows(
+    driver: Driver, cypher: str, rows: List[Any], param: str = "rows"
+) -> List[Dict[str, Any]]:
+    """Returns the records of the statement's RETURN clause, if it has one."""
+    if not rows:
+        return []
+
+    def _work(tx: ManagedTransaction) -> List[Dict[str, Any]]:
+        return tx.run(cypher, {param: rows}).data()
+
+    # execute_write retries transient errors (leader switch, deadlock, ...)
+    with metrics.timer("neo4j_write", items=len(rows)):
+        with driver.session() as s:
+            records = s.execute_write(_work)
+    metrics.count("neo4j_write_tx")
+    metrics.count("neo4j_bytes_est", sum(_row_bytes(r) for r in rows))
+    return records
+
+
+def _write_branded(
+    driver: Driver, cypher: str, rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
     """
-    with driver.session() as s:
-        s.run(
-            cypher,
-            doc_id=doc_id,
-            chunk_id=chunk_id,
-            text=text,
-            embedding=embedding,
-            page_nos=page_nos or [],
-        ).consume()
+    Tags chunks with their brand (property and Chunk_<Brand> label) in the
+    upsert itself, so the brand vector indexes see them without a relabel pass.
+    """
+    by_brand: Dict[Optional[str], List[Dict[str, Any]]] = defaultdict(list)
+    for r in rows:
+        brand = brand_of(r["doc_id"])
+        by_brand[brand].append({**r, "brand": brand})
+    records = []
+    for brand, group in by_brand.items():
+        label = f"SET c:{brand_label(brand)}" if brand else ""
+        cypher_for_brand = cypher.replace("{brand_label}", label)
+        records += _write_rows(driver, cypher_for_brand, group)
+    return records
+
+
+def upsert_text_chunks(driver: Driver, rows: List[Dict[str, Any]]) -> None:
+    _write_branded(driver, TEXT_CHUNKS_CYPHER, rows)
+
+
+def upsert_table_chunks(driver: Driver, rows: List[Dict[str, Any]]) -> None:
+    _write_branded(driver, TABLE_CHUNKS_CYPHER, rows)
+
 
+def upsert_duplicate_chunks(
+    driver: Driver, rows: List[Dict[str, Any]]
+) -> List[str]:
+    """Returns the ids of the duplicates whose canonical chunk was not found."""
+    records = _write_branded(driver, DUPLICATE_CHUNKS_CYPHER, rows)
+    return [r["chunk_id"] for r in records]
 
-def upsert_table_chunk(
-    driver: Driver,
-    doc_id: str,
-    chunk_id: str,
-    table_ref: str,
-    table_markdown: str,
-    table_description: str,
-    embedding: List[float],
-    page_nos: Optional[List[int]] = None,
-) -> None:
-    cypher = """
-    MERGE (d:Document {id: $doc_id})
-      ON CREATE SET d.created_at = datetime()
-
-    MERGE (c:Chunk {id: $chunk_id})
-      SET c.type = 'table',
-          c.table_ref = $table_ref,
-          c.table_markdown = $table_markdown,
-          c.table_description = $table_description,
-          c.embedding = $embedding,
-          c.page_nos = coalesce($page_nos, []),
-          c.updated_at = datetime()
-
-    MERGE (d)-[:HAS_CHUNK]->(c)
+
+def get_document_state(
+    driver: Driver, doc_id: str
+) -> Tuple[Optional[str], Dict[str, Optional[str]]]:
+    """
+    Returns (source_hash, {chunk_id: content_hash}) of a document, or
+    (None, {}) if it is not in the graph yet.
+    """
+    q = """
+    MATCH (d:Document {id: $doc_id})
+    OPTIONAL MATCH (d)-[:HAS_CHUNK]->(c:Chunk)
+    RETURN d.source_hash AS source_hash,
+           collect([c.id, c.content_hash]) AS chunks
     """
     with driver.session() as s:
-        s.run(
-            cypher,
+        rec = s.run(q, doc_id=doc_id).single()
+    if rec is None:
+        return None, {}
+    chunks = {cid: h for cid, h in rec["chunks"] if cid is not None}
+    return rec["source_hash"], chunks
+
+
+def set_document_source_hash(driver: Driver, doc_id: str, source_hash: str) -> None:
+    def _work(tx: ManagedTransaction) -> None:
+        tx.run(
+            """
+            MERGE (d:Document {id: $doc_id})
+              ON CREATE SET d.created_at = datetime()
+            SET d.source_hash = $source_hash,
+                d.ingested_at = datetime()
+            """,
             doc_id=doc_id,
-            chunk_id=chunk_id,
-            table_ref=table_ref,
-            table_markdown=table_markdown,
-            table_description=table_description,
-            embedding=embedding,
-            page_nos=page_nos or [],
+            source_hash=source_hash,
         ).consume()
+
+    with driver.session() as s:
+        s.execute_write(_work)
+
+
+def delete_chunks(driver: Driver, chunk_ids: List[str], batch_size: int = 1000) -> None:
+    # duplicates of a deleted chunk lose their content: mark them and their
+    # documents changed so the next ingest processes them again
+    q = """
+    UNWIND $ids AS id
+    MATCH (c:Chunk {id: id})
+    CALL {
+      WITH c
+      OPTIONAL MATCH (dd:Document)-[:HAS_CHUNK]->(dup:Chunk)-[:DUPLICATE_OF]->(c)
+      SET dd.source_hash = null, dup.content_hash = null
+    }
+    DETACH DELETE c
+    """
+    for i in range(0, len(chunk_ids), batch_size):
+        _write_rows(driver, q, chunk_ids[i : i + batch_size], param="ids")
+
+
+class ChunkWriter:
+    """
+    Buffers chunk rows and writes them with one UNWIND MERGE per batch.
+    Rows need a "type" key ('text' or 'table'); rows with "duplicate_of" are
+    written as links to that chunk. Call flush() once the file is
+    done. on_commit gets the chunk ids of every batch that was committed.
+
+    `missing_canonical` counts duplicates written without their link because
+    the canonical chunk was not in the graph; the file is then not complete.
+    """
+
+    def __init__(
+        self,
+        driver: Driver,
+        batch_size: int = 500,
+        on_commit: Optional[Callable[[List[str]], None]] = None,
+    ) -> None:
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+        self._driver = driver
+        self._batch_size = batch_size
+        self._on_commit = on_commit
+        self._rows: List[Dict[str, Any]] = []
+        self.missing_canonical = 0
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        dup_rows = [r for r in rows if r.get("duplicate_of")]
+        own_rows = [r for r in rows if not r.get("duplicate_of")]
+        text_rows = [r for r in own_rows if r["type"] == "text"]
+        table_rows = [r for r in own_rows if r["type"] == "table"]
+        upsert_text_chunks(self._driver, text_rows)
+        upsert_table_chunks(self._driver, table_rows)
+        missing = upsert_duplicate_chunks(self._driver, dup_rows)
+        if missing:
+            log.warning(
+                "%d duplicate chunks kept their own text, canonical chunk not "
+                "in the graph: %s",
+                len(missing),
+                ", ".join(missing[:5]),
+            )
+            self.missing_canonical += len(missing)
+        log.info(
+            "Wrote %d chunks to Neo4j (text=%d, table=%d, duplicate=%d)",
+            len(rows),
+            len(text_rows),
+            len(table_rows),
+            len(dup_rows),
+        )
+        metrics.count("chunks_written", len(rows))
+        metrics.count("chunks_duplicate", len(dup_rows))
+        if self._on_commit is not None:
+            self._on_commit([r["chunk_id"] for r in rows])
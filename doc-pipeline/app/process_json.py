@@ -1,53 +1,198 @@
 import logging
+import threading
+from collections import deque
+from concurrent.futures import (ALL_COMPLETED, FIRST_COMPLETED, Future,
+                                ThreadPoolExecutor, wait)
+from contextlib import closing
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import (TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, List,
+                    Optional, Set, Tuple, Union)
 
-import ijson
-
-from .llm_utils import describe_table, embed_text
-from .neo4j_io import upsert_table_chunk, upsert_text_chunk
+from .cache import DescriptionCache, EmbeddingCache
+from .checkpoint import Checkpoint
+from .embeddings import EmbeddingProvider, OpenAIEmbeddingProvider
+from .llm_utils import approx_tokens, describe_table
+from .manifest import DocumentManifest, file_sha256
+from .metrics import metrics
+from .neo4j_io import ChunkWriter
+from .quantize import quantize
+from .rate_limit import RateLimiter
 from .utils import (clean_table_text, clean_text, doc_id_from_chunk,
-                    is_table_chunk_local, page_nos_from_chunk, table_ref)
+                    find_chunk_files, is_table_chunk_local, iter_chunk_file,
+                    page_nos_from_chunk, table_ref)
+
+if TYPE_CHECKING:  # numpy is only needed with --dedup
+    from .dedup import DedupIndex
 
 log = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class IngestConfig:
+    # OpenAI allows up to 2048 inputs / ~300k tokens per embeddings request
+    embed_batch_size: int = 256
+    embed_batch_max_tokens: int = 100_000
+    write_batch_size: int = 500
+    describe_concurrency: int = 4
+    # files ingested concurrently; they share the driver, limiters and caches
+    jobs: int = 1
+    # how Chunk.embedding is stored: float32, float16 or int8 (see quantize.py)
+    embedding_storage: str = "float32"
+
+
+class EmbeddingBatcher:
+    """
+    Collects chunk rows and embeds them in token-bounded batches, then hands
+    every row that got a vector to the writer. Call flush() at the end of a file.
+
+    Table rows may arrive with a Future of their description; rows leave in
+    the order they were added, whatever order the descriptions finish in.
+    Duplicate rows wait in the same queue, so they reach the writer after
+    their canonical row, and are dropped (counted as failed) if it could not
+    be embedded.
+    """
+
+    def __init__(
+        self,
+        *,
+        embedder: EmbeddingProvider,
+        writer: ChunkWriter,
+        config: IngestConfig = IngestConfig(),
+        cache: Optional[EmbeddingCache] = None,
+    ) -> None:
+        self._embedder = embedder
+        self._writer = writer
+        self._cache = cache
+        self._config = config
+        # backpressure: stop reading the file while this many rows wait
+        self._max_waiting = config.embed_batch_size + 2 * config.describe_concurrency
+        self._waiting: Deque[Tuple[Dict[str, Any], Union[str, Future, None]]] = (
+            deque()
+        )
+        self._pending: List[Tuple[Dict[str, Any], Optional[str]]] = []
+        self._pending_tokens = 0
+        self._failed_ids: Set[str] = set()
+        self.failed = 0
+
+    def add(
+        self, row: Dict[str, Any], embed_input: Union[str, Future, None]
+    ) -> None:
+        """
+        embed_input=None: nothing to embed (duplicate), the row is written as
+        is after the rows added before it.
+        """
+        self._waiting.append((row, embed_input))
+        self._drain()
+
+    def flush(self) -> None:
+        self._drain(wait_all=True)
+        self._embed_pending()
+
+    def _drain(self, wait_all: bool = False) -> None:
+        while self._waiting:
+            row, item = self._waiting[0]
+            if isinstance(item, Future):
+                must_wait = wait_all or len(self._waiting) > self._max_waiting
+                if not item.done() and not must_wait:
+                    return
+                try:
+                    item = item.result()
+                except Exception as e:
+                    log.error("Skip table chunk %s: %s", row["chunk_id"], e)
+                    self._failed_ids.add(row["chunk_id"])
+                    self._waiting.popleft()
+                    self.failed += 1
+                    continue
+                row["table_description"] = item
+            self._waiting.popleft()
+            self._add_ready(row, item)
+
+    def _add_ready(self, row: Dict[str, Any], embed_input: Optional[str]) -> None:
+        n = approx_tokens(embed_input) if embed_input is not None else 0
+        if self._pending and (
+            len(self._pending) >= self._config.embed_batch_size
+            or self._pending_tokens + n > self._config.embed_batch_max_tokens
+        ):
+            self._embed_pending()
+        self._pending.append((row, embed_input))
+        self._pending_tokens += n
+
+    def _embed_pending(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending, self._pending_tokens = self._pending, [], 0
+
+        texts = [text for _, text in pending if text is not None]
+        embeddings = iter([])
+        if texts:
+            with metrics.timer("embed", items=len(texts)):
+                embeddings = iter(self._embedder.embed_texts(texts, cache=self._cache))
+            log.info("Embedded batch of %d chunks", len(texts))
+
+        for row, text in pending:
+            if text is None:
+                if row["duplicate_of"] in self._failed_ids:
+                    log.error(
+                        "Skip chunk %s: its canonical chunk %s was not written",
+                        row["chunk_id"],
+                        row["duplicate_of"],
+                    )
+                    self.failed += 1
+                else:
+                    self._writer.add(row)
+                continue
+            emb = next(embeddings)
+            if emb is None:
+                log.error("Skip chunk %s: no embedding", row["chunk_id"])
+                self._failed_ids.add(row["chunk_id"])
+                self.failed += 1
+                continue
+            self._writer.add(
+                {**row, "embedding": quantize(emb, self._config.embedding_storage)}
+            )
+
+
 def process_text_chunk(
     ch: Dict[str, Any],
     doc_id: str,
     text_counter: int,
     *,
-    client,
-    embed_model: str,
-    driver,
+    batcher: EmbeddingBatcher,
+    manifest: Optional[DocumentManifest] = None,
+    dedup: Optional["DedupIndex"] = None,
 ) -> None:
     text = clean_text(ch.get("text", ""))
     if not text:
         return
-    meta = {
+    row = {
+        "type": "text",
         "doc_id": doc_id,
         "chunk_id": f"{doc_id}::text::{text_counter}",
+        "text": text,
         "page_nos": page_nos_from_chunk(ch),
     }
-    emb = embed_text(text, client=client, model=embed_model)
-    upsert_text_chunk(
-        driver=driver,
-        doc_id=meta["doc_id"],
-        chunk_id=meta["chunk_id"],
-        text=text,
-        embedding=emb,
-        page_nos=meta.get("page_nos"),
-    )
+    if manifest is not None:
+        row["content_hash"] = manifest.content_hash(row)
+        if manifest.is_chunk_unchanged(row["chunk_id"], row["content_hash"]):
+            return
+    if dedup is not None:
+        canonical = dedup.canonical_of(row["chunk_id"], text)
+        if canonical is not None:
+            # text stays on the row in case the canonical chunk is missing
+            batcher.add({**row, "duplicate_of": canonical}, None)
+            return
+    batcher.add(row, text)
 
 
 def process_table_block(
     parts,
     combined_md: str,
     *,
-    client,
-    chat_model: str,
-    embed_model: str,
-    driver,
+    describe: Callable[[str], Union[str, Future]],
+    batcher: EmbeddingBatcher,
+    manifest: Optional[DocumentManifest] = None,
+    dedup: Optional["DedupIndex"] = None,
 ) -> None:
     # parts[0]
     ref = table_ref(parts[0])
@@ -55,40 +200,42 @@ def process_table_block(
     for p in parts:
         all_pages.update(page_nos_from_chunk(p))
     doc_id = doc_id_from_chunk(parts[0])
-    meta = {
+    row = {
+        "type": "table",
         "doc_id": doc_id,
         "chunk_id": f"{doc_id}::table::{ref.replace('#/tables/', '')}",
         "table_ref": ref,
+        "table_markdown": combined_md,
         "page_nos": sorted(all_pages),
     }
+    if manifest is not None:
+        row["content_hash"] = manifest.content_hash(row)
+        if manifest.is_chunk_unchanged(row["chunk_id"], row["content_hash"]):
+            return
+    if dedup is not None:
+        canonical = dedup.canonical_of(row["chunk_id"], combined_md)
+        if canonical is not None:
+            batcher.add({**row, "duplicate_of": canonical}, None)
+            return
 
-    desc = describe_table(combined_md, client=client, model=chat_model)
-    emb = embed_text(desc, client=client, model=embed_model)
+    batcher.add(row, describe(combined_md))
 
-    upsert_table_chunk(
-        driver=driver,
-        doc_id=meta["doc_id"],
-        chunk_id=meta["chunk_id"],
-        table_ref=meta["table_ref"],
-        table_markdown=combined_md,
-        table_description=desc,
-        embedding=emb,
-        page_nos=meta.get("page_nos"),
-    )
-    log.info("Saved table chunk %s (pages=%s)", meta["chunk_id"], meta.get("page_nos"))
 
+def peek_doc_id(json_path: Path) -> Optional[str]:
+    with closing(iter_chunk_file(json_path)) as chunks:
+        first = next(chunks, None)
+    return doc_id_from_chunk(first) if first is not None else None
 
-def process_json_file(
+
+def stream_chunks(
     json_path: Path,
     *,
-    client,
-    chat_model: str,
-    embed_model: str,
-    driver,
+    batcher: EmbeddingBatcher,
+    describe: Callable[[str], Union[str, Future]],
+    manifest: Optional[DocumentManifest] = None,
+    dedup: Optional["DedupIndex"] = None,
 ) -> None:
-    log.info("=== Processing: %s ===", json_path.name)
-    with json_path.open("rb") as f:
-        it = iter(ijson.items(f, "chunks.item"))
+    with closing(iter_chunk_file(json_path)) as it:
         text_counter = 0
         ch = next(it, None)
         while ch is not None:
@@ -110,10 +257,10 @@ def process_json_file(
                     process_table_block(
                         parts,
                         combined_table,
-                        client=client,
-                        chat_model=chat_model,
-                        embed_model=embed_model,
-                        driver=driver,
+                        describe=describe,
+                        batcher=batcher,
+                        manifest=manifest,
+                        dedup=dedup,
                     )
                 continue
 
@@ -123,32 +270,275 @@ def process_json_file(
                 ch,
                 doc_id,
                 text_counter,
-                client=client,
-                embed_model=embed_model,
-                driver=driver,
+                batcher=batcher,
+                manifest=manifest,
+                dedup=dedup,
             )
             ch = next(it, None)
 
-    log.info("=== Done: %s ===", json_path.name)
+
+def ingest_fingerprint(
+    embedder: EmbeddingProvider, chat_model: str, config: IngestConfig
+) -> str:
+    """Mixed into source and chunk hashes: changing a model re-processes all."""
+    fingerprint = f"{embedder.name}|{chat_model}"
+    if config.embedding_storage != "float32":
+        fingerprint += f"|{config.embedding_storage}"
+    return fingerprint
+
+
+def embed_and_write(
+    json_path: Path,
+    *,
+    writer,
+    manifest: Optional[DocumentManifest],
+    embedder: EmbeddingProvider,
+    client,
+    chat_model: str,
+    config: IngestConfig,
+    embed_cache: Optional[EmbeddingCache] = None,
+    description_cache: Optional[DescriptionCache] = None,
+    chat_limiter: Optional[RateLimiter] = None,
+    dedup: Optional["DedupIndex"] = None,
+) -> int:
+    """
+    Streams the chunks of one file through table descriptions and embedding
+    into `writer` (anything with add(row) and flush(), see ChunkWriter).
+    Returns the number of chunks that could not be written.
+    """
+    batcher = EmbeddingBatcher(
+        embedder=embedder, writer=writer, config=config, cache=embed_cache
+    )
+    pool = ThreadPoolExecutor(
+        max_workers=max(1, config.describe_concurrency),
+        thread_name_prefix=f"describe-{json_path.stem}",
+    )
+
+    def describe(md: str) -> Future:
+        return pool.submit(
+            describe_table,
+            md,
+            client=client,
+            model=chat_model,
+            cache=description_cache,
+            limiter=chat_limiter,
+        )
+
+    try:
+        stream_chunks(
+            json_path,
+            batcher=batcher,
+            describe=describe,
+            manifest=manifest,
+            dedup=dedup,
+        )
+        batcher.flush()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    writer.flush()
+    return batcher.failed
 
 
-def process_all_jsons(
-    data_root: Path,
+def process_json_file(
+    json_path: Path,
     *,
     client,
     chat_model: str,
     embed_model: str,
     driver,
+    config: IngestConfig = IngestConfig(),
+    embed_cache: Optional[EmbeddingCache] = None,
+    description_cache: Optional[DescriptionCache] = None,
+    force: bool = False,
+    chat_limiter: Optional[RateLimiter] = None,
+    embed_limiter: Optional[RateLimiter] = None,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    embedder: Optional[EmbeddingProvider] = None,
+    dedup: Optional["DedupIndex"] = None,
 ) -> None:
-    json_files = sorted(data_root.rglob("*.chunks_md_tables.json"))
-    if not json_files:
-        raise FileNotFoundError(f"No *.chunks_md_tables.json found under: {data_root}")
+    """
+    Embeddings come from `embedder`; if it is None, OpenAI `embed_model` is
+    used through `client`.
+    """
+    log.info("=== Processing: %s ===", json_path.name)
+    doc_id = peek_doc_id(json_path)
+    if doc_id is None:
+        log.warning("No chunks in %s", json_path.name)
+        return
+    if embedder is None:
+        embedder = OpenAIEmbeddingProvider(client, embed_model, embed_limiter)
+    fingerprint = ingest_fingerprint(embedder, chat_model, config)
+    source_hash = file_sha256(json_path, fingerprint)
+    manifest = DocumentManifest(driver, doc_id, fingerprint=fingerprint, force=force)
+    if manifest.is_source_unchanged(source_hash):
+        log.info("Skip (unchanged): %s", json_path.name)
+        metrics.count("files_unchanged")
+        metrics.count("files_done")
+        return
 
-    for p in json_files:
-        process_json_file(
-            p,
-            client=client,
-            chat_model=chat_model,
-            embed_model=embed_model,
-            driver=driver,
+    checkpoint = None
+    if checkpoint_dir is not None:
+        checkpoint = Checkpoint(checkpoint_dir, json_path, source_hash)
+        committed = checkpoint.start(resume)
+        if committed:
+            log.info(
+                "Resuming %s: %d chunks already written",
+                json_path.name,
+                len(committed),
+            )
+            manifest.resume_from(committed)
+
+    writer = ChunkWriter(
+        driver,
+        batch_size=config.write_batch_size,
+        on_commit=checkpoint.record if checkpoint is not None else None,
+    )
+    failed = embed_and_write(
+        json_path,
+        writer=writer,
+        manifest=manifest,
+        embedder=embedder,
+        client=client,
+        chat_model=chat_model,
+        config=config,
+        embed_cache=embed_cache,
+        description_cache=description_cache,
+        chat_limiter=chat_limiter,
+        dedup=dedup,
+    )
+    # duplicates of a chunk that another file failed to write
+    failed += writer.missing_canonical
+    manifest.finalize(source_hash, complete=failed == 0)
+    if checkpoint is not None:
+        checkpoint.clear()
+    metrics.count("chunks_unchanged", manifest.unchanged)
+    metrics.count("chunks_failed", failed)
+    metrics.count("files_done")
+    log.info(
+        "=== Done: %s (%d unchanged chunks skipped) ===",
+        json_path.name,
+        manifest.unchanged,
+    )
+
+
+def _ingest_one(
+    json_path: Path, process: Callable[..., None], kwargs: Dict[str, Any]
+) -> bool:
+    """One file, errors logged and counted so the other files carry on."""
+    thread = threading.current_thread()
+    name = thread.name
+    # log lines of concurrent files are told apart by thread name
+    thread.name = f"ingest-{json_path.stem}"
+    try:
+        with metrics.timer("ingest_file"):
+            process(json_path, **kwargs)
+    except Exception as e:
+        log.exception("ERROR ingesting %s: %s", json_path.name, e)
+        metrics.count("files_failed")
+        return False
+    finally:
+        thread.name = name
+    return True
+
+
+def run_files(
+    json_files: Iterable[Path],
+    process: Callable[..., None],
+    kwargs: Dict[str, Any],
+    jobs: int = 1,
+) -> None:
+    """
+    process(path, **kwargs) for every file, `jobs` at a time. Files are taken
+    from the iterable only when a worker is free, so with a producer that is
+    still converting (full --pipelined) ingest starts on the first file.
+    """
+    results: List[Tuple[Path, bool]] = []
+    if jobs > 1:
+        log.info("Ingesting files, %d at a time", jobs)
+        with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="ingest") as pool:
+            running: Dict[Future, Path] = {}
+
+            def _collect(return_when: str) -> None:
+                finished, _ = wait(running, return_when=return_when)
+                for fut in finished:
+                    results.append((running.pop(fut), fut.result()))
+
+            for path in json_files:
+                if len(running) >= jobs:
+                    _collect(FIRST_COMPLETED)
+                running[pool.submit(_ingest_one, path, process, kwargs)] = path
+            if running:
+                _collect(ALL_COMPLETED)
+    else:
+        results = [(p, _ingest_one(p, process, kwargs)) for p in json_files]
+
+    failed = [p.name for p, good in results if not good]
+    if failed:
+        raise RuntimeError(
+            f"Ingest failed for {len(failed)} of {len(results)} files: "
+            + ", ".join(failed)
+        )
+
+
+def process_json_files(
+    json_files: Iterable[Path],
+    *,
+    client,
+    chat_model: str,
+    embed_model: str,
+    driver,
+    config: IngestConfig = IngestConfig(),
+    embed_cache: Optional[EmbeddingCache] = None,
+    description_cache: Optional[DescriptionCache] = None,
+    force: bool = False,
+    chat_limiter: Optional[RateLimiter] = None,
+    embed_limiter: Optional[RateLimiter] = None,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    embedder: Optional[EmbeddingProvider] = None,
+    dedup: Optional["DedupIndex"] = None,
+) -> None:
+    """
+    Ingests the files, config.jobs at a time. Files have distinct doc_ids, so
+    they only share the driver's connection pool, the rate limiters and the
+    caches. A failing file doesn't stop the others; RuntimeError at the end
+    lists the failed files.
+    """
+    if embedder is None:
+        # one provider for all files, so its limiter is shared
+        embedder = OpenAIEmbeddingProvider(client, embed_model, embed_limiter)
+    kwargs = dict(
+        client=client,
+        chat_model=chat_model,
+        embed_model=embed_model,
+        driver=driver,
+        config=config,
+        embed_cache=embed_cache,
+        description_cache=description_cache,
+        force=force,
+        chat_limiter=chat_limiter,
+        embed_limiter=embed_limiter,
+        checkpoint_dir=checkpoint_dir,
+        resume=resume,
+        embedder=embedder,
+        dedup=dedup,
+    )
+
+    try:
+        run_files(json_files, process_json_file, kwargs, config.jobs)
+    finally:
+        for stats in (embed_cache, description_cache, dedup):
+            if stats is not None:
+                stats.log_stats()
+
+
+def process_all_jsons(data_root: Path, **kwargs) -> None:
+    json_files = find_chunk_files(data_root)
+    if not json_files:
+        raise FileNotFoundError(
+            f"No *.chunks_md_tables.json(l) found under: {data_root}"
         )
+
+    metrics.set_total("files_done", len(json_files))
+    process_json_files(json_files, **kwargs)
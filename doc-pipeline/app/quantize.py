@@ -0,0 +1,50 @@
+import struct
+from typing import List, Sequence, Union
+
+STORAGE_TYPES = ("float32", "float16", "int8")
+
+
+def _check(storage: str) -> None:
+    if storage not in STORAGE_TYPES:
+        raise ValueError(
+            f"Unknown embedding storage {storage!r}, use one of {STORAGE_TYPES}"
+        )
+
+
+def pack_vector(vector: Sequence[float], storage: str = "float32") -> bytes:
+    """Compact bytes for the embedding cache (float16 halves the size)."""
+    _check(storage)
+    fmt = "e" if storage in ("float16", "int8") else "f"
+    return struct.pack(f"<{len(vector)}{fmt}", *vector)
+
+
+def unpack_vector(blob: bytes, storage: str = "float32") -> List[float]:
+    _check(storage)
+    if storage in ("float16", "int8"):
+        return list(struct.unpack(f"<{len(blob) // 2}e", blob))
+    return list(struct.unpack(f"<{len(blob) // 4}f", blob))
+
+
+def quantize(
+    vector: Sequence[float], storage: str = "float32"
+) -> List[Union[float, int]]:
+    """
+    The vector as it is written to Chunk.embedding.
+
+    float16: values rounded to half precision, so fresh and cached vectors
+    are identical.
+    int8: integers in [-127, 127], scaled per vector. Cosine similarity is
+    scale invariant, so the vector index and float query vectors work as
+    before; Neo4j stores small integers bit-packed and Bolt sends them in
+    1-2 bytes instead of 9 per float.
+    """
+    _check(storage)
+    if storage == "float32":
+        return list(vector)
+    if storage == "float16":
+        return unpack_vector(pack_vector(vector, storage), storage)
+    peak = max((abs(v) for v in vector), default=0.0)
+    if peak == 0.0:
+        return [0] * len(vector)
+    scale = 127.0 / peak
+    return [int(round(v * scale)) for v in vector]
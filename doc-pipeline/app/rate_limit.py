@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token bucket over requests/min and tokens/min, shared by all threads that
+    call one model. pause() blocks everyone, e.g. for a 429 Retry-After.
+    A limit of None means unlimited.
+    """
+
+    def __init__(
+        self,
+        requests_per_min: Optional[int] = None,
+        tokens_per_min: Optional[int] = None,
+    ) -> None:
+        self._rpm = requests_per_min
+        self._tpm = tokens_per_min
+        self._requests = float(requests_per_min or 0)
+        self._tokens = float(tokens_per_min or 0)
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last
+        self._last = now
+        if self._rpm:
+            self._requests = min(self._rpm, self._requests + elapsed * self._rpm / 60)
+        if self._tpm:
+            self._tokens = min(self._tpm, self._tokens + elapsed * self._tpm / 60)
+
+    def acquire(self, tokens: int = 1) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    # a request bigger than the bucket waits for a full bucket
+                    need = min(tokens, self._tpm) if self._tpm else 0
+                    req_wait = (
+                        (1 - self._requests) * 60 / self._rpm if self._rpm else 0.0
+                    )
+                    tok_wait = (need - self._tokens) * 60 / self._tpm if self._tpm else 0.0
+                    wait = max(req_wait, tok_wait)
+                    if wait <= 0:
+                        if self._rpm:
+                            self._requests -= 1
+                        if self._tpm:
+                            self._tokens -= need
+                        return
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        log.warning("Rate limited: pausing requests for %.1fs", seconds)
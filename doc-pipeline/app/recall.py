@@ -0,0 +1,136 @@
+import json
+import logging
+import random
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .cache import EmbeddingCache
+from .embeddings import EmbeddingProvider
+from .quantize import quantize
+from .utils import clean_text, find_chunk_files, is_table_chunk_local, iter_chunk_file
+
+log = logging.getLogger(__name__)
+
+
+def sample_chunk_texts(json_dir: Path, sample: int, seed: int = 0) -> List[str]:
+    """Reservoir sample of text chunks (tables embed a description, skip them)."""
+    rng = random.Random(seed)
+    picked: List[str] = []
+    seen = 0
+    for path in find_chunk_files(json_dir):
+        for ch in iter_chunk_file(path):
+            if is_table_chunk_local(ch):
+                continue
+            text = clean_text(ch.get("text", ""))
+            if not text:
+                continue
+            seen += 1
+            if len(picked) < sample:
+                picked.append(text)
+            else:
+                j = rng.randrange(seen)
+                if j < sample:
+                    picked[j] = text
+    return picked
+
+
+def hold_out_queries(
+    texts: Sequence[str], num_queries: int, seed: int = 0
+) -> Tuple[List[str], List[str]]:
+    """
+    Splits sampled chunks into (queries, documents) with no text in both: a
+    query that is also a document finds itself at any precision, which pulls
+    recall@k towards 1.0.
+    """
+    texts = list(dict.fromkeys(texts))
+    random.Random(seed).shuffle(texts)
+    return texts[:num_queries], texts[num_queries:]
+
+
+def _matrix(vectors: Sequence[Optional[Sequence[float]]]) -> np.ndarray:
+    if any(v is None for v in vectors):
+        raise RuntimeError("recall report: some texts could not be embedded")
+    m = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return m / np.maximum(norms, 1e-12)
+
+
+def _top_k(queries: np.ndarray, docs: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ docs.T
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def recall_at_k(expected: np.ndarray, found: np.ndarray) -> float:
+    """Mean share of the expected top-k ids that are also in the found top-k."""
+    k = expected.shape[1]
+    hits = [len(set(e) & set(f)) for e, f in zip(expected.tolist(), found.tolist())]
+    return float(np.mean(hits)) / k if hits else 0.0
+
+
+def recall_report(
+    docs: Sequence[str],
+    queries: Sequence[str],
+    *,
+    make_embedder: Callable[[Optional[int]], EmbeddingProvider],
+    dimensions: Sequence[Optional[int]],
+    storages: Sequence[str],
+    k: int = 10,
+    cache: Optional[EmbeddingCache] = None,
+) -> Dict:
+    """
+    recall@k of every (dimensions, storage) variant against the full-precision
+    baseline (native dimensions, float32), by exact search over `docs`.
+    Queries are embedded in float like the backend does; only the stored
+    document vectors are quantized. The ANN index adds its own (small) loss.
+    """
+    if not docs or not queries:
+        raise ValueError("recall report needs documents and queries")
+    k = min(k, len(docs))
+
+    baseline = make_embedder(None)
+    expected = _top_k(
+        _matrix(baseline.embed_texts(queries, cache=cache)),
+        _matrix(baseline.embed_texts(docs, cache=cache)),
+        k,
+    )
+
+    results = []
+    for dims in dimensions:
+        embedder = make_embedder(dims)
+        q = _matrix(embedder.embed_texts(queries, cache=cache))
+        d_raw = embedder.embed_texts(docs, cache=cache)
+        for storage in storages:
+            d = _matrix([quantize(v, storage) for v in d_raw])
+            r = recall_at_k(expected, _top_k(q, d, k))
+            results.append(
+                {"dimensions": embedder.dims, "storage": storage, f"recall@{k}": r}
+            )
+            log.info(
+                "%s dims=%d storage=%s recall@%d=%.4f",
+                embedder.name,
+                embedder.dims,
+                storage,
+                k,
+                r,
+            )
+
+    return {
+        "baseline": baseline.name,
+        "baseline_dimensions": baseline.dims,
+        "k": k,
+        "documents": len(docs),
+        "queries": len(queries),
+        "results": results,
+    }
+
+
+def write_report(report: Dict, out: Optional[Path]) -> None:
+    text = json.dumps(report, indent=2)
+    if out is None:
+        print(text)
+    else:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(text + "\n", encoding="utf-8")
+        log.info("Recall report written to %s", out)
@@ -0,0 +1,67 @@
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List
+
+log = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def run_pipelined(
+    produced: Iterator[Path],
+    consume: Callable[[Iterable[Path]], None],
+    queue_size: int = 2,
+) -> None:
+    """
+    Runs `produced` (e.g. PDF conversion) in a background thread and feeds its
+    items to `consume` (e.g. ingest) through a bounded queue, so both stages
+    overlap. The producer blocks while the queue is full.
+    """
+    if queue_size <= 0:
+        raise ValueError("queue_size must be positive")
+    q: "queue.Queue[object]" = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def _put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in produced:
+                if not _put(item):
+                    break
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            # closing the generator tears down e.g. a worker pool
+            close = getattr(produced, "close", None)
+            if close is not None:
+                close()
+            _put(_DONE)
+
+    def _consume_iter() -> Iterator[Path]:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            log.info("Handing %s to ingest (%d queued)", item.name, q.qsize())
+            yield item
+
+    producer = threading.Thread(target=_produce, name="produce", daemon=True)
+    producer.start()
+    try:
+        consume(_consume_iter())
+    finally:
+        stop.set()
+        producer.join()
+    if errors:
+        raise errors[0]
@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
+
+import ijson
+
+CHUNKS_JSON_SUFFIX = ".chunks_md_tables.json"
+CHUNKS_JSONL_SUFFIX = ".chunks_md_tables.jsonl"
 
 
 def clean_text(s: str) -> str:
@@ -49,3 +55,41 @@ def page_nos_from_chunk(ch: dict) -> list[int]:
             if isinstance(pn, int):
                 pages.add(pn)
     return sorted(pages)
+
+
+def slim_meta(meta: dict | None) -> dict:
+    """Keep only the chunk metadata ingest reads (see the helpers above)."""
+    meta = meta or {}
+    origin = meta.get("origin") or {}
+    return {
+        "origin": {"filename": origin.get("filename")},
+        "doc_items": [
+            {
+                "label": it.get("label"),
+                "self_ref": it.get("self_ref"),
+                "prov": [{"page_no": p.get("page_no")} for p in it.get("prov") or []],
+            }
+            for it in meta.get("doc_items") or []
+        ],
+    }
+
+
+def iter_chunk_file(path: Path) -> Iterator[dict]:
+    """Stream chunks from a *.chunks_md_tables.json or *.jsonl file."""
+    with path.open("rb") as f:
+        if path.name.endswith(CHUNKS_JSONL_SUFFIX):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from ijson.items(f, "chunks.item")
+
+
+def find_chunk_files(root: Path) -> List[Path]:
+    """All chunk files under root; if both formats exist, the JSONL one wins."""
+    by_base: Dict[Path, Path] = {}
+    for p in sorted(root.rglob("*" + CHUNKS_JSON_SUFFIX)):
+        by_base[p.parent / p.name[: -len(CHUNKS_JSON_SUFFIX)]] = p
+    for p in sorted(root.rglob("*" + CHUNKS_JSONL_SUFFIX)):
+        by_base[p.parent / p.name[: -len(CHUNKS_JSONL_SUFFIX)]] = p
+    return [by_base[k] for k in sorted(by_base)]
@@ -0,0 +1,71 @@
+"""Stand-ins for the embedding provider and Neo4j shared by the tests."""
+
+from types import SimpleNamespace
+
+from app.embeddings import EmbeddingProvider
+
+
+class FakeEmbedder(EmbeddingProvider):
+    """Fails on texts containing `fail_on`."""
+
+    name = "fake"
+    dims = 2
+
+    def __init__(self, fail_on: str = "") -> None:
+        self.fail_on = fail_on
+        self.embedded = []
+
+    def embed_texts(self, texts, cache=None):
+        self.embedded += texts
+        return [
+            None if self.fail_on and self.fail_on in t else [0.5, 0.5] for t in texts
+        ]
+
+
+class FakeGraph:
+    """
+    Driver stand-in that keeps the written chunk ids, so duplicate writes
+    report canonical chunks that are not in the graph yet. With `fail_on_write`
+    the n-th chunk write (1-based) raises, like a lost connection.
+    """
+
+    def __init__(self, fail_on_write: int = 0) -> None:
+        self.fail_on_write = fail_on_write
+        self.chunks = set()
+        self.writes = []
+        self.source_hashes = {}
+
+    def session(self, **kw):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+    def execute_write(self, fn):
+        return fn(self)
+
+    def run(self, cypher, parameters=None, **kw):
+        params = {**(parameters or {}), **kw}
+        records = []
+        if "source_hash" in params:
+            self.source_hashes[params["doc_id"]] = params["source_hash"]
+        rows = params.get("rows")
+        if rows is not None:
+            if len(self.writes) + 1 == self.fail_on_write:
+                raise ConnectionError("connection lost")
+            if "c.duplicate_of = row.duplicate_of" in cypher:
+                self.writes.append(("duplicate", [r["chunk_id"] for r in rows]))
+                records = [
+                    {"chunk_id": r["chunk_id"]}
+                    for r in rows
+                    if r["duplicate_of"] not in self.chunks
+                ]
+            else:
+                self.writes.append(("chunk", [r["chunk_id"] for r in rows]))
+                self.chunks.update(r["chunk_id"] for r in rows)
+        return SimpleNamespace(
+            data=lambda: records, single=lambda: None, consume=lambda: None
+        )
@@ -0,0 +1,154 @@
+import io
+import json
+
+from fakes import FakeGraph
+
+from app.batch_api import (CHAT_ENDPOINT, EMBED_ENDPOINT, BatchState,
+                           _apply_results, _describe_requests, _submit,
+                           _write_jobs, prefill_caches)
+from app.bench import BenchConfig, FakeOpenAI
+from app.cache import DescriptionCache, EmbeddingCache
+from app.embeddings import OpenAIEmbeddingProvider
+from app.llm_utils import TABLE_SYSTEM_PROMPT
+from app.process_json import IngestConfig, embed_and_write
+
+TABLE = "| segment | revenue |\n|---|---|\n| Automotive | 132,277 |"
+
+
+class NullWriter:
+    def add(self, row):
+        pass
+
+    def flush(self):
+        pass
+
+
+def _setup(tmp_path):
+    client = FakeOpenAI(BenchConfig(chat_latency=0.0, embed_latency=0.0, dims=4))
+    embedder = OpenAIEmbeddingProvider(client, "text-embedding-3-small")
+    caches = dict(
+        embed_cache=EmbeddingCache(tmp_path / "embeddings.sqlite"),
+        description_cache=DescriptionCache(tmp_path / "descriptions.sqlite"),
+    )
+    return client, embedder, caches
+
+
+def _chunk_file(tmp_path):
+    path = tmp_path / "BMW_AR_2023.chunks_md_tables.jsonl"
+    chunks = [
+        ("Revenue grew by 9%.", "text", "#/texts/0"),
+        (TABLE, "table", "#/tables/0"),
+        ("Outlook for 2024.", "text", "#/texts/1"),
+    ]
+    with path.open("w", encoding="utf-8") as f:
+        for text, label, ref in chunks:
+            meta = {
+                "origin": {"filename": "BMW_AR_2023.pdf"},
+                "doc_items": [{"label": label, "self_ref": ref, "prov": []}],
+            }
+            f.write(json.dumps({"text": text, "meta": meta}) + "\n")
+    return path
+
+
+def test_prefilled_caches_leave_nothing_for_ingest(tmp_path):
+    client, embedder, caches = _setup(tmp_path)
+    path = _chunk_file(tmp_path)
+
+    result = prefill_caches(
+        [path],
+        client=client,
+        driver=FakeGraph(),
+        embedder=embedder,
+        chat_model="chat",
+        config=IngestConfig(),
+        batch_dir=tmp_path / "batches",
+        poll_interval=0.0,
+        **caches,
+    )
+    # round 1: description + text embeddings, round 2: the description's embedding
+    assert result == {"rounds": 2}
+    assert client.batch_requests == 3
+    assert sorted(p.name for p in (tmp_path / "batches").iterdir()) == ["state.json"]
+
+    failed = embed_and_write(
+        path,
+        writer=NullWriter(),
+        manifest=None,
+        embedder=embedder,
+        client=client,
+        chat_model="chat",
+        config=IngestConfig(),
+        **caches,
+    )
+    assert failed == 0
+    assert (client.embed_requests, client.chat_requests) == (0, 0)
+
+
+def test_only_successful_responses_are_cached(tmp_path):
+    client, embedder, caches = _setup(tmp_path)
+    state = BatchState(tmp_path / "batches")
+    tables = ["| a |\n|---|\n| 1 |", "| b |\n|---|\n| 2 |", "| c |\n|---|\n| 3 |"]
+    _write_jobs(state, _describe_requests(tables, "chat"), CHAT_ENDPOINT)
+
+    def line(custom_id, status, error=None):
+        body = {"choices": [{"message": {"content": f" about {custom_id} "}}]}
+        return json.dumps(
+            {
+                "custom_id": custom_id,
+                "response": {"status_code": status, "body": body},
+                "error": error,
+            }
+        )
+
+    output = "\n".join(
+        [
+            line("describe-0", 200),
+            line("describe-1", 500),
+            line("describe-2", 200, error={"message": "failed"}),
+            line("describe-9", 200),  # not a request of this job
+        ]
+    )
+    file_id = client.files.create(file=io.BytesIO(output.encode()), purpose="x").id
+
+    job = state.jobs[0]
+    applied = _apply_results(client, job, file_id, embedder=embedder, **caches)
+
+    cache = caches["description_cache"]
+    assert applied == 1
+    assert cache.get("chat", TABLE_SYSTEM_PROMPT, tables[0]) == "about describe-0"
+    assert cache.get("chat", TABLE_SYSTEM_PROMPT, tables[1]) is None
+    assert cache.get("chat", TABLE_SYSTEM_PROMPT, tables[2]) is None
+
+
+def test_submitted_batches_are_picked_up_again(tmp_path):
+    client, embedder, caches = _setup(tmp_path)
+    path = _chunk_file(tmp_path)
+    # a previous run submitted the embeddings and was stopped while waiting
+    state = BatchState(tmp_path / "batches")
+    state.round = 1
+    texts = ["Revenue grew by 9%.", "Outlook for 2024."]
+    request = {
+        "custom_id": "embed-0",
+        "method": "POST",
+        "url": EMBED_ENDPOINT,
+        "body": {"model": embedder.model, "input": texts},
+    }
+    _write_jobs(state, [request], EMBED_ENDPOINT)
+    _submit(client, state)
+    assert client.batch_requests == 1
+
+    prefill_caches(
+        [path],
+        client=client,
+        driver=FakeGraph(),
+        embedder=embedder,
+        chat_model="chat",
+        config=IngestConfig(),
+        batch_dir=tmp_path / "batches",
+        poll_interval=0.0,
+        **caches,
+    )
+    # the texts came from the old batch; only the table and its embedding remain
+    assert client.batch_requests == 1 + 2
+    cached = caches["embed_cache"].get_many(embedder.model, texts)
+    assert all(v is not None for v in cached)
@@ -0,0 +1,73 @@
+import csv
+import gzip
+
+from app.bulk_import import ImportCsvWriter
+
+
+def _row(doc_id, n, text):
+    return {
+        "doc_id": doc_id,
+        "chunk_id": f"{doc_id}::text::{n}",
+        "type": "text",
+        "text": text,
+        "embedding": [0.5, 0.25],
+        "page_nos": [1],
+        "content_hash": text,
+    }
+
+
+def _rows(out_dir, name):
+    with gzip.open(out_dir / f"{name}.csv.gz", "rt", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_repeated_ids_are_written_once(tmp_path):
+    writer = ImportCsvWriter(tmp_path)
+    # two chunk files with the same file name (e.g. in different folders)
+    for text in ("first", "second"):
+        writer.add(_row("BMW_AR_2023.pdf", 0, text))
+        writer.add(_row("BMW_AR_2023.pdf", 1, text + " more"))
+        writer.add_document("BMW_AR_2023.pdf", "hash")
+    writer.close()
+
+    chunks = _rows(tmp_path, "chunks")
+    assert [r[0] for r in chunks] == [
+        "BMW_AR_2023.pdf::text::0",
+        "BMW_AR_2023.pdf::text::1",
+    ]
+    assert chunks[0][3] == "first"
+    assert len(_rows(tmp_path, "has_chunk")) == 2
+    assert len(_rows(tmp_path, "documents")) == 1
+    assert (writer.documents, writer.chunks) == (1, 2)
+
+
+def test_import_script_runs_indexes(tmp_path):
+    writer = ImportCsvWriter(tmp_path)
+    writer.close()
+    script = writer.write_import_script().read_text(encoding="utf-8")
+    assert script.index("neo4j-admin") < script.index("-m app.cli indexes")
+    assert "exit 1" in script
+
+
+def test_duplicate_without_exported_canonical_keeps_its_text(tmp_path):
+    writer = ImportCsvWriter(tmp_path)
+    writer.add(_row("BMW_AR_2023.pdf", 0, "canonical"))
+    duplicate = _row("BMW_AR_2023.pdf", 1, "same")
+    writer.add({**duplicate, "duplicate_of": "BMW_AR_2023.pdf::text::0"})
+    writer.add_document("BMW_AR_2023.pdf", "hash-2023")
+    # canonical in a file that failed to embed
+    orphan = _row("BMW_AR_2022.pdf", 0, "orphan")
+    writer.add({**orphan, "duplicate_of": "BMW_AR_2021.pdf::text::0"})
+    writer.add_document("BMW_AR_2022.pdf", "hash-2022")
+    writer.close()
+
+    chunks = {r[0]: r for r in _rows(tmp_path, "chunks")}
+    assert chunks["BMW_AR_2023.pdf::text::1"][3] == ""
+    orphan = chunks["BMW_AR_2022.pdf::text::0"]
+    assert orphan[3] == "orphan"
+    assert orphan[9] == "" and orphan[11] == ""  # content_hash, duplicate_of
+    assert _rows(tmp_path, "duplicate_of") == [
+        ["BMW_AR_2023.pdf::text::1", "BMW_AR_2023.pdf::text::0", "DUPLICATE_OF"]
+    ]
+    documents = {r[0]: r[2] for r in _rows(tmp_path, "documents")}
+    assert documents == {"BMW_AR_2023.pdf": "hash-2023", "BMW_AR_2022.pdf": ""}
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from fakes import FakeEmbedder, FakeGraph
+
+from app.checkpoint import Checkpoint
+from app.process_json import IngestConfig, process_json_file
+
+
+def test_recorded_ids_survive_a_torn_last_line(tmp_path):
+    json_path = tmp_path / "doc.chunks_md_tables.jsonl"
+    checkpoint = Checkpoint(tmp_path / "checkpoints", json_path, "hash-1")
+    assert checkpoint.start(resume=True) == set()
+    checkpoint.record(["doc::text::1", "doc::text::2"])
+    with checkpoint.path.open("a", encoding="utf-8") as f:
+        f.write("doc::te")  # crash in the middle of a line
+
+    assert checkpoint.load() == {"doc::text::1", "doc::text::2"}
+
+
+def test_checkpoint_of_other_contents_or_without_resume_is_ignored(tmp_path):
+    json_path = tmp_path / "doc.chunks_md_tables.jsonl"
+    directory = tmp_path / "checkpoints"
+    old = Checkpoint(directory, json_path, "hash-1")
+    old.start(resume=False)
+    old.record(["doc::text::1"])
+
+    assert Checkpoint(directory, json_path, "hash-2").load() == set()
+    assert Checkpoint(directory, json_path, "hash-1").start(resume=False) == set()
+    assert old.load() == set()
+
+
+def test_resume_skips_chunks_committed_before_a_crash(tmp_path):
+    json_path = tmp_path / "doc.chunks_md_tables.jsonl"
+    with json_path.open("w", encoding="utf-8") as f:
+        for i in range(6):
+            meta = {"origin": {"filename": "BMW_AR_2023.pdf"}, "doc_items": []}
+            f.write(json.dumps({"text": f"paragraph number {i}", "meta": meta}) + "\n")
+    kwargs = dict(
+        client=None,
+        chat_model="chat",
+        embed_model="embed",
+        config=IngestConfig(write_batch_size=2),
+        checkpoint_dir=tmp_path / "checkpoints",
+    )
+
+    # the second write transaction fails: only the first batch is committed
+    crashing = FakeGraph(fail_on_write=2)
+    with pytest.raises(ConnectionError):
+        process_json_file(json_path, driver=crashing, embedder=FakeEmbedder(), **kwargs)
+
+    graph, embedder = FakeGraph(), FakeEmbedder()
+    process_json_file(json_path, driver=graph, embedder=embedder, resume=True, **kwargs)
+
+    assert embedder.embedded == [f"paragraph number {i}" for i in range(2, 6)]
+    assert graph.chunks == {f"BMW_AR_2023.pdf::text::{i}" for i in range(3, 7)}
+    assert "BMW_AR_2023.pdf" in graph.source_hashes
+    assert list((tmp_path / "checkpoints").iterdir()) == []
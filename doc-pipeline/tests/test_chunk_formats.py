@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+
+from fakes import FakeEmbedder
+
+from app.bench import BenchConfig, FakeOpenAI
+from app.docling_pipeline import write_document_chunks
+from app.process_json import IngestConfig, embed_and_write
+from app.utils import (CHUNKS_JSON_SUFFIX, CHUNKS_JSONL_SUFFIX, find_chunk_files,
+                       iter_chunk_file)
+
+TABLE = "| segment | revenue |\n|---|---|\n| Automotive | 132,277 |"
+
+
+def _item(label, ref, page):
+    return {
+        "label": label,
+        "self_ref": ref,
+        "parent": {"$ref": "#/body"},
+        "prov": [{"page_no": page, "bbox": {"l": 1.0, "t": 2.0}, "charspan": [0, 9]}],
+    }
+
+
+class FakeChunker:
+    """Docling-like chunks with the full metadata a json file keeps."""
+
+    def __init__(self):
+        metas = [
+            ("Revenue grew by 9%.", [_item("text", "#/texts/0", 1)]),
+            (TABLE, [_item("table", "#/tables/0", 2)]),
+            (TABLE, [_item("table", "#/tables/0", 3)]),  # continued on page 3
+            ("Outlook for 2024.", [_item("text", "#/texts/1", 3)]),
+        ]
+        self.chunks = [
+            SimpleNamespace(
+                text=text,
+                meta=SimpleNamespace(
+                    model_dump=lambda items=items: {
+                        "schema_name": "docling_core.transforms.chunker.DocMeta",
+                        "headings": ["Group report"],
+                        "origin": {"filename": "BMW_AR_2023.pdf", "binary_hash": 1},
+                        "doc_items": items,
+                    }
+                ),
+            )
+            for text, items in metas
+        ]
+
+    def chunk(self, dl_doc):
+        return iter(self.chunks)
+
+    def contextualize(self, chunk):
+        return chunk.text
+
+
+class ListWriter:
+    def __init__(self):
+        self.rows = []
+
+    def add(self, row):
+        self.rows.append(row)
+
+    def flush(self):
+        pass
+
+
+def _write(tmp_path, fmt):
+    suffix = CHUNKS_JSONL_SUFFIX if fmt == "jsonl" else CHUNKS_JSON_SUFFIX
+    path = tmp_path / fmt / f"BMW_AR_2023{suffix}"
+    path.parent.mkdir()
+    write_document_chunks(None, FakeChunker(), path, fmt)
+    return path
+
+
+def _ingested_rows(path):
+    writer = ListWriter()
+    failed = embed_and_write(
+        path,
+        writer=writer,
+        manifest=None,
+        embedder=FakeEmbedder(),
+        client=FakeOpenAI(BenchConfig(chat_latency=0.0)),
+        chat_model="chat",
+        config=IngestConfig(),
+    )
+    assert failed == 0
+    return writer.rows
+
+
+def test_jsonl_keeps_what_ingest_reads(tmp_path):
+    json_chunks = list(iter_chunk_file(_write(tmp_path, "json")))
+    jsonl_chunks = list(iter_chunk_file(_write(tmp_path, "jsonl")))
+
+    assert [c["text"] for c in jsonl_chunks] == [c["text"] for c in json_chunks]
+    assert "headings" in json_chunks[0]["meta"]
+    assert jsonl_chunks[1]["meta"] == {
+        "origin": {"filename": "BMW_AR_2023.pdf"},
+        "doc_items": [
+            {"label": "table", "self_ref": "#/tables/0", "prov": [{"page_no": 2}]}
+        ],
+    }
+
+
+def test_both_formats_ingest_to_the_same_rows(tmp_path):
+    json_rows = _ingested_rows(_write(tmp_path, "json"))
+    jsonl_rows = _ingested_rows(_write(tmp_path, "jsonl"))
+
+    assert jsonl_rows == json_rows
+    assert [r["chunk_id"] for r in json_rows] == [
+        "BMW_AR_2023.pdf::text::1",
+        "BMW_AR_2023.pdf::table::0",
+        "BMW_AR_2023.pdf::text::2",
+    ]
+    assert json_rows[1]["page_nos"] == [2, 3]
+
+
+def test_jsonl_file_wins_over_json(tmp_path):
+    (tmp_path / f"a{CHUNKS_JSON_SUFFIX}").write_text("{}")
+    (tmp_path / f"a{CHUNKS_JSONL_SUFFIX}").write_text("")
+    (tmp_path / f"b{CHUNKS_JSON_SUFFIX}").write_text("{}")
+
+    assert [p.name for p in find_chunk_files(tmp_path)] == [
+        f"a{CHUNKS_JSONL_SUFFIX}",
+        f"b{CHUNKS_JSON_SUFFIX}",
+    ]
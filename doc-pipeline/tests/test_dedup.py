@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from app.dedup import DedupIndex
+
+_WORDS = (
+    "group revenue increased across all segments driven by higher volumes "
+    "favourable product mix and pricing while the automotive division reported "
+    "stable margins despite supply chain constraints and currency effects"
+).split()
+
+
+def _paragraph(figure: str, year: str, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words = [rng.choice(_WORDS) for _ in range(150)]
+    words[75:75] = ["revenues", "reached", "EUR", figure, "billion", "in", year]
+    return " ".join(words)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_paragraphs_with_different_figures_are_kept(seed):
+    dedup = DedupIndex(threshold=0.9, seed=seed)
+    old = _paragraph("142.6", "2022")
+    new = _paragraph("155.5", "2023")
+    assert dedup.canonical_of("BMW_AR_2022.pdf::text::3", old) is None
+    assert dedup.canonical_of("BMW_AR_2023.pdf::text::3", new) is None
+
+
+def test_same_figures_are_deduplicated():
+    dedup = DedupIndex()
+    text = _paragraph("142.6", "2022")
+    assert dedup.canonical_of("BMW_AR_2022.pdf::text::3", text) is None
+    assert (
+        dedup.canonical_of("BMW_Q4_2022.pdf::text::9", text + " Notes.")
+        == "BMW_AR_2022.pdf::text::3"
+    )
+
+
+def test_no_dedup_across_brands():
+    dedup = DedupIndex()
+    text = _paragraph("142.6", "2022")
+    assert dedup.canonical_of("BMW_AR_2022.pdf::text::3", text) is None
+    assert dedup.canonical_of("Tesla_10K_2022.pdf::text::3", text) is None
+    assert (
+        dedup.canonical_of("Tesla_10Q_2022.pdf::text::1", text)
+        == "Tesla_10K_2022.pdf::text::3"
+    )
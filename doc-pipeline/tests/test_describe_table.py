@@ -0,0 +1,96 @@
+import logging
+
+from app.bench import BenchConfig, FakeOpenAI
+from app.cache import DescriptionCache
+from app.llm_utils import (TABLE_MERGE_SYSTEM_PROMPT, TABLE_SYSTEM_PROMPT,
+                           describe_table, split_table_rows)
+
+HEADER = ["Table 3: Revenue by segment", "| segment | revenue |", "|---|---|"]
+
+
+def _rows(n, start=0):
+    return [f"| segment {i} | {1000 + i:,} |" for i in range(start, start + n)]
+
+
+def _recording_client():
+    client = FakeOpenAI(BenchConfig(chat_latency=0.0, embed_latency=0.0))
+    create = client.chat.completions.create
+    client.system_prompts = []
+
+    def recording_create(model, messages, **kw):
+        client.system_prompts.append(messages[0]["content"])
+        return create(model=model, messages=messages, **kw)
+
+    client.chat.completions.create = recording_create
+    return client
+
+
+def test_parts_repeat_the_header_and_keep_every_row():
+    rows = _rows(200)
+    parts = split_table_rows("\n".join(HEADER + rows), max_chars=1000, max_parts=8)
+
+    assert 1 < len(parts) <= 8
+    body = []
+    for part in parts:
+        lines = part.splitlines()
+        assert lines[:3] == HEADER
+        body += lines[3:]
+    assert body == rows
+
+
+def test_parts_are_capped_at_max_parts():
+    parts = split_table_rows("\n".join(HEADER + _rows(500)), max_chars=500, max_parts=4)
+    assert len(parts) == 4
+
+
+def test_repeated_page_headers_and_captions_are_dropped():
+    md = "\n".join(
+        HEADER
+        + _rows(3)
+        + ["", "Footnote: in EUR million", ""]
+        + ["Table 3: Revenue by segment (continued)", HEADER[1], HEADER[2]]
+        + _rows(3, start=3)
+        + HEADER  # a page that repeats the first header exactly
+        + _rows(3, start=6)
+    )
+    parts = split_table_rows(md, max_chars=150, max_parts=8)
+
+    body = [line for part in parts for line in part.splitlines()[3:]]
+    assert body == _rows(3) + ["Footnote: in EUR million"] + _rows(6, start=3)
+
+
+def test_oversized_rows_are_cut_with_a_warning(caplog):
+    long_row = "| notes | " + "x" * 600 + " |"
+    md = "\n".join(HEADER + [long_row] + _rows(2))
+    with caplog.at_level(logging.WARNING):
+        parts = split_table_rows(md, max_chars=200, max_parts=8)
+
+    assert all(len(part) <= 200 for part in parts)
+    body = "".join(line for part in parts for line in part.splitlines()[3:])
+    assert body.startswith(long_row)
+    assert "cut into pieces" in caplog.text
+
+
+def test_long_table_is_described_in_parts_and_merged(tmp_path):
+    client = _recording_client()
+    cache = DescriptionCache(tmp_path / "descriptions.sqlite")
+    md = "\n".join(HEADER + _rows(200))
+
+    desc = describe_table(md, client, "chat", max_chars=1000, max_parts=4, cache=cache)
+    assert client.system_prompts.count(TABLE_SYSTEM_PROMPT) == 4
+    assert client.system_prompts[-1] == TABLE_MERGE_SYSTEM_PROMPT
+    assert desc.startswith("Synthetic description")
+
+    # cached under the split settings: same settings hit, others miss
+    requests = client.chat_requests
+    describe_table(md, client, "chat", max_chars=1000, max_parts=4, cache=cache)
+    assert client.chat_requests == requests
+    describe_table(md, client, "chat", max_chars=1000, max_parts=2, cache=cache)
+    assert client.system_prompts[-1] == TABLE_MERGE_SYSTEM_PROMPT
+    assert client.chat_requests == requests + 3  # two new parts and the merge
+
+
+def test_short_table_is_described_in_one_call():
+    client = _recording_client()
+    describe_table("\n".join(HEADER + _rows(3)), client, "chat")
+    assert client.system_prompts == [TABLE_SYSTEM_PROMPT]
@@ -0,0 +1,35 @@
+from app.doc_cache import DoclingDocCache
+
+
+def _cache_with_shards(tmp_path, ranges):
+    cache = DoclingDocCache(tmp_path / "docling", {"do_ocr": False})
+    key_dir = tmp_path / "docling" / "key"
+    key_dir.mkdir(parents=True)
+    for start, end in ranges:
+        (key_dir / cache._name((start, end))).write_bytes(b"")
+    return cache, key_dir
+
+
+def test_complete_set_is_used(tmp_path):
+    cache, key_dir = _cache_with_shards(tmp_path, [(1, 100), (101, 200), (201, 250)])
+    assert cache.shard_ranges(key_dir, 250) == [(1, 100), (101, 200), (201, 250)]
+
+
+def test_incomplete_set_is_not_used(tmp_path):
+    cache, key_dir = _cache_with_shards(tmp_path, [(1, 100), (101, 200)])
+    assert cache.shard_ranges(key_dir, 250) == []
+    assert cache.shard_ranges(key_dir, None) == []
+
+
+def test_complete_set_among_shards_of_another_size(tmp_path):
+    # an interrupted run with --shard-pages 50, then a full one with 100
+    cache, key_dir = _cache_with_shards(
+        tmp_path,
+        [(1, 50), (51, 100), (101, 150), (1, 100), (101, 200), (201, 250)],
+    )
+    assert cache.shard_ranges(key_dir, 250) == [(1, 100), (101, 200), (201, 250)]
+
+
+def test_shards_of_two_sizes_can_be_combined(tmp_path):
+    cache, key_dir = _cache_with_shards(tmp_path, [(1, 50), (51, 100), (101, 250)])
+    assert cache.shard_ranges(key_dir, 250) == [(1, 50), (51, 100), (101, 250)]
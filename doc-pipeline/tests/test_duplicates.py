@@ -0,0 +1,72 @@
+import json
+
+from fakes import FakeEmbedder, FakeGraph
+
+from app.dedup import DedupIndex
+from app.process_json import IngestConfig, process_json_file
+
+_PARAGRAPHS = [
+    "group revenue grew on higher volumes and a favourable product mix",
+    "the automotive division reported stable margins despite supply constraints",
+    "free cash flow in the automotive segment exceeded the prior year",
+]
+
+
+def _chunk_file(tmp_path, doc_id, texts):
+    path = tmp_path / "doc.chunks_md_tables.jsonl"
+    with path.open("w", encoding="utf-8") as f:
+        for text in texts:
+            meta = {"origin": {"filename": doc_id}, "doc_items": []}
+            f.write(json.dumps({"text": text, "meta": meta}) + "\n")
+    return path
+
+
+def _ingest(path, graph, embedder, dedup):
+    process_json_file(
+        path,
+        client=None,
+        chat_model="chat",
+        embed_model="embed",
+        driver=graph,
+        config=IngestConfig(write_batch_size=2),
+        embedder=embedder,
+        dedup=dedup,
+    )
+
+
+def test_duplicates_are_written_after_their_canonical(tmp_path):
+    path = _chunk_file(tmp_path, "BMW_AR_2023.pdf", _PARAGRAPHS * 2)
+    graph = FakeGraph()
+    _ingest(path, graph, FakeEmbedder(), DedupIndex())
+
+    written = set()
+    for kind, ids in graph.writes:
+        if kind == "duplicate":
+            assert {f"BMW_AR_2023.pdf::text::{n}" for n in (1, 2, 3)} <= written
+        written.update(ids)
+    assert [k for k, _ in graph.writes].count("duplicate") >= 1
+    assert "BMW_AR_2023.pdf" in graph.source_hashes
+
+
+def test_canonical_that_fails_to_embed_leaves_the_file_unfinished(tmp_path):
+    path = _chunk_file(tmp_path, "BMW_AR_2023.pdf", _PARAGRAPHS * 2)
+    graph = FakeGraph()
+    _ingest(path, graph, FakeEmbedder(fail_on="automotive division"), DedupIndex())
+
+    written = {cid for _, ids in graph.writes for cid in ids}
+    # the canonical and its duplicate are both missing
+    assert "BMW_AR_2023.pdf::text::2" not in written
+    assert "BMW_AR_2023.pdf::text::5" not in written
+    assert "BMW_AR_2023.pdf" not in graph.source_hashes
+
+
+def test_canonical_missing_from_graph_leaves_the_file_unfinished(tmp_path):
+    dedup = DedupIndex()
+    # canonical from another file whose write never happened
+    dedup.canonical_of("BMW_AR_2022.pdf::text::1", _PARAGRAPHS[0])
+    path = _chunk_file(tmp_path, "BMW_AR_2023.pdf", _PARAGRAPHS)
+    graph = FakeGraph()
+    _ingest(path, graph, FakeEmbedder(), dedup)
+
+    assert ("duplicate", ["BMW_AR_2023.pdf::text::1"]) in graph.writes
+    assert "BMW_AR_2023.pdf" not in graph.source_hashes
@@ -0,0 +1,40 @@
+import sys
+from types import ModuleType
+
+import pytest
+
+from app.embeddings import LocalEmbeddingProvider
+
+
+@pytest.fixture
+def fake_sentence_transformers(monkeypatch):
+    loaded = []
+
+    class SentenceTransformer:
+        def __init__(self, model_id, device="cpu", truncate_dim=None):
+            loaded.append(model_id)
+            self.dim = truncate_dim or 384
+
+        def get_sentence_embedding_dimension(self):
+            return self.dim
+
+    module = ModuleType("sentence_transformers")
+    module.SentenceTransformer = SentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    monkeypatch.setitem(sys.modules, "torch", ModuleType("torch"))
+    return loaded
+
+
+def test_dims_do_not_load_the_model(fake_sentence_transformers):
+    assert LocalEmbeddingProvider("sentence-transformers/all-MiniLM-L6-v2").dims == 384
+    assert LocalEmbeddingProvider("org/custom", model_dims=512).dims == 512
+    assert LocalEmbeddingProvider("org/custom", dimensions=128).dims == 128
+    with pytest.raises(ValueError, match="LOCAL_EMBED_DIMS"):
+        LocalEmbeddingProvider("org/custom").dims
+    assert fake_sentence_transformers == []
+
+
+def test_configured_dims_are_checked_on_load(fake_sentence_transformers):
+    provider = LocalEmbeddingProvider("org/custom", model_dims=768)
+    with pytest.raises(ValueError, match="384-dimensional"):
+        provider._load()
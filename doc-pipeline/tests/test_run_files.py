@@ -0,0 +1,46 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.process_json import run_files
+from app.streaming import run_pipelined
+
+
+def test_ingest_starts_before_last_conversion_ends():
+    events = {"convert_end": [], "ingest_start": []}
+    lock = threading.Lock()
+
+    def convert():
+        for i in range(4):
+            time.sleep(0.2)
+            with lock:
+                events["convert_end"].append(time.monotonic())
+            yield Path(f"doc{i}.chunks_md_tables.jsonl")
+
+    def ingest(path, **kwargs):
+        with lock:
+            events["ingest_start"].append(time.monotonic())
+        time.sleep(0.05)
+
+    run_pipelined(
+        convert(), lambda paths: run_files(paths, ingest, {}, jobs=2), queue_size=1
+    )
+
+    assert len(events["ingest_start"]) == 4
+    assert min(events["ingest_start"]) < max(events["convert_end"])
+
+
+def test_failed_files_are_reported_after_the_others_ran():
+    seen = []
+
+    def ingest(path, **kwargs):
+        seen.append(path.name)
+        if path.name == "bad.json":
+            raise ValueError("broken file")
+
+    paths = (Path(n) for n in ("a.json", "bad.json", "c.json"))
+    with pytest.raises(RuntimeError, match="1 of 3 files: bad.json"):
+        run_files(paths, ingest, {}, jobs=2)
+    assert sorted(seen) == ["a.json", "bad.json", "c.json"]
@@ -0,0 +1,60 @@
+from app.docling_pipeline import page_ranges, stitch_shards
+from app.utils import page_nos_from_chunk, table_ref
+
+
+def _chunk(text, ref, page):
+    item = {"self_ref": ref, "label": "table" if "tables" in ref else "text"}
+    item["prov"] = [{"page_no": page}]
+    return {"text": text, "meta": {"doc_items": [item]}}
+
+
+def test_page_ranges_cover_every_page_once():
+    assert page_ranges(250, 100) == [(1, 100), (101, 200), (201, 250)]
+    assert page_ranges(100, 100) == [(1, 100)]
+
+
+def test_refs_are_shifted_past_earlier_shards():
+    first = [_chunk("a", "#/tables/0", 3), _chunk("b", "#/tables/1", 90)]
+    second = [_chunk("c", "#/tables/0", 2), _chunk("d", "#/texts/4", 5)]
+    # given out of order: shards are joined in page order
+    chunks = stitch_shards(
+        [
+            ((101, 200), second, {"tables": 1, "texts": 10}),
+            ((1, 100), first, {"tables": 2, "texts": 7}),
+        ]
+    )
+
+    assert [ch["text"] for ch in chunks] == ["a", "b", "c", "d"]
+    assert [table_ref(ch) for ch in chunks[:3]] == [
+        "#/tables/0",
+        "#/tables/1",
+        "#/tables/2",
+    ]
+    assert chunks[3]["meta"]["doc_items"][0]["self_ref"] == "#/texts/11"
+
+
+def test_relative_page_numbers_are_made_absolute():
+    relative = [_chunk("c", "#/texts/0", 2)]
+    absolute = [_chunk("e", "#/texts/0", 205)]
+    chunks = stitch_shards(
+        [
+            ((1, 100), [_chunk("a", "#/texts/0", 1)], {"texts": 1}),
+            ((101, 200), relative, {"texts": 1}),
+            ((201, 250), absolute, {"texts": 1}),
+        ]
+    )
+    assert [page_nos_from_chunk(ch) for ch in chunks] == [[1], [102], [205]]
+
+
+def test_shard_pages_without_workers_warns(tmp_path, monkeypatch, caplog):
+    from app import docling_pipeline
+
+    (tmp_path / "a.pdf").write_bytes(b"%PDF")
+    monkeypatch.setattr(
+        docling_pipeline, "build_docling_converter_and_chunker", lambda *a: (None, None)
+    )
+    monkeypatch.setattr(docling_pipeline, "_convert_one", lambda pdf, *a: pdf)
+
+    out = list(docling_pipeline.iter_json_for_all_pdfs(tmp_path, "m", shard_pages=50))
+    assert out == [tmp_path / "a.pdf"]
+    assert "--shard-pages only applies" in caplog.text